@@ -0,0 +1,523 @@
+"""
+# Batch Porting
+
+Port many schematic-YAML files at once, e.g. every `netlist_info/*.yaml` in a BAG workspace.
+Each file is loaded, converted, and written as its own Python module, fanned out across a process pool.
+Bundles of many schematics in one file (see `schematic.iter_documents`) are streamed to the pool a document at a time.
+Failures are collected per-file, and never stop the rest of the batch.
+"""
+
+import os, time, argparse
+from itertools import chain
+from collections import deque
+from pathlib import Path
+from functools import partial
+from dataclasses import field
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+)
+
+# PyPi Imports
+from pydantic.dataclasses import dataclass
+
+# Local Imports
+from .schematic import BagSchematic, LibCell, load_sch, loads_sch
+from .schematic import is_bundle, iter_documents
+from .cache import SchematicCache
+from .schematic_module import convert_schematic
+from .code import CodeWriter, Emission, package_init
+from .formatting import FormatPolicy, FormatCache, format_code
+from .procs import mp_context
+from .validation import Validation, validate, warm_up
+from .instrument import CellStats, Profiling, recorder, stage_totals, write_report
+from .params import ParamIndex, ParamRow, aggregate, param_rows
+
+
+@dataclass
+class PortOptions:
+    """# Options for each schematic's porting"""
+
+    # Use the fast-path schematic loader. See `load_sch`.
+    fast: bool = False
+    # Directory of a `SchematicCache`. None for no caching.
+    cache_dir: Optional[Path] = None
+    # Code formatting policy
+    format: FormatPolicy = FormatPolicy.BLACK
+    # Directory of a `FormatCache`. None for an in-memory cache only.
+    format_cache_dir: Optional[Path] = None
+    # Level of checking applied to the generated code
+    validation: Validation = Validation.EXEC
+    # Record per-stage timings and counters of each schematic
+    instrument: bool = False
+    # Per-schematic profiling. Enables instrumentation.
+    profiling: Profiling = Profiling.OFF
+    # Standalone modules, or a package per library
+    emission: Emission = Emission.MODULE
+    # Synthesize parameter classes from the parameters instances set, across the batch. See `params.py`.
+    params: bool = False
+
+
+@dataclass
+class PortResult:
+    """# Result of porting a single schematic-YAML file.
+    Exactly one of `out_path` and `error` is set."""
+
+    sch_path: Path
+    out_path: Optional[Path] = None
+    error: Optional[str] = None
+
+    # The ported cell, and the cells it instantiates. Set on success.
+    libcell: Optional[LibCell] = None
+    dependencies: List[LibCell] = field(default_factory=list)
+
+    # Instrumentation results, if enabled
+    stats: Optional[CellStats] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class BatchSummary:
+    """# Summary of a batch run"""
+
+    results: List[PortResult]
+    elapsed: float  # Wall-clock seconds
+    unchanged: int = 0  # Schematics skipped by incremental runs
+
+    @property
+    def failures(self) -> List[PortResult]:
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def stats(self) -> List[CellStats]:
+        return [r.stats for r in self.results if r.stats is not None]
+
+    @property
+    def files_per_second(self) -> float:
+        if self.elapsed <= 0:
+            return 0.0
+        return len(self.results) / self.elapsed
+
+
+def collect_paths(paths: Sequence[Path]) -> List[Path]:
+    """
+    Expand the command-line `paths` into a list of schematic-YAML files.
+    * Files are used as-is.
+    * Directories contribute their own `*.yaml` files, plus those in any `netlist_info` directory below them.
+    """
+    accum = list()
+    for path in paths:
+        path = Path(path)
+        if not path.is_dir():
+            accum.append(path)
+            continue
+        found = set(path.glob("*.yaml"))
+        found.update(path.rglob("netlist_info/*.yaml"))
+        accum.extend(sorted(found))
+    return accum
+
+
+def module_path(outdir: Path, lib_name: str, cell_name: str) -> Path:
+    """Output path for a cell's module.
+    Matches the layout that `CodeWriter.write_dependency` imports from:
+    each library is a package, and each cell a module within it."""
+    return outdir / lib_name / f"{cell_name}.py"
+
+
+# Per-process `SchematicCache`s and `FormatCache`s, by directory
+_caches: Dict[Path, SchematicCache] = dict()
+_format_caches: Dict[Optional[Path], FormatCache] = dict()
+
+# Per-process `ParamIndex` of the batch, if `PortOptions.params`. Set by `init_worker`.
+_params: Optional[ParamIndex] = None
+
+
+def init_worker(validation: Validation, params: Optional[ParamIndex]) -> None:
+    """Per-process setup for porting: warm up for `validation`, and set the batch's `ParamIndex`."""
+    global _params
+    _params = params
+    warm_up(validation)
+
+
+def load(sch_path: Path, options: PortOptions) -> BagSchematic:
+    """Load the schematic at `sch_path`, through the cache if `options` has one."""
+    if options.cache_dir is None:
+        return load_sch(sch_path, fast=options.fast)
+    cache = _caches.get(options.cache_dir, None)
+    if cache is None:
+        cache = _caches[options.cache_dir] = SchematicCache(options.cache_dir)
+    return cache.load(sch_path, fast=options.fast)
+
+
+def format_cache(options: PortOptions) -> FormatCache:
+    """Get the per-process `FormatCache` for `options`"""
+    cache = _format_caches.get(options.format_cache_dir, None)
+    if cache is None:
+        cache = FormatCache(options.format_cache_dir)
+        _format_caches[options.format_cache_dir] = cache
+    return cache
+
+
+def port_one(
+    sch_path: Path,
+    outdir: Path,
+    options: PortOptions,
+    content: Optional[str] = None,
+) -> PortResult:
+    """Port the schematic at `sch_path`, writing its module under `outdir`.
+    If `content` is provided, the schematic is loaded from it instead, and `sch_path` serves only as a label.
+    Runs in the worker processes; all errors are captured in the returned `PortResult`."""
+    rec = recorder(sch_path, options.instrument, options.profiling)
+    rec.start()
+    try:
+        with rec.stage("load"):
+            if content is None:
+                sch = load(sch_path, options)
+            else:
+                sch = loads_sch(content, fast=options.fast, source=sch_path)
+        with rec.stage("convert"):
+            convsch = convert_schematic(sch)
+        if rec.enabled:
+            rec.count("instances", len(convsch.instances))
+            rec.count("connections", sum(len(i.conns) for i in convsch.instances))
+            rec.count("signals", len(convsch.signals))
+            rec.count("ports", len(convsch.ports))
+
+        out_path = module_path(outdir, sch.lib_name, sch.cell_name)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        params = _params if options.params else None
+
+        if options.validation == Validation.OFF and options.format == FormatPolicy.NONE:
+            # Nothing to do with the code but write it. Stream it straight to the file.
+            with rec.stage("write"), open(out_path, "w") as f:
+                CodeWriter(convsch, options.emission, params).to_file(f)
+        else:
+            with rec.stage("codegen"):
+                code = CodeWriter(convsch, options.emission, params).to_code()
+            with rec.stage("validate"):
+                validate(code, options.validation)
+            with rec.stage("format"):
+                code = format_code(code, options.format, format_cache(options))
+            with rec.stage("write"):
+                out_path.write_text(code)
+        return PortResult(
+            sch_path=sch_path,
+            out_path=out_path,
+            libcell=LibCell(sch.lib_name, sch.cell_name),
+            dependencies=sorted(convsch.dependencies, key=lambda d: (d.lib, d.cell)),
+            stats=rec.stop(),
+        )
+
+    except Exception as e:
+        return PortResult(
+            sch_path=sch_path, error=f"{type(e).__name__}: {e}", stats=rec.stop()
+        )
+
+
+def port_doc(
+    label: Path, content: str, outdir: Path, options: PortOptions
+) -> PortResult:
+    """Port a schematic from document `content`, e.g. from a bundle. Arguments are as for `port_one`."""
+    return port_one(label, outdir, options, content)
+
+
+def bundle_docs(bundle_path: Path) -> Iterator[Tuple[Path, str]]:
+    """Iterate over (label, content) pairs for each document in bundle `bundle_path`.
+    Labels are of the form `path/to/bundle.jsonl#3`."""
+    for num, doc in enumerate(iter_documents(bundle_path)):
+        yield Path(f"{bundle_path}#{num}"), doc
+
+
+def documents(paths: Sequence[Path]) -> Iterator[Tuple[Path, Optional[str]]]:
+    """Iterate over (label, content) pairs for every schematic in `paths`: files first, with no content, then each bundle's documents."""
+    files = ((p, None) for p in paths if not is_bundle(p))
+    docs = chain.from_iterable(bundle_docs(p) for p in paths if is_bundle(p))
+    return chain(files, docs)
+
+
+def bounded_map(
+    pool: Executor,
+    fn: Callable[..., Any],
+    items: Iterable[Tuple],
+    max_in_flight: int,
+) -> Iterator[Any]:
+    """Run `fn(*item)` on `pool` for each of `items`, yielding results in order.
+    At most `max_in_flight` items are submitted at once, so that streaming `items` are never all held in memory."""
+    in_flight = deque()
+    for item in items:
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft().result()
+        in_flight.append(pool.submit(fn, *item))
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def doc_rows(
+    label: Path, content: Optional[str], options: PortOptions
+) -> List[ParamRow]:
+    """Load a schematic, from `content` if provided and otherwise from file `label`, and flatten its instance parameters.
+    Schematics which fail to load contribute nothing; porting them reports the failure."""
+    try:
+        if content is None:
+            sch = load(label, options)
+        else:
+            sch = loads_sch(content, fast=options.fast, source=label)
+    except Exception:
+        return list()
+    return param_rows(sch)
+
+
+def index_params(
+    paths: Sequence[Path],
+    workers: Optional[int] = None,
+    options: Optional[PortOptions] = None,
+) -> ParamIndex:
+    """Build the `ParamIndex` of every schematic in `paths`, loading them on `workers` processes.
+    Each worker sends back flat rows, which are aggregated once, here."""
+    options = options or PortOptions()
+    items = documents(paths)
+    rows = partial(doc_rows, options=options)
+    if workers == 1 or len(paths) <= 1:
+        return aggregate(chain.from_iterable(rows(*item) for item in items))
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers, mp_context=mp_context()) as pool:
+        batches = bounded_map(pool, rows, items, 4 * workers)
+        return aggregate(chain.from_iterable(batches))
+
+
+def port_paths(
+    paths: Sequence[Path],
+    outdir: Path,
+    workers: Optional[int] = None,
+    options: Optional[PortOptions] = None,
+    params: Optional[ParamIndex] = None,
+    executor: Optional[Executor] = None,
+) -> List[PortResult]:
+    """Port every schematic in `paths` to a module under `outdir`, using `workers` processes.
+    `workers=None` uses one per CPU; `workers=1` runs everything in this process.
+    Bundles in `paths` contribute a result per document.
+    If `options.params`, parameters are synthesized from `params`, by default indexed from `paths` themselves.
+    An existing `executor`, e.g. a long-lived pool, can be used instead of starting new processes.
+    Its workers must have been set up with `init_worker`, and can't synthesize parameters."""
+    files = [p for p in paths if not is_bundle(p)]
+    bundles = [p for p in paths if is_bundle(p)]
+    outdir = Path(outdir)
+    options = options or PortOptions()
+    work = partial(port_one, outdir=outdir, options=options)
+    work_doc = partial(port_doc, outdir=outdir, options=options)
+    if executor is not None and options.params:
+        raise ValueError("Parameter synthesis is not supported on an existing executor")
+    if options.params and params is None:
+        params = index_params(paths, workers, options)
+
+    def run(pool: Executor, workers: int) -> List[PortResult]:
+        # Hand out work in chunks, so that thousands of small files don't each pay a round-trip
+        chunksize = max(1, len(files) // (4 * workers))
+        results = list(pool.map(work, files, chunksize=chunksize))
+        for bundle in bundles:
+            results += bounded_map(pool, work_doc, bundle_docs(bundle), 4 * workers)
+        return results
+
+    if executor is not None:
+        return run(executor, workers or os.cpu_count() or 1)
+
+    if workers == 1 or (len(files) <= 1 and not bundles):
+        init_worker(options.validation, params)
+        results = [work(p) for p in files]
+        for bundle in bundles:
+            results += [work_doc(*item) for item in bundle_docs(bundle)]
+        return results
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=mp_context(),
+        initializer=init_worker,
+        initargs=(options.validation, params),
+    ) as pool:
+        return run(pool, workers)
+
+
+def write_packages(outdir: Path, libs: Iterable[str]) -> None:
+    """Write the lazily-loading `__init__.py` of each of `libs`' packages under `outdir`.
+    Each lists every cell module in its package directory, including those ported by earlier runs."""
+    for lib in libs:
+        pkgdir = Path(outdir) / lib
+        cells = [p.stem for p in pkgdir.glob("*.py") if p.stem != "__init__"]
+        (pkgdir / "__init__.py").write_text(package_init(lib, cells))
+
+
+def port_all(
+    paths: Sequence[Path],
+    outdir: Path,
+    workers: Optional[int] = None,
+    options: Optional[PortOptions] = None,
+    executor: Optional[Executor] = None,
+) -> BatchSummary:
+    """Port every schematic in `paths`, timing the whole batch. Arguments are as for `port_paths`."""
+    start = time.perf_counter()
+    results = port_paths(paths, outdir, workers, options, executor=executor)
+    if options is not None and options.emission == Emission.PACKAGE:
+        write_packages(outdir, set(r.libcell.lib for r in results if r.ok))
+    return BatchSummary(results=results, elapsed=time.perf_counter() - start)
+
+
+def report(summary: BatchSummary, file: Optional[TextIO] = None) -> None:
+    """Print the per-file failures and throughput of `summary`, to `file`, by default stdout."""
+    for r in summary.failures:
+        print(f"FAILED {r.sch_path}: {r.error}", file=file)
+    num = len(summary.results)
+    if summary.unchanged:
+        print(f"Skipped {summary.unchanged} unchanged schematics", file=file)
+    print(
+        f"Ported {num - len(summary.failures)}/{num} schematics "
+        f"in {summary.elapsed:.2f}s ({summary.files_per_second:.1f} files/s)",
+        file=file,
+    )
+    totals = stage_totals(summary.stats)
+    if totals:
+        stages = ", ".join(f"{k} {v:.2f}s" for k, v in totals.items())
+        print(f"Time by stage, summed over workers: {stages}", file=file)
+
+
+def build_parser(cls: type = argparse.ArgumentParser) -> argparse.ArgumentParser:
+    """Build the command-line parser for `run.py port-all`, of parser-class `cls`."""
+    parser = cls(prog="run.py port-all")
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        type=Path,
+        help="Schematic YAML files, bundles, or directories",
+    )
+    parser.add_argument(
+        "-o",
+        "--outdir",
+        type=Path,
+        default=Path("scratch/ported"),
+        help="Output directory",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes. Default: one per CPU",
+    )
+    parser.add_argument(
+        "--fast-load",
+        action="store_true",
+        help="Use the fast-path schematic loader, skipping unused geometry",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=None,
+        help="Directory of a persistent cache of loaded schematics",
+    )
+    parser.add_argument(
+        "--format",
+        default=FormatPolicy.BLACK.value,
+        choices=[p.value for p in FormatPolicy],
+        help="Code formatting policy",
+    )
+    parser.add_argument(
+        "--format-cache",
+        type=Path,
+        default=None,
+        help="Directory of a persistent cache of formatted code",
+    )
+    parser.add_argument(
+        "--validate",
+        default=Validation.EXEC.value,
+        choices=[v.value for v in Validation],
+        help="Checking of generated code: off, syntax-only, or full execution",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-port schematics which changed since the last run, and their parents",
+    )
+    parser.add_argument(
+        "--report",
+        type=Path,
+        default=None,
+        help="Record per-stage timings and counters, and write them to this JSON or CSV file",
+    )
+    parser.add_argument(
+        "--profile",
+        default=Profiling.OFF.value,
+        choices=[p.value for p in Profiling],
+        help="Per-schematic profiling, included in the --report. Requires --report.",
+    )
+    parser.add_argument(
+        "--emit",
+        default=Emission.MODULE.value,
+        choices=[e.value for e in Emission],
+        help="Write standalone modules, or a lazily-loaded package per library",
+    )
+    parser.add_argument(
+        "--params",
+        action="store_true",
+        help="Synthesize each cell's parameters from those its instances set, across every schematic ported",
+    )
+    return parser
+
+
+def main(argv: List[str]) -> BatchSummary:
+    """Command-line entry for `run.py port-all`."""
+    parser = build_parser()
+    return run_args(parser.parse_args(argv), parser)
+
+
+def run_args(
+    args: argparse.Namespace,
+    parser: argparse.ArgumentParser,
+    executor: Optional[Executor] = None,
+    file: Optional[TextIO] = None,
+) -> BatchSummary:
+    """Run `port-all` with parsed `args`, optionally on an existing `executor`, reporting to `file`."""
+    options = PortOptions(
+        fast=args.fast_load,
+        cache_dir=args.cache,
+        format=FormatPolicy(args.format),
+        format_cache_dir=args.format_cache,
+        validation=Validation(args.validate),
+        instrument=args.report is not None,
+        profiling=Profiling(args.profile),
+        emission=Emission(args.emit),
+        params=args.params,
+    )
+    if args.profile != Profiling.OFF.value and args.report is None:
+        parser.error("--profile requires --report")
+    paths = collect_paths(args.paths)
+    if args.incremental and any(is_bundle(p) for p in paths):
+        parser.error("--incremental does not support schematic bundles")
+    if args.incremental and args.params:
+        # Changes to any instance's parameters can change those of the cell it instantiates,
+        # which incremental runs don't track.
+        parser.error("--incremental does not support --params")
+    if args.incremental:
+        from .incremental import port_incremental
+
+        summary = port_incremental(
+            paths, args.outdir, args.workers, options, executor=executor
+        )
+    else:
+        summary = port_all(paths, args.outdir, args.workers, options, executor=executor)
+    report(summary, file)
+    if args.report is not None:
+        write_report(summary.stats, args.report)
+    return summary
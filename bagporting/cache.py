@@ -0,0 +1,154 @@
+"""
+# Schematic Cache
+
+Persistent, on-disk cache of loaded `BagSchematic`s.
+Repeat runs over an unchanged workspace skip YAML parsing and validation entirely.
+
+Layout, under the cache's `root` directory:
+* `blobs/{digest}.pkl.z` - zlib-compressed pickles of `BagSchematic`s, keyed by (version, loader-mode, content-hash) digest
+* `paths/{hash-of-path}` - the (mtime, size, digest) most recently seen for each schematic path, keyed by (version, path, loader-mode)
+* `connectivity.pkl.z` - a `ConnectivityIndex` of the schematics, if one is kept here. See `connectivity.py`.
+
+A lookup whose path, mtime and size all match a prior one never reads the YAML at all.
+Anything else hashes the file content, so that touched-but-unchanged and copied files still hit.
+All writes are atomic renames, so any number of processes (e.g. the `port-all` pool) can share a cache.
+Blobs are evicted least-recently-used first, once their total size exceeds `max_bytes`.
+"""
+
+import os, pickle, zlib, hashlib
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Local Imports
+from .schematic import BagSchematic, loads_sch
+
+# Bump this whenever the cached data model changes, invalidating all prior entries.
+CACHE_VERSION = 1
+
+
+class SchematicCache:
+    """# Schematic Cache
+    Use `load` in place of `load_sch`."""
+
+    def __init__(self, root: Path, max_bytes: int = 1 << 30):
+        self.root = Path(root)
+        self.max_bytes = max_bytes  # Size bound on all blobs, in bytes
+        self.blobs = self.root / "blobs"
+        self.paths = self.root / "paths"
+        self.blobs.mkdir(parents=True, exist_ok=True)
+        self.paths.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._bytes: Optional[int] = None  # Running estimate of total blob size
+
+    def load(self, path: Path, fast: bool = False) -> BagSchematic:
+        """Load the schematic at `path`, from cache if possible. Arguments are as for `load_sch`."""
+        path = Path(path).absolute()
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        pathkey = self.paths / _hash(f"{CACHE_VERSION}:{path}:{int(fast)}".encode())
+
+        # Fast path: same path, mtime and size as last time. Don't even read the file.
+        prior = self._read_pathkey(pathkey)
+        if prior is not None and prior[:2] == stamp:
+            sch = self._read_blob(prior[2])
+            if sch is not None:
+                self.hits += 1
+                return sch
+
+        # Otherwise read and hash the content
+        content = path.read_bytes()
+        digest = _hash(b"%d:%d:" % (CACHE_VERSION, fast) + content)
+        sch = self._read_blob(digest)
+        if sch is None:
+            self.misses += 1
+            sch = loads_sch(content.decode("utf-8"), fast=fast, source=path)
+            self._write_blob(digest, sch)
+        else:
+            self.hits += 1
+        _atomic_write(pathkey, pickle.dumps((*stamp, digest)))
+        return sch
+
+    def _read_pathkey(self, pathkey: Path) -> Optional[Tuple[int, int, str]]:
+        try:
+            return pickle.loads(pathkey.read_bytes())
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _read_blob(self, digest: str) -> Optional[BagSchematic]:
+        blob = self.blobs / f"{digest}.pkl.z"
+        try:
+            data = blob.read_bytes()
+        except OSError:
+            return None
+        try:
+            sch = pickle.loads(zlib.decompress(data))
+        except Exception:
+            # Corrupt or stale entry. Treat it as a miss, and it'll get overwritten.
+            return None
+        try:
+            os.utime(blob)  # Mark it recently-used, for eviction
+        except OSError:
+            pass
+        return sch
+
+    def _write_blob(self, digest: str, sch: BagSchematic) -> None:
+        data = zlib.compress(pickle.dumps(sch, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        _atomic_write(self.blobs / f"{digest}.pkl.z", data)
+        if self._bytes is None:
+            self._bytes = self.size()
+        else:
+            self._bytes += len(data)
+        if self._bytes > self.max_bytes:
+            self.evict()
+
+    def size(self) -> int:
+        """Total size of all blobs, in bytes"""
+        return sum(size for _, size, _ in self._blob_entries())
+
+    def evict(self) -> None:
+        """Remove least-recently-used blobs until we're back under 90% of `max_bytes`."""
+        blobs = sorted(self._blob_entries())
+        total = sum(size for _, size, _ in blobs)
+        target = 0.9 * self.max_bytes
+        for _, size, blobpath in blobs:
+            if total <= target:
+                break
+            try:
+                os.remove(blobpath)
+            except OSError:
+                pass  # Probably another process got it first
+            total -= size
+        self._bytes = total
+
+    def _blob_entries(self) -> List[Tuple[int, int, str]]:
+        """(mtime, size, path) of each blob. Skips in-progress writes, which are dot-files."""
+        accum = list()
+        with os.scandir(self.blobs) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # Evicted by another process
+                accum.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return accum
+
+    def clear(self) -> None:
+        """Remove all cached entries"""
+        for d in (self.blobs, self.paths):
+            for p in d.iterdir():
+                p.unlink()
+        self._bytes = 0
+
+
+def _hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    """Write `data` to `path` via a rename, so concurrent readers never see partial content."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
@@ -0,0 +1,73 @@
+"""
+# Porting Client
+
+Sends requests to a running porting server, and prints its replies. See `server.py` for the server and its protocol.
+Imports nothing but the standard library, so that each request pays as little startup time as possible.
+"""
+
+import os, sys, json, socket, argparse
+from enum import Enum
+from pathlib import Path
+from typing import NamedTuple, Optional, Sequence
+
+
+class ServerAction(Enum):
+    """# Server Request Actions"""
+
+    PORT = "port"
+    PORT_ALL = "port-all"
+    SEARCH = "search"
+    PING = "ping"
+    SHUTDOWN = "shutdown"
+
+
+class Response(NamedTuple):
+    """# Server Response
+    A `NamedTuple` rather than a dataclass, as importing `pydantic`, or even `dataclasses`, takes longer than many requests."""
+
+    ok: bool
+    output: str = ""  # Everything the action printed
+    error: str = ""
+
+
+def default_socket() -> Path:
+    """Default socket path: in `$XDG_RUNTIME_DIR` if set, and otherwise a per-user path in the temp directory."""
+    runtime = os.environ.get("XDG_RUNTIME_DIR", None)
+    if runtime:
+        return Path(runtime) / "bagporting.sock"
+    import tempfile
+
+    return Path(tempfile.gettempdir()) / f"bagporting-{os.getuid()}.sock"
+
+
+def request(
+    action: str,
+    args: Sequence[str] = (),
+    socket_path: Optional[Path] = None,
+    cwd: Optional[str] = None,
+) -> Response:
+    """Send a request to the server at `socket_path`, by default `default_socket()`, and wait for its `Response`.
+    Relative paths in `args` are resolved against `cwd`, by default the current directory."""
+    line = json.dumps(dict(action=action, args=list(args), cwd=cwd or os.getcwd()))
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(socket_path or default_socket()))
+        sock.sendall(line.encode() + b"\n")
+        with sock.makefile("rb") as f:
+            reply = f.readline()
+    if not reply:
+        raise ConnectionError("Server closed the connection without replying")
+    return Response(**json.loads(reply))
+
+
+def main(argv: Sequence[str]) -> None:
+    """Command-line entry for `run.py client`. Exits with status 1 if the request fails."""
+    parser = argparse.ArgumentParser(prog="run.py client")
+    parser.add_argument("--socket", type=Path, default=None, help="Socket path")
+    parser.add_argument("action", choices=[a.value for a in ServerAction])
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+    response = request(args.action, args.args, args.socket)
+    print(response.output, end="")
+    if not response.ok:
+        print(response.error, file=sys.stderr)
+        sys.exit(1)
@@ -2,14 +2,31 @@
 # Python Code Writing
 """
 
+import io
+from enum import Enum
 from pathlib import Path
-
-# PyPi Imports
-import black  # Yes `black` the formatter, we trying to produce code that actually looks good!
+from typing import List, Optional, Sequence, TextIO, Tuple
 
 # Local Imports
 from .schematic import SchematicPinDir, load_sch
 from .schematic_module import *
+from .formatting import FormatPolicy, FormatCache, format_code, LINE_LENGTH
+from .validation import Validation, validate
+from .params import ParamIndex, str_literal
+
+
+class Emission(Enum):
+    """
+    # Code Emission Mode
+
+    * `MODULE` writes each schematic as a standalone module, with its dependencies' imports commented out.
+    * `PACKAGE` writes each library as a package, its cells loaded lazily by its `__init__`. See `package_init`.
+      Each generator imports its dependencies when it runs, with one shared import line per library:
+      `import other_lib` for other libraries, and `from . import cell_a, cell_b` for its own.
+    """
+
+    MODULE = "module"
+    PACKAGE = "package"
 
 
 class CodeWriter:
@@ -27,61 +44,106 @@ class CodeWriter:
     1. All Module accesses use the `add` and `get` methods. No setattr magic.
     2. All Instance connections use the `connect` method: `connect(portname: str, conn: Connectable)`
 
+    Output is laid out the same as `black` would, other than line-wrapping.
+    Formatting, if desired, is a separate step. See `formatting.py`.
     """
 
-    def __init__(self, sch: SchematicModule):
+    def __init__(
+        self,
+        sch: SchematicModule,
+        emission: Emission = Emission.MODULE,
+        params: Optional[ParamIndex] = None,
+    ):
         self.sch: SchematicModule = sch  # The input SchematicModule
-        self.code: str = ""  # The result code string
+        self.emission: Emission = emission  # Module or package emission
+        self.params: Optional[ParamIndex] = params  # Library-wide parameters, if known
+        self.dest: TextIO = io.StringIO()  # Destination for the result code
         self.indent: int = 0  # Current indentation level, in "tabs"
         self.tab: str = "    "  # Per-tab indentation string
 
-    def to_code(self):
+    def to_code(self) -> str:
         """Convert the SchematicModule to Python code"""
+        self.dest = io.StringIO()
+        self.write()
+        return self.dest.getvalue()
+
+    def to_file(self, dest: TextIO) -> None:
+        """Convert the SchematicModule to Python code, streaming it straight to open text-file `dest`.
+        Nothing is buffered here beyond what `dest` itself buffers."""
+        self.dest = dest
+        self.write()
+
+    def write(self) -> None:
+        """Write the SchematicModule's code to `self.dest`"""
         sch = self.sch
 
         # Write some header stuff
         self.writeln(f"import hdl21 as h")
         self.writeln(f"")
 
-        # Write the schematic's dependencies
-        for dep in sch.dependencies:
-            self.write_dependency(dep)
+        # Write the schematic's dependencies, in a stable order
+        deps = sorted(sch.dependencies, key=lambda d: (d.lib, d.cell))
+        if self.emission == Emission.MODULE:
+            for dep in deps:
+                self.write_dependency(dep)
+            if deps:
+                self.writeln("")
         self.writeln("")
 
-        # FIXME: write actual custom parameter types
-        self.writeln(f"@h.paramclass")
-        self.writeln(f"class Params:")
-        self.indent += 1
-        self.writeln(f"... # FIXME! ")
-        self.indent -= 1
+        self.write_params()
 
         # Create the Generator function
         self.writeln(f"@h.generator")
         self.writeln(f"def {sch.bagsch.cell_name}(params: Params) -> h.Module:")
         self.indent += 1
 
+        # In packages, import dependencies when the generator runs, so that modules load independently
+        if self.emission == Emission.PACKAGE and deps:
+            self.write_imports(deps)
+            self.writeln("")
+
         # Create the Module
         self.writeln(f"m = h.Module()")
         self.writeln("")
 
-        for port in sch.ports:
-            self.write_port(port)
-        self.writeln("")
-
-        for signal in sch.signals:
-            self.write_signal(signal)
-        self.writeln("")
-
-        for instance in sch.instances:
-            self.write_instance(instance)
-        self.writeln("")
+        # Write each section, separated by single blank lines
+        for section, write in (
+            (sch.ports, self.write_port),
+            (sch.signals, self.write_signal),
+            (sch.instances, self.write_instance),
+        ):
+            for item in section:
+                write(item)
+            if section:
+                self.writeln("")
 
         # And return the resultant Module
-        self.writeln("")
         self.writeln(f"return m")
 
         self.indent -= 1
-        return self.code
+
+    def write_params(self) -> None:
+        """Write the generator's parameter class, from the parameters its instances set across the library"""
+        self.writeln(f"@h.paramclass")
+        self.writeln(f"class Params:")
+        self.indent += 1
+        if self.params is None:
+            self.writeln(f"...  # FIXME!")
+        else:
+            bagsch = self.sch.bagsch
+            infos = self.params.get(LibCell(bagsch.lib_name, bagsch.cell_name), {})
+            for info in infos.values():
+                dtype = info.dtype.value
+                desc = str_literal(info.desc)
+                default = info.literal(info.default)
+                self.writeln(
+                    f"{info.name} = h.Param(dtype={dtype}, desc={desc}, default={default})"
+                )
+            if not infos:
+                self.writeln(f"...  # No instance sets any parameters")
+        self.indent -= 1
+        self.writeln("")
+        self.writeln("")
 
     def write_port(self, port: Port) -> None:
         port_constructors = {
@@ -108,18 +170,45 @@ class CodeWriter:
         if isinstance(conn, SignalRef):
             return f'm.get("{conn.name}")'
         if isinstance(conn, Slice):
-            if isinstance(conn.index, Range):
-                return f'm.get("{conn.name}")[{conn.index.top}:{conn.index.bot}]'
-            return f"{conn.name}[{conn.index}]"
+            if not isinstance(conn.index, Range):
+                return f'm.get("{conn.name}")[{conn.index}]'
+            top, bot = conn.index.top, conn.index.bot
+            if top >= bot:
+                # BAG ranges are inclusive, and Hdl21 slices are not
+                return f'm.get("{conn.name}")[{bot}:{top + 1}]'
+            # Ascending ranges, e.g. `a<0:3>`, reverse the signal's bit order
+            return f"h.Concat({self.format_part(conn)})"
         if isinstance(conn, Concat):
-            parts = ", ".join(self.format_conn(p) for p in conn.parts)
-            return f"h.Concat({parts})"
+            parts = merge_slices(conn.parts)
+            if len(parts) == 1 and not isinstance(parts[0], Repeat):
+                return self.format_conn(parts[0])
+            # BAG lists concatenations MSB-first, and Hdl21 LSB-first
+            return (
+                f"h.Concat({', '.join(self.format_part(p) for p in reversed(parts))})"
+            )
         if isinstance(conn, Repeat):
             # Turn these into Hdl21 Concats too
-            parts = ", ".join(conn.num * [self.format_conn(conn.target)])
-            return f"h.Concat({parts})"
+            return f"h.Concat({self.format_part(conn)})"
         raise TypeError
 
+    def format_part(self, part: Connection) -> str:
+        """Format a part of a `Concat`. `Repeat`s are replicated in the generated code,
+        by unpacking a list, rather than writing out each copy.
+        Ascending slices are written out bit by bit, LSB-first."""
+        if isinstance(part, Repeat):
+            target = self.format_conn(part.target)
+            if part.num == 1:
+                return target
+            return f"*{part.num} * [{target}]"
+        if (
+            isinstance(part, Slice)
+            and isinstance(part.index, Range)
+            and part.index.top < part.index.bot
+        ):
+            bits = range(part.index.bot, part.index.top - 1, -1)
+            return ", ".join(f'm.get("{part.name}")[{bit}]' for bit in bits)
+        return self.format_conn(part)
+
     def write_instance(self, instance: Instance) -> None:
         """Write an Instance"""
 
@@ -128,15 +217,29 @@ class CodeWriter:
         if instance.ident.width > 1:
             array_mult = f"{instance.ident.width} * "
 
-        # FIXME: generator parameters to these
         self.writeln(
-            f'i = m.add({array_mult}{instance.of.cell}(h.Default)(), name="{instance.ident.name}")'
+            f'i = m.add({array_mult}{self.dependency_ref(instance.of)}({self.format_params(instance)})(), name="{instance.ident.name}")'
         )
         # Format each of its connections
         for k, v in instance.conns.items():
             line = f'i.connect("{k}", {self.format_conn(v)})'
             self.writeln(line)
 
+    def format_params(self, instance: Instance) -> str:
+        """Format the generator parameters of `instance`: keyword arguments if it sets any known parameters,
+        and otherwise the defaults."""
+        if self.params is None or not instance.params:
+            return "h.Default"
+        infos = self.params.get(instance.of, {})
+        kwargs = [
+            f"{name}={infos[name].literal(value)}"
+            for name, value in instance.params.items()
+            if name in infos
+        ]
+        if not kwargs:
+            return "h.Default"
+        return ", ".join(kwargs)
+
     def write_dependency(self, dep: LibCell) -> None:
         """
         Write a dependency on module `dep`.
@@ -153,19 +256,130 @@ class CodeWriter:
         line = f"# from {lib}.{cell} import {cell}"
         self.writeln(line)
 
+    def write_imports(self, deps: Sequence[LibCell]) -> None:
+        """Write package-mode imports of `deps`, one line per library.
+        Other libraries are imported whole, and their cells referred to as attributes.
+        Cells of this library are imported by name, relative to the package."""
+        local = self.sch.bagsch.lib_name
+        libs = sorted(set(dep.lib for dep in deps if dep.lib != local))
+        for lib in libs:
+            self.writeln(f"import {lib}")
+        cells = [dep.cell for dep in deps if dep.lib == local]
+        if not cells:
+            return
+        line = f"from . import {', '.join(cells)}"
+        if len(self.tab * self.indent + line) <= LINE_LENGTH:
+            self.writeln(line)
+            return
+        # Too long for one line. Explode it, as `black` would.
+        self.writeln("from . import (")
+        self.indent += 1
+        for cell in cells:
+            self.writeln(f"{cell},")
+        self.indent -= 1
+        self.writeln(")")
+
+    def dependency_ref(self, dep: LibCell) -> str:
+        """Get the expression referring to dependency `dep`'s generator"""
+        if self.emission == Emission.PACKAGE and dep.lib != self.sch.bagsch.lib_name:
+            return f"{dep.lib}.{dep.cell}"
+        return dep.cell
+
     def writeln(self, line: str):
-        """Write a line with indentation"""
-        self.code += self.tab * self.indent + line + "\n"
+        """Write a line with indentation. Empty lines get no indentation."""
+        if not line:
+            self.dest.write("\n")
+            return
+        self.dest.write(self.tab * self.indent + line + "\n")
+
+
+def merge_slices(parts: Sequence[Connection]) -> List[Connection]:
+    """Merge runs of adjacent, contiguous, descending slices of the same signal in `parts`, e.g. `a<3>,a<2:1>` into `a<3:1>`.
+    Ascending runs, e.g. `a<0>,a<1>`, are left as they are."""
+    accum: List[Connection] = list()
+    for part in parts:
+        prev = accum[-1] if accum else None
+        if (
+            isinstance(part, Slice)
+            and isinstance(prev, Slice)
+            and prev.name == part.name
+        ):
+            ptop, pbot = _bounds(prev)
+            top, bot = _bounds(part)
+            if ptop >= pbot and top >= bot and pbot - 1 == top:
+                accum[-1] = Slice(part.name, Range(ptop, bot))
+                continue
+        accum.append(part)
+    return accum
+
+
+def _bounds(slice: Slice) -> Tuple[int, int]:
+    """The (first, last) bit of `slice`"""
+    if isinstance(slice.index, Range):
+        return slice.index.top, slice.index.bot
+    return slice.index, slice.index
+
+
+# Template of each library-package's `__init__.py`. See `package_init`.
+PACKAGE_INIT = '''"""
+# Ported BAG Library `{lib_name}`
+
+Generated by `bagporting`. Each cell is imported on first access.
+"""
+
+import importlib
 
+__all__ = [
+{cells}]
+_cells = frozenset(__all__)
 
-def bag_sch_to_code(bagsch: BagSchematic) -> str:
+
+def __getattr__(name: str):
+    if name not in _cells:
+        raise AttributeError(f"module {{__name__!r}} has no attribute {{name!r}}")
+    module = importlib.import_module(f"{{__name__}}.{{name}}")
+    # Importing the submodule set it as our attribute. Replace it with its generator.
+    generator = globals()[name] = getattr(module, name)
+    return generator
+
+
+def __dir__():
+    return sorted(set(globals()) | _cells)
+'''
+
+
+def package_init(lib_name: str, cells: Sequence[str]) -> str:
+    """
+    Create the `__init__.py` code for the package of library `lib_name`, with cells `cells`.
+    Cells are loaded lazily, on first attribute access, via a module-level `__getattr__`.
+    Importing the package alone imports none of them.
+    """
+    lines = "".join(f'    "{cell}",\n' for cell in sorted(cells))
+    return PACKAGE_INIT.format(lib_name=lib_name, cells=lines)
+
+
+def bag_sch_to_code(bagsch: BagSchematic, emission: Emission = Emission.MODULE) -> str:
     convsch = convert_schematic(bagsch)
-    return CodeWriter(convsch).to_code()
+    return CodeWriter(convsch, emission).to_code()
+
+
+def check_and_format(
+    code: str,
+    policy: FormatPolicy = FormatPolicy.BLACK,
+    cache: Optional[FormatCache] = None,
+    validation: Validation = Validation.EXEC,
+) -> str:
+    """Check `code` to level `validation`, and format it according to `policy`."""
+    validate(code, validation)
+    return format_code(code, policy, cache)
 
 
-def bag_sch_path_to_code(path: Path) -> str:
+def bag_sch_path_to_code(
+    path: Path,
+    policy: FormatPolicy = FormatPolicy.BLACK,
+    validation: Validation = Validation.EXEC,
+) -> str:
     """Load a YAML schematic from `path` and convert it to Hdl21 Python code."""
     sch = load_sch(path)
     code = bag_sch_to_code(sch)
-    exec(code)
-    return black.format_str(code, mode=black.FileMode())
+    return check_and_format(code, policy, validation=validation)
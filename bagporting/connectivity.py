@@ -0,0 +1,382 @@
+"""
+# Connectivity Index
+
+A persistent, library-wide index of how cells connect:
+which cells each cell instantiates, and which cells instantiate it,
+the nets connected to each port of each instance, and the instance ports on each net.
+
+Building the index parses each schematic's connections once.
+After that, queries are dictionary lookups, and nothing is converted or ported.
+Impact analysis is a walk over the reverse edges: finding every cell that (transitively) instantiates a set of changed cells.
+
+The index is stored as a compressed pickle, by default in a `SchematicCache` directory, beside its content.
+Like the cache, it keys each schematic file by its path, mtime and size, and updates re-read only the files which changed.
+Loading the files goes through the cache as well.
+"""
+
+import os, gc, pickle, zlib, argparse, dataclasses
+from pathlib import Path
+from functools import partial
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Local Imports
+from .schematic import BagSchematic, LibCell, SchematicPinDir
+from .schematic import is_bundle, iter_documents, loads_sch
+from .schematic_module import parse_instance_or_port_name, parse_net_widths
+from .cache import _atomic_write
+from .procs import mp_context
+from .batch import PortOptions, collect_paths, load
+
+# Bump this whenever the indexed data changes, invalidating all prior indices.
+CONNECTIVITY_VERSION = 1
+
+# File name of the index, in a `SchematicCache` directory
+CACHE_FILE = "connectivity.pkl.z"
+
+# (mtime_ns, size) of a schematic file
+Stamp = Tuple[int, int]
+
+
+@dataclasses.dataclass
+class InstanceConnectivity:
+    """# Connectivity of an Instance"""
+
+    of: LibCell
+    conns: Dict[str, Tuple[str, ...]]  # Port name => names of the nets connected to it
+
+
+@dataclasses.dataclass
+class CellConnectivity:
+    """# Connectivity of a Cell"""
+
+    libcell: LibCell
+    ports: Dict[str, SchematicPinDir]  # Port name => direction
+    instances: Dict[str, InstanceConnectivity]  # By instance name, e.g. `XN<3:0>`
+    # Net name => (instance, port) connected to it
+    nets: Dict[str, List[Tuple[str, str]]]
+    children: Set[LibCell]  # Cells instantiated, including primitives
+
+    def fanout(self, net: str) -> int:
+        """Number of instance ports connected to `net`"""
+        return len(self.nets.get(net, ()))
+
+    def internal_signals(self) -> List[str]:
+        """Names of the connected nets which aren't ports, in order of first connection"""
+        return [n for n in self.nets if n not in self.ports]
+
+
+def cell_connectivity(sch: BagSchematic) -> CellConnectivity:
+    """Index the connectivity of `sch`.
+    Port, instance-port and net names are parsed through the same shared caches as `convert_schematic`."""
+    ports = dict()
+    for name, terminal in sch.terminals.items():
+        ports[parse_instance_or_port_name(name).name] = terminal.inner.direction
+
+    instances: Dict[str, InstanceConnectivity] = dict()
+    nets: Dict[str, List[Tuple[str, str]]] = dict()
+    for inst_name, inst in sch.instances.items():
+        conns = dict()
+        for port_name, conn in inst.connections.items():
+            port = parse_instance_or_port_name(port_name).name
+            conns[port] = tuple(net for net, _ in parse_net_widths(conn))
+            for net in conns[port]:
+                nets.setdefault(net, []).append((inst_name, port))
+        of = LibCell(inst.lib_name, inst.cell_name)
+        instances[inst_name] = InstanceConnectivity(of=of, conns=conns)
+
+    return CellConnectivity(
+        libcell=LibCell(sch.lib_name, sch.cell_name),
+        ports=ports,
+        instances=instances,
+        nets=nets,
+        children=set(i.of for i in instances.values()),
+    )
+
+
+def index_file(
+    path: Path, options: PortOptions
+) -> Tuple[Optional[List[CellConnectivity]], str]:
+    """Index every schematic in file or bundle `path`. Runs in the worker processes.
+    Returns the cells, or `None` and an error message if any fail to load."""
+    try:
+        if is_bundle(path):
+            docs = iter_documents(path)
+            schs = (loads_sch(d, fast=options.fast, source=path) for d in docs)
+        else:
+            schs = [load(path, options)]
+        return [cell_connectivity(sch) for sch in schs], ""
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+@dataclasses.dataclass
+class ConnectivityUpdate:
+    """# Summary of an index update"""
+
+    indexed: int = 0  # Files (re-)read
+    reused: int = 0  # Files unchanged, only `stat`ed
+    removed: int = 0  # Files no longer found
+    # Path => error, for each file which failed to load
+    failures: Dict[str, str] = dataclasses.field(default_factory=dict)
+
+
+class ConnectivityIndex:
+    """
+    # Connectivity Index
+
+    Typical usage:
+    ```
+    index = ConnectivityIndex.in_cache(cache_dir)
+    index.update(paths, options=PortOptions(cache_dir=cache_dir))
+    index.save()
+    index.impacted([LibCell("bag3_digital", "inv")])
+    ```
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        # Schematic file path => its stamp when indexed, and the cells it defines
+        self.sources: Dict[str, Tuple[Stamp, List[CellConnectivity]]] = dict()
+        self.cells: Dict[LibCell, CellConnectivity] = dict()
+        # Reverse of each cell's `children`. Derived from `cells`, and not saved.
+        self.parent_cells: Dict[LibCell, Set[LibCell]] = dict()
+
+    @classmethod
+    def in_cache(cls, cache_dir: Path) -> "ConnectivityIndex":
+        """Load the index kept in `SchematicCache` directory `cache_dir`"""
+        return cls.load(Path(cache_dir) / CACHE_FILE)
+
+    @classmethod
+    def load(cls, path: Path) -> "ConnectivityIndex":
+        """Load the index at `path`. Missing, corrupt or out-of-date indices load as empty."""
+        index = cls(path)
+        # Unpickling creates a great many small objects, and would otherwise trigger collection after collection
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            data = pickle.loads(zlib.decompress(index.path.read_bytes()))
+        except Exception:
+            return index
+        finally:
+            if enabled:
+                gc.enable()
+        if data.get("version", None) != CONNECTIVITY_VERSION:
+            return index
+        index.sources = data["sources"]
+        index.link()
+        return index
+
+    def save(self) -> None:
+        """Save to `self.path`, atomically"""
+        self.intern()
+        data = dict(version=CONNECTIVITY_VERSION, sources=self.sources)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        pickled = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        _atomic_write(self.path, zlib.compress(pickled, 1))
+
+    def update(
+        self,
+        paths: Sequence[Path],
+        workers: Optional[int] = None,
+        options: Optional[PortOptions] = None,
+    ) -> ConnectivityUpdate:
+        """Bring the index up to date with the schematics in `paths`, files or directories as for `port-all`.
+        Anything indexed from outside `paths` is removed. Changed files are loaded on `workers` processes,
+        as `options` directs, e.g. through its `cache_dir`. Files which fail to load are left out, and retried next update."""
+        options = options or PortOptions()
+        summary = ConnectivityUpdate()
+        stamps: Dict[str, Stamp] = dict()
+        for p in collect_paths(paths):
+            try:
+                stat = os.stat(p)
+            except OSError as e:
+                # Removed since it was listed. Left out, as if never found.
+                summary.failures[str(p.absolute())] = f"{type(e).__name__}: {e}"
+                continue
+            stamps[str(p.absolute())] = (stat.st_mtime_ns, stat.st_size)
+
+        summary.removed = len(set(self.sources) - set(stamps))
+        sources = {
+            k: v for k, v in self.sources.items() if k in stamps and v[0] == stamps[k]
+        }
+        summary.reused = len(sources)
+        stale = [k for k in stamps if k not in sources]
+        summary.indexed = len(stale)
+
+        for key, (cells, error) in zip(stale, self._index(stale, workers, options)):
+            if cells is None:
+                summary.failures[key] = error
+            else:
+                sources[key] = (stamps[key], cells)
+        self.sources = sources
+        self.link()
+        return summary
+
+    def _index(
+        self, stale: List[str], workers: Optional[int], options: PortOptions
+    ) -> List[Tuple[Optional[List[CellConnectivity]], str]]:
+        """Index each file in `stale`, on `workers` processes"""
+        work = partial(index_file, options=options)
+        paths = [Path(p) for p in stale]
+        if workers == 1 or len(paths) <= 1:
+            return [work(p) for p in paths]
+
+        workers = workers or os.cpu_count() or 1
+        chunksize = max(1, len(paths) // (4 * workers))
+        with ProcessPoolExecutor(workers, mp_context=mp_context()) as pool:
+            return list(pool.map(work, paths, chunksize=chunksize))
+
+    def link(self) -> None:
+        """Rebuild `cells`, and the reverse edges of `parent_cells`, from `sources`.
+        Where more than one file defines the same `LibCell`, the first by path wins."""
+        self.cells = dict()
+        for key in sorted(self.sources):
+            for cell in self.sources[key][1]:
+                self.cells.setdefault(cell.libcell, cell)
+
+        self.parent_cells = dict()
+        for libcell, cell in self.cells.items():
+            for child in cell.children:
+                self.parent_cells.setdefault(child, set()).add(libcell)
+
+    def intern(self) -> None:
+        """Share a single `LibCell` object between every reference to each cell.
+        Pickles then hold each `LibCell` once, rather than once per instance, and load that much faster."""
+        libcells: Dict[LibCell, LibCell] = dict()
+        for _, cells in self.sources.values():
+            for cell in cells:
+                cell.libcell = libcells.setdefault(cell.libcell, cell.libcell)
+                for inst in cell.instances.values():
+                    inst.of = libcells.setdefault(inst.of, inst.of)
+                cell.children = set(libcells.setdefault(c, c) for c in cell.children)
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def get(self, libcell: LibCell) -> Optional[CellConnectivity]:
+        """Look up the connectivity of `libcell`. Returns `None` if not indexed."""
+        return self.cells.get(libcell, None)
+
+    def children(self, libcell: LibCell) -> Set[LibCell]:
+        """The cells `libcell` instantiates"""
+        cell = self.cells.get(libcell, None)
+        return set(cell.children) if cell is not None else set()
+
+    def parents(self, libcell: LibCell) -> Set[LibCell]:
+        """The cells which instantiate `libcell`"""
+        return set(self.parent_cells.get(libcell, ()))
+
+    def impacted(self, changed: Iterable[LibCell]) -> Set[LibCell]:
+        """Every cell which (transitively) instantiates any of the `changed` cells, i.e. which changes along with them.
+        `changed` cells themselves are included only where they instantiate one another."""
+        impacted: Set[LibCell] = set()
+        queue = deque(changed)
+        while queue:
+            for parent in self.parent_cells.get(queue.popleft(), ()):
+                if parent not in impacted:
+                    impacted.add(parent)
+                    queue.append(parent)
+        return impacted
+
+
+def parse_libcell(name: str) -> LibCell:
+    """Parse a command-line `lib.cell` name"""
+    lib, dot, cell = name.partition(".")
+    if not dot or not lib or not cell:
+        raise argparse.ArgumentTypeError(f"Invalid cell {name}, expected `lib.cell`")
+    return LibCell(lib, cell)
+
+
+def describe(cell: CellConnectivity) -> List[str]:
+    """Lines describing the connectivity of `cell`"""
+    lines = [f"{cell.libcell.lib}.{cell.libcell.cell}"]
+    for port, portdir in cell.ports.items():
+        lines.append(f"  port {port} ({portdir.value}), fanout {cell.fanout(port)}")
+    for net in cell.internal_signals():
+        lines.append(f"  signal {net}, fanout {cell.fanout(net)}")
+    for name, inst in cell.instances.items():
+        conns = ", ".join(f"{p}={','.join(nets)}" for p, nets in inst.conns.items())
+        lines.append(f"  {name}: {inst.of.lib}.{inst.of.cell}({conns})")
+    return lines
+
+
+def main(argv: Sequence[str]) -> ConnectivityIndex:
+    """Command-line entry for `run.py connectivity`"""
+    parser = argparse.ArgumentParser(
+        prog="run.py connectivity",
+        description="Index and query the connectivity of a library of schematics",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        type=Path,
+        help="Schematic YAML files, bundles, or directories",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        required=True,
+        help="Directory of the persistent schematic cache, in which the index is kept",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes. Default: one per CPU",
+    )
+    parser.add_argument(
+        "--fast-load",
+        action="store_true",
+        help="Use the fast-path schematic loader, skipping unused geometry",
+    )
+    parser.add_argument(
+        "--cell",
+        type=parse_libcell,
+        action="append",
+        default=[],
+        help="Print the ports, nets and instances of this `lib.cell`",
+    )
+    parser.add_argument(
+        "--parents",
+        type=parse_libcell,
+        action="append",
+        default=[],
+        help="Print the cells which instantiate this `lib.cell`",
+    )
+    parser.add_argument(
+        "--impacted",
+        type=parse_libcell,
+        action="append",
+        default=[],
+        help="Print every cell which transitively instantiates this `lib.cell`. Repeat for several changed cells.",
+    )
+    args = parser.parse_args(argv)
+
+    options = PortOptions(fast=args.fast_load, cache_dir=args.cache)
+    index = ConnectivityIndex.in_cache(args.cache)
+    summary = index.update(args.paths, args.workers, options)
+    index.save()
+    for path, error in summary.failures.items():
+        print(f"FAILED {path}: {error}")
+    print(
+        f"Indexed {len(index)} cells: {summary.indexed} files read, "
+        f"{summary.reused} unchanged, {summary.removed} removed"
+    )
+
+    def names(cells: Iterable[LibCell]) -> str:
+        return " ".join(sorted(f"{c.lib}.{c.cell}" for c in cells)) or "(none)"
+
+    for libcell in args.cell:
+        cell = index.get(libcell)
+        name = f"{libcell.lib}.{libcell.cell}"
+        print("\n".join(describe(cell)) if cell else f"{name} not indexed")
+    for libcell in args.parents:
+        print(
+            f"Parents of {libcell.lib}.{libcell.cell}: {names(index.parents(libcell))}"
+        )
+    if args.impacted:
+        print(f"Impacted: {names(index.impacted(args.impacted))}")
+    return index
@@ -0,0 +1,225 @@
+"""
+# Code Formatting
+
+Policies for formatting the code produced by `CodeWriter`:
+
+* `NONE` leaves it as written. `CodeWriter` already emits `black`'s blank-line and spacing layout,
+  so this differs from `black` only in leaving long lines unwrapped.
+* `BLACK` runs `black`, imported lazily on first use.
+* `BUILTIN` wraps long lines the way `black` does, for the limited subset of Python that `CodeWriter` emits.
+  Its output is identical to `black`'s, in a small fraction of the time.
+
+Formatting results can be cached with a `FormatCache`, keyed by the hash of the unformatted code.
+"""
+
+import os, hashlib
+from enum import Enum
+from pathlib import Path
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# Maximum line length. Same as `black`'s default.
+LINE_LENGTH = 88
+
+# Delimiter priorities, as in `black.brackets`
+COMMA_PRIORITY = 18
+ARITH_PRIORITY = 7
+
+
+class FormatPolicy(Enum):
+    """# Code Formatting Policy"""
+
+    NONE = "none"
+    BLACK = "black"
+    BUILTIN = "builtin"
+
+
+def format_code(
+    code: str,
+    policy: FormatPolicy = FormatPolicy.BLACK,
+    cache: Optional["FormatCache"] = None,
+) -> str:
+    """Format `code` according to `policy`, through `cache` if provided."""
+    if policy == FormatPolicy.NONE:
+        return code
+    if cache is not None:
+        return cache.format(code, policy)
+    return _formatters[policy](code)
+
+
+def format_black(code: str) -> str:
+    """Format `code` with `black`"""
+    import black  # Imported here, as it's slow and often unnecessary
+
+    return black.format_str(code, mode=black.FileMode())
+
+
+def format_builtin(code: str) -> str:
+    """Format `code` with the built-in formatter.
+    Code must otherwise be laid out as `CodeWriter` does; only long lines are changed."""
+    accum = list()
+    for line in code.splitlines():
+        text = line.lstrip(" ")
+        indent = line[: len(line) - len(text)]
+        accum.extend(_transform(text, indent, inside_brackets=False))
+    return "\n".join(accum) + "\n"
+
+
+def _transform(text: str, indent: str, inside_brackets: bool) -> List[str]:
+    """Split a single line of `text` at `indent` into lines that fit, if possible.
+    Recreates the relevant parts of `black.linegen.transform_line`."""
+    if len(indent) + len(text) <= LINE_LENGTH or text.startswith("#"):
+        return [indent + text]
+
+    tokens = _Tokens(text)
+    if text.startswith("def "):
+        split = _left_hand_split(text, tokens)
+    elif inside_brackets:
+        split = _delimiter_split(text, tokens) or _right_hand_split(text, tokens)
+    else:
+        split = _right_hand_split(text, tokens)
+    if split is None:
+        return [indent + text]  # Can't be split. Leave it long.
+
+    accum = list()
+    for depth, line in split:
+        accum.extend(
+            _transform(line, indent + "    " * depth, depth > 0 or inside_brackets)
+        )
+    return accum
+
+
+class _Tokens:
+    """Bracket and delimiter structure of a line, skipping over string literals."""
+
+    def __init__(self, text: str):
+        # (open, close) positions of each bracket pair
+        self.pairs: List[Tuple[int, int]] = list()
+        # (position, priority) of each delimiter at depth zero
+        self.delimiters: List[Tuple[int, int]] = list()
+        # Whether there's a `*args` style unpacking at depth zero
+        self.vararg: bool = False
+
+        stack: List[int] = list()
+        quote = None
+        prev = ""  # Previous non-space character, outside strings
+        for i, c in enumerate(text):
+            if quote is not None:
+                if c == quote and text[i - 1] != "\\":
+                    quote = None
+                continue
+            if c in "\"'":
+                quote = c
+            elif c in "([{":
+                stack.append(i)
+            elif c in ")]}":
+                self.pairs.append((stack.pop(), i))
+            elif not stack and c == ",":
+                self.delimiters.append((i, COMMA_PRIORITY))
+            elif not stack and c == "*" and text[i + 1 : i + 2] != "*":
+                if prev in ("", ",", "(", "[", "="):
+                    self.vararg = True  # Unpacking, not multiplication
+                else:
+                    self.delimiters.append((i, ARITH_PRIORITY))
+            if c != " ":
+                prev = c
+
+    def last_pair(self, text: str) -> Optional[Tuple[int, int]]:
+        """The last bracket pair with anything between its brackets.
+        Empty pairs after it, e.g. the call in `gen(params)()`, are left to the tail, as in `black`."""
+        pairs = [pair for pair in self.pairs if pair[1] - pair[0] > 1]
+        return max(pairs, key=lambda pair: pair[1], default=None)
+
+
+def _left_hand_split(text: str, tokens: _Tokens) -> Optional[List[Tuple[int, str]]]:
+    """Split a function definition at its argument list"""
+    opens = [p for p in tokens.pairs if text[p[0]] == "("]
+    if not opens:
+        return None
+    start, end = min(opens)
+    body = text[start + 1 : end]
+    if "," not in body:
+        body += ","  # Single arguments get a trailing comma
+    return [(0, text[: start + 1]), (1, body), (0, text[end:])]
+
+
+def _right_hand_split(text: str, tokens: _Tokens) -> Optional[List[Tuple[int, str]]]:
+    """Split at the last bracket pair: head, indented body, and tail"""
+    pair = tokens.last_pair(text)
+    if pair is None or pair[0] == 0:
+        return None
+    start, end = pair
+    head, body, tail = text[: start + 1], text[start + 1 : end], text[end:]
+    if not body and len(tail.strip()) < 3:
+        return None
+    lines = [(0, head), (1, body), (0, tail)]
+    return [(depth, line) for depth, line in lines if line]
+
+
+def _delimiter_split(text: str, tokens: _Tokens) -> Optional[List[Tuple[int, str]]]:
+    """Split at the highest-priority delimiters, one part per line"""
+    end = len(text) - 1
+    delimiters = [(i, p) for (i, p) in tokens.delimiters if i != end]
+    if not delimiters:
+        return None
+    priority = max(p for (_, p) in delimiters)
+    accum = list()
+    start = 0
+    for i, p in delimiters:
+        if p != priority:
+            continue
+        if priority == COMMA_PRIORITY:  # Split after commas
+            accum.append(text[start : i + 1].strip())
+            start = i + 1
+        else:  # And before operators
+            accum.append(text[start:i].strip())
+            start = i
+    last = text[start:].strip()
+    if priority == COMMA_PRIORITY and not last.endswith(",") and not tokens.vararg:
+        last += ","
+    accum.append(last)
+    return [(0, part) for part in accum]
+
+
+_formatters = {
+    FormatPolicy.BLACK: format_black,
+    FormatPolicy.BUILTIN: format_builtin,
+}
+
+
+class FormatCache:
+    """# Cache of Formatted Code
+    Keyed by a hash of the unformatted code and formatting policy.
+    Held in memory, up to `max_entries`, and optionally on disk in directory `root`."""
+
+    def __init__(self, root: Optional[Path] = None, max_entries: int = 1024):
+        self.root = Path(root) if root is not None else None
+        self.max_entries = max_entries
+        self.memory: "OrderedDict[str, str]" = OrderedDict()
+        if self.root is not None:
+            self.root.mkdir(parents=True, exist_ok=True)
+
+    def format(self, code: str, policy: FormatPolicy) -> str:
+        """Format `code` with `policy`, from cache if possible."""
+        key = hashlib.sha256(f"{policy.value}:{code}".encode()).hexdigest()
+
+        # Check in memory
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+
+        # Check on disk
+        path = self.root / f"{key}.py" if self.root is not None else None
+        if path is not None and path.exists():
+            formatted = path.read_text()
+        else:
+            formatted = _formatters[policy](code)
+            if path is not None:
+                tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+                tmp.write_text(formatted)
+                os.replace(tmp, path)
+
+        self.memory[key] = formatted
+        if len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+        return formatted
@@ -0,0 +1,202 @@
+"""
+# Dependency Graph
+
+The cell-hierarchy graph: each cell, and the (non-primitive) cells it instantiates.
+
+Everything here is iterative, so hierarchy depth is limited only by memory, not by Python's recursion limit.
+Orderings are deterministic: ties are broken by (lib, cell) name.
+"""
+
+import heapq
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set
+
+# Local Imports
+from .schematic import BagSchematic, LibCell
+
+
+# Primitive cells, defined not by these imports but (somewhere) elsewhere
+PRIM_CELLS: FrozenSet[LibCell] = frozenset(
+    LibCell(lib, cell)
+    for (lib, cell) in [
+        ("BAG_prim", "nmos4_standard"),
+        ("BAG_prim", "pmos4_standard"),
+        ("BAG_prim", "ndio_standard"),
+        ("BAG_prim", "pdio_standard"),
+        ("BAG_prim", "res_metal_1"),
+        ("BAG_prim", "res_metal_2"),
+        ("BAG_prim", "res_metal_3"),
+        ("BAG_prim", "res_metal_4"),
+        ("BAG_prim", "res_metal_5"),
+        ("BAG_prim", "res_metal_6"),
+        ("BAG_prim", "res_metal_7"),
+        ("BAG_prim", "res_metal_8"),
+        ("BAG_prim", "res_metal_9"),
+        ("basic", "cds_thru"),
+        ("basic", "noConn"),
+        ("analogLib", "cap"),
+        ("analogLib", "dcblock"),
+        ("analogLib", "dcfeed"),
+        ("analogLib", "gnd"),
+        ("analogLib", "idc"),
+        ("analogLib", "ind"),
+        ("analogLib", "iprobe"),
+        ("analogLib", "port"),
+        ("analogLib", "res"),
+        ("analogLib", "switch"),
+        ("analogLib", "vdc"),
+        ("analogLib", "vcvs"),
+        ("analogLib", "vpulse"),
+        ("analogLib", "vpwlf"),
+        ("analogLib", "vsin"),
+        ("analogLib", "vsrc"),
+    ]
+)
+
+
+class CycleError(RuntimeError):
+    """# Dependency Cycle
+    Raised when the hierarchy instantiates itself. `cycle` lists the cells around the loop,
+    with the first repeated at the end, e.g. `[a, b, a]`."""
+
+    def __init__(self, cycle: List[LibCell]):
+        self.cycle = cycle
+        names = " -> ".join(f"{c.lib}.{c.cell}" for c in cycle)
+        super().__init__(f"Dependency cycle: {names}")
+
+
+class DependencyGraph:
+    """
+    # Dependency Graph
+
+    * `deps` maps each cell to the set of cells it instantiates, excluding primitives.
+    * `missing` holds the cells which were instantiated, but whose definitions couldn't be found.
+      These are left out of `deps`, and out of every ordering.
+    """
+
+    def __init__(self):
+        self.deps: Dict[LibCell, Set[LibCell]] = dict()
+        self.missing: Set[LibCell] = set()
+
+    def __len__(self) -> int:
+        return len(self.deps)
+
+    def __contains__(self, libcell: LibCell) -> bool:
+        return libcell in self.deps
+
+    def add(self, libcell: LibCell, deps: Iterable[LibCell]) -> None:
+        """Add `libcell`, with dependencies `deps`"""
+        self.deps[libcell] = set(deps)
+
+    def dependents(self) -> Dict[LibCell, Set[LibCell]]:
+        """The inverse graph: each cell, mapped to the cells which instantiate it"""
+        rv: Dict[LibCell, Set[LibCell]] = {c: set() for c in self.deps}
+        for cell, deps in self.deps.items():
+            for dep in deps:
+                if dep in rv:
+                    rv[dep].add(cell)
+        return rv
+
+
+def schematic_deps(
+    sch: BagSchematic, prims: FrozenSet[LibCell] = PRIM_CELLS
+) -> Set[LibCell]:
+    """Get the set of non-primitive cells instantiated by `sch`"""
+    deps = set(LibCell(i.lib_name, i.cell_name) for i in sch.instances.values())
+    return deps - prims
+
+
+def build_graph(
+    roots: Iterable[LibCell],
+    get_deps: Callable[[LibCell], Optional[Iterable[LibCell]]],
+    prims: FrozenSet[LibCell] = PRIM_CELLS,
+) -> DependencyGraph:
+    """Build the `DependencyGraph` of `roots` and everything below them.
+    `get_deps` gets a cell's dependencies, or `None` if it can't be found. It is called once per cell."""
+    graph = DependencyGraph()
+    stack = [r for r in roots if r not in prims]
+    while stack:
+        libcell = stack.pop()
+        if libcell in graph.deps or libcell in graph.missing:
+            continue  # Already done
+        deps = get_deps(libcell)
+        if deps is None:
+            graph.missing.add(libcell)
+            continue
+        deps = set(d for d in deps if d not in prims)
+        graph.deps[libcell] = deps
+        stack.extend(d for d in deps if d not in graph.deps)
+
+    # Drop edges to cells we couldn't find
+    if graph.missing:
+        for deps in graph.deps.values():
+            deps -= graph.missing
+    return graph
+
+
+def _key(libcell: LibCell):
+    return (libcell.lib, libcell.cell)
+
+
+def toposort(graph: DependencyGraph) -> List[LibCell]:
+    """Sort `graph` in dependency order, dependencies first, with Kahn's algorithm.
+    Raises a `CycleError` if the graph has a cycle."""
+    dependents = graph.dependents()
+    indegree = {c: len(deps & graph.deps.keys()) for c, deps in graph.deps.items()}
+    ready = [(_key(c), c) for c, n in indegree.items() if n == 0]
+    heapq.heapify(ready)
+
+    order: List[LibCell] = list()
+    while ready:
+        _, libcell = heapq.heappop(ready)
+        order.append(libcell)
+        for parent in dependents[libcell]:
+            indegree[parent] -= 1
+            if indegree[parent] == 0:
+                heapq.heappush(ready, (_key(parent), parent))
+
+    if len(order) != len(graph.deps):
+        remaining = set(c for c, n in indegree.items() if n > 0)
+        raise CycleError(find_cycle(graph, remaining))
+    return order
+
+
+def levels(graph: DependencyGraph) -> List[List[LibCell]]:
+    """Group `graph` into levels. Level zero has no dependencies, and each cell in level N
+    depends only on cells in levels below N. Cells within a level are independent of one another.
+    Raises a `CycleError` if the graph has a cycle."""
+    dependents = graph.dependents()
+    indegree = {c: len(deps & graph.deps.keys()) for c, deps in graph.deps.items()}
+    level = sorted((c for c, n in indegree.items() if n == 0), key=_key)
+
+    rv: List[List[LibCell]] = list()
+    done = 0
+    while level:
+        rv.append(level)
+        done += len(level)
+        next_level = list()
+        for libcell in level:
+            for parent in dependents[libcell]:
+                indegree[parent] -= 1
+                if indegree[parent] == 0:
+                    next_level.append(parent)
+        level = sorted(next_level, key=_key)
+
+    if done != len(graph.deps):
+        remaining = set(c for c, n in indegree.items() if n > 0)
+        raise CycleError(find_cycle(graph, remaining))
+    return rv
+
+
+def find_cycle(graph: DependencyGraph, among: Set[LibCell]) -> List[LibCell]:
+    """Find a cycle among cells `among`, e.g. those left over by Kahn's algorithm.
+    Every such cell is on or downstream of a cycle, so walking dependencies within `among` must find one."""
+    start = min(among, key=_key)
+    path: List[LibCell] = [start]
+    position = {start: 0}
+    while True:
+        deps = sorted((d for d in graph.deps[path[-1]] if d in among), key=_key)
+        nxt = deps[0]
+        if nxt in position:
+            return path[position[nxt] :] + [nxt]
+        position[nxt] = len(path)
+        path.append(nxt)
@@ -0,0 +1,230 @@
+"""
+# Incremental Porting
+
+Re-port only the schematics which changed since the last run, plus every cell which (transitively) instantiates them.
+
+Each run records a manifest in its output directory, with an entry per schematic-YAML file:
+its content hash, the cell it defines, that cell's dependencies, and the module written for it.
+The next run compares against it:
+* Files whose (mtime, size) match their entry are unchanged, without reading them.
+* Files whose content hash matches their entry are unchanged too (e.g. after a `touch`).
+* Everything else, including new files and those whose output module has gone missing, is re-ported.
+* Then so is every cell whose dependencies reach a changed, added or removed cell.
+
+The manifest also records the options which shape each module: its formatting, validation, emission and loader.
+Runs with different options re-port everything.
+"""
+
+import os, json, time, hashlib
+from pathlib import Path
+from concurrent.futures import Executor
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+# PyPi Imports
+from pydantic.dataclasses import dataclass
+
+# Local Imports
+from .schematic import LibCell
+from .code import Emission
+from .batch import BatchSummary, PortOptions, PortResult, port_paths, write_packages
+
+MANIFEST_NAME = ".bagporting-manifest.json"
+MANIFEST_VERSION = 2
+
+
+@dataclass
+class ManifestEntry:
+    """# Manifest record of a ported schematic-YAML file"""
+
+    sch_path: str
+    mtime_ns: int
+    size: int
+    digest: str  # Content hash
+    lib_name: str
+    cell_name: str
+    dependencies: List[Tuple[str, str]]  # (lib, cell) pairs
+    out_path: str
+
+    @property
+    def libcell(self) -> LibCell:
+        return LibCell(self.lib_name, self.cell_name)
+
+
+# Manifest content, keyed by `sch_path`
+Manifest = Dict[str, ManifestEntry]
+
+# Fingerprint of the `PortOptions` a manifest's modules were ported with. See `options_fingerprint`.
+Fingerprint = Dict[str, Any]
+
+
+def options_fingerprint(options: Optional[PortOptions]) -> Fingerprint:
+    """Fingerprint of the `options` which shape each ported module"""
+    options = options or PortOptions()
+    return dict(
+        fast=options.fast,
+        format=options.format.value,
+        validation=options.validation.value,
+        emission=options.emission.value,
+    )
+
+
+def load_manifest(outdir: Path) -> Tuple[Manifest, Optional[Fingerprint]]:
+    """Load the manifest from `outdir`, and the fingerprint of the options it was ported with.
+    Missing or out-of-date manifests load as empty, with no fingerprint."""
+    try:
+        data = json.loads((Path(outdir) / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return dict(), None
+    if data.get("version", None) != MANIFEST_VERSION:
+        return dict(), None
+    entries = [ManifestEntry(**e) for e in data["entries"]]
+    return {e.sch_path: e for e in entries}, data["options"]
+
+
+def save_manifest(outdir: Path, manifest: Manifest, fingerprint: Fingerprint) -> None:
+    """Save `manifest` to `outdir`, with the `fingerprint` of the options it was ported with"""
+    entries = [asdict(manifest[k]) for k in sorted(manifest)]
+    data = dict(version=MANIFEST_VERSION, options=fingerprint, entries=entries)
+    path = Path(outdir) / MANIFEST_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(data, indent=1))
+    os.replace(tmp, path)
+
+
+def file_digest(path: Path) -> str:
+    """Content hash of the file at `path`"""
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def is_unchanged(path: Path, entry: Optional[ManifestEntry]) -> bool:
+    """Boolean indication of whether `path` is unchanged since it was recorded as `entry`.
+    Updates the entry's (mtime, size) stamp if only those changed."""
+    if entry is None or not Path(entry.out_path).exists():
+        return False
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False  # Let the port itself report it
+    if (stat.st_mtime_ns, stat.st_size) == (entry.mtime_ns, entry.size):
+        return True
+    if file_digest(path) != entry.digest:
+        return False
+    entry.mtime_ns, entry.size = stat.st_mtime_ns, stat.st_size
+    return True
+
+
+def dependents(manifest: Manifest, targets: Set[LibCell]) -> Set[str]:
+    """Get the `sch_path`s of every cell in `manifest` which transitively instantiates any of `targets`."""
+
+    # Invert the dependency graph: cell => the entries that instantiate it
+    parents: Dict[LibCell, List[ManifestEntry]] = dict()
+    for entry in manifest.values():
+        for lib, cell in entry.dependencies:
+            parents.setdefault(LibCell(lib, cell), list()).append(entry)
+
+    accum: Set[str] = set()
+    stack = list(targets)
+    seen = set(targets)
+    while stack:
+        for entry in parents.get(stack.pop(), []):
+            accum.add(entry.sch_path)
+            if entry.libcell not in seen:
+                seen.add(entry.libcell)
+                stack.append(entry.libcell)
+    return accum
+
+
+def record(manifest: Manifest, results: List[PortResult]) -> Set[LibCell]:
+    """Record `results` in `manifest`. Returns the set of cells they defined, old and new."""
+    touched: Set[LibCell] = set()
+    for r in results:
+        key = str(r.sch_path)
+        prior = manifest.pop(key, None)
+        if prior is not None:
+            touched.add(prior.libcell)
+        if not r.ok:
+            continue  # Failures stay out of the manifest, so they're retried next time
+        stat = os.stat(r.sch_path)
+        manifest[key] = ManifestEntry(
+            sch_path=key,
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            digest=file_digest(r.sch_path),
+            lib_name=r.libcell.lib,
+            cell_name=r.libcell.cell,
+            dependencies=[(d.lib, d.cell) for d in r.dependencies],
+            out_path=str(r.out_path),
+        )
+        touched.add(r.libcell)
+    return touched
+
+
+def port_incremental(
+    paths: Sequence[Path],
+    outdir: Path,
+    workers: Optional[int] = None,
+    options: Optional[PortOptions] = None,
+    executor: Optional[Executor] = None,
+) -> BatchSummary:
+    """Incrementally port the schematics in `paths` to `outdir`.
+    Arguments are as for `batch.port_paths`. Parameter synthesis (`PortOptions.params`) is not supported."""
+    if options is not None and options.params:
+        raise ValueError("Incremental porting does not support parameter synthesis")
+    start = time.perf_counter()
+    outdir = Path(outdir)
+    manifest, recorded = load_manifest(outdir)
+    fingerprint = options_fingerprint(options)
+    recorded_libs = set(e.lib_name for e in manifest.values())
+    paths = [Path(p).absolute() for p in paths]
+    keys = set(str(p) for p in paths)
+
+    # Drop any schematics which have been removed, along with their output
+    touched: Set[LibCell] = set()
+    for key in list(manifest):
+        if key not in keys:
+            entry = manifest.pop(key)
+            touched.add(entry.libcell)
+            try:
+                Path(entry.out_path).unlink()
+            except OSError:
+                pass
+
+    # First pass: port everything that changed itself, or everything if the options did
+    if recorded != fingerprint:
+        changed = paths
+    else:
+        changed = [p for p in paths if not is_unchanged(p, manifest.get(str(p), None))]
+    results = port_paths(changed, outdir, workers, options, executor=executor)
+    touched |= record(manifest, results)
+
+    # Second pass: port everything that depends on them
+    done = set(str(p) for p in changed)
+    parents = sorted(dependents(manifest, touched) - done)
+    parents = [Path(p) for p in parents]
+    parent_results = port_paths(parents, outdir, workers, options, executor=executor)
+    record(manifest, parent_results)
+    results += parent_results
+
+    # Re-list the packages of every library which gained or lost a cell.
+    # If the emission mode changed, write (or remove) the packages of every library instead.
+    libs = set(t.lib for t in touched) | set(r.libcell.lib for r in results if r.ok)
+    emission = Emission(fingerprint["emission"])
+    if recorded is not None and recorded["emission"] != emission.value:
+        libs |= recorded_libs | set(e.lib_name for e in manifest.values())
+        if emission != Emission.PACKAGE:
+            for lib in libs:
+                try:
+                    (outdir / lib / "__init__.py").unlink()
+                except OSError:
+                    pass
+    if emission == Emission.PACKAGE:
+        write_packages(outdir, [lib for lib in libs if (outdir / lib).is_dir()])
+
+    save_manifest(outdir, manifest, fingerprint)
+    return BatchSummary(
+        results=results,
+        elapsed=time.perf_counter() - start,
+        unchanged=len(paths) - len(results),
+    )
@@ -0,0 +1,258 @@
+"""
+# Candidate Index
+
+A persistent, on-disk index of schematic-generator candidates, mapping each `LibCell` to its `SourcePaths`.
+
+The index is built by the `Scanner`, and records what it found in each directory along with that directory's mtime.
+Updates re-list only the directories whose mtimes (or whose `netlist_info` mtimes) have changed,
+and merely `stat` the rest. Lookups are then dictionary accesses.
+
+Directory mtimes change when entries are added, removed or renamed, but not when a file is re-written in place.
+A schematic re-written in place to define a different cell isn't noticed until its directory next changes,
+or the index is rebuilt from scratch.
+"""
+
+import os, sys, json, dataclasses, argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Local Imports
+from .schematic import LibCell, SourcePaths, _fast_load
+from .scan import DEFAULT_EXCLUDES, DirScan, Scanner
+
+INDEX_VERSION = 1
+
+
+@dataclasses.dataclass
+class IndexUpdate:
+    """# Summary of an index update"""
+
+    rescanned: int = 0  # Directories listed
+    reused: int = 0  # Directories unchanged, only `stat`ed
+    removed: int = 0  # Directories no longer found
+
+
+def read_libcell(sch_path: str) -> Optional[LibCell]:
+    """Read the `LibCell` defined by schematic-YAML file `sch_path`.
+    BAG writes `lib_name` and `cell_name` as its first lines; we read only as far as them,
+    falling back to loading the whole file if they aren't there."""
+    names = dict()
+    try:
+        with open(sch_path, "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("lib_name", "cell_name"):
+                    names[key] = value.strip().strip("'\"")
+                    if len(names) == 2:
+                        return LibCell(names["lib_name"], names["cell_name"])
+                elif key == "view_name" or not line[:1].isalnum():
+                    break  # Past the header
+            f.seek(0)
+            content = _fast_load(f)
+        return LibCell(content["lib_name"], content["cell_name"])
+    except Exception:
+        return None  # Unreadable, or not a schematic
+
+
+class CandidateIndex:
+    """
+    # Candidate Index
+
+    Stored as JSON at `path`. Typical usage:
+    ```
+    index = CandidateIndex.load(path)
+    index.update(search_paths)
+    index.save()
+    index.get(LibCell("bag3_digital", "inv"))
+    ```
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.globs: Tuple[Tuple[str, ...], Tuple[str, ...]] = ((), ())
+        self.dirs: Dict[str, DirScan] = dict()  # Directory path => its last scan
+        self.libcells: Dict[str, Tuple[str, str]] = dict()  # sch_path => (lib, cell)
+        self.cells: Dict[LibCell, SourcePaths] = dict()
+
+    @classmethod
+    def load(cls, path: Path) -> "CandidateIndex":
+        """Load the index at `path`. Missing or out-of-date indices load as empty."""
+        index = cls(path)
+        try:
+            data = json.loads(index.path.read_text())
+        except (OSError, ValueError):
+            return index
+        if data.get("version", None) != INDEX_VERSION:
+            return index
+
+        index.globs = tuple(tuple(g) for g in data["globs"])
+        for d in data["dirs"]:
+            d["candidates"] = [tuple(c) for c in d["candidates"]]
+            scan = DirScan(**d)
+            index.dirs[scan.path] = scan
+        index.libcells = {k: tuple(v) for k, v in data["libcells"].items()}
+        for lib, cell, prefix, module_path, sch_path in data["cells"]:
+            index.cells[LibCell(lib, cell)] = SourcePaths(
+                prefix=Path(prefix),
+                module_path=Path(module_path),
+                sch_path=Path(sch_path),
+            )
+        return index
+
+    def save(self) -> None:
+        """Save to `self.path`, atomically"""
+        cells = [
+            (k.lib, k.cell, str(v.prefix), str(v.module_path), str(v.sch_path))
+            for k, v in self.cells.items()
+        ]
+        data = dict(
+            version=INDEX_VERSION,
+            globs=self.globs,
+            dirs=[dataclasses.asdict(self.dirs[k]) for k in sorted(self.dirs)],
+            libcells=self.libcells,
+            cells=sorted(cells),
+        )
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, self.path)
+
+    def get(self, libcell: LibCell) -> Optional[SourcePaths]:
+        """Look up the `SourcePaths` of `libcell`. Returns `None` if not found."""
+        return self.cells.get(libcell, None)
+
+    def candidates(self) -> Iterator[SourcePaths]:
+        """Iterate over all indexed candidates"""
+        return iter(self.cells.values())
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def update(
+        self, roots: Sequence[Path], scanner: Optional[Scanner] = None
+    ) -> IndexUpdate:
+        """Bring the index up to date with the file system under `roots`.
+        Changing the `scanner`'s include or exclude globs discards all prior content.
+        Where more than one root provides the same `LibCell`, the first root wins, as on `sys.path`."""
+        scanner = scanner or Scanner()
+        if scanner.globs != self.globs:
+            self.globs = scanner.globs
+            self.dirs, self.libcells = dict(), dict()
+
+        summary = IndexUpdate()
+        dirs: Dict[str, DirScan] = dict()
+        found: List[Tuple[int, str, str, str]] = list()  # (root-num, root, module, sch)
+
+        with ThreadPoolExecutor(scanner.workers) as pool:
+            pending = dict()  # Future => root-number
+            for num, root in enumerate(roots):
+                path = str(Path(root).absolute())
+                if os.path.isdir(path):
+                    pending[pool.submit(self._refresh, scanner, path)] = num
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    num = pending.pop(future)
+                    try:
+                        scan, rescanned = future.result()
+                    except OSError:
+                        continue  # Unreadable directory. Skip it.
+                    if rescanned:
+                        summary.rescanned += 1
+                    else:
+                        summary.reused += 1
+                    dirs[scan.path] = scan
+                    for module_path, sch_path in scan.candidates:
+                        found.append((num, str(roots[num]), module_path, sch_path))
+                    for subdir in scan.subdirs:
+                        # Directories under overlapping roots are visited once per root
+                        pending[pool.submit(self._refresh, scanner, subdir)] = num
+
+        summary.removed = len(set(self.dirs) - set(dirs))
+        self.dirs = dirs
+        live = set(sch_path for (_, _, _, sch_path) in found)
+        self.libcells = {k: v for k, v in self.libcells.items() if k in live}
+
+        # Sort by root and path, so the same file-system content always produces the same index
+        self.cells = dict()
+        for _, root, module_path, sch_path in sorted(found):
+            libcell = self.libcells.get(sch_path, None)
+            if libcell is None:
+                continue  # Unreadable schematic
+            libcell = LibCell(*libcell)
+            if libcell not in self.cells:
+                self.cells[libcell] = SourcePaths(
+                    prefix=Path(root),
+                    module_path=Path(module_path),
+                    sch_path=Path(sch_path),
+                )
+        return summary
+
+    def _refresh(self, scanner: Scanner, path: str) -> Tuple[DirScan, bool]:
+        """Get an up-to-date `DirScan` of directory `path`, re-listing it only if it changed.
+        Returns it along with a boolean indication of whether it was re-listed."""
+        prior = self.dirs.get(path, None)
+        if prior is not None and prior.mtime_ns == os.stat(path).st_mtime_ns:
+            if prior.netlist_info_mtime_ns is None:
+                return prior, False
+            netlist_info = os.path.join(path, "netlist_info")
+            try:
+                if prior.netlist_info_mtime_ns == os.stat(netlist_info).st_mtime_ns:
+                    return prior, False
+            except OSError:
+                pass
+
+        scan = scanner.scan_dir(path)
+        for _, sch_path in scan.candidates:
+            libcell = read_libcell(sch_path)
+            if libcell is None:
+                self.libcells.pop(sch_path, None)
+            else:
+                self.libcells[sch_path] = (libcell.lib, libcell.cell)
+        return scan, True
+
+
+def main(argv: Sequence[str]) -> None:
+    """Command-line entry point, for `run.py search`"""
+    parser = argparse.ArgumentParser(
+        prog="run.py search",
+        description="Search for BAG schematic generators",
+    )
+    parser.add_argument("paths", nargs="*", help="Search paths (default: sys.path)")
+    parser.add_argument(
+        "--index", type=Path, help="Persistent candidate index file to use and update"
+    )
+    parser.add_argument(
+        "--include", action="append", default=[], help="Module-path glob to include"
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        help="Directory glob to prune, in addition to the defaults",
+    )
+    parser.add_argument("-j", "--workers", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    roots = [Path(p) for p in (args.paths or sys.path) if p]
+    scanner = Scanner(
+        include=args.include,
+        exclude=DEFAULT_EXCLUDES + tuple(args.exclude),
+        workers=args.workers,
+    )
+    if args.index is None:
+        for candidate in scanner.scan(roots):
+            print(candidate)
+        return
+
+    index = CandidateIndex.load(args.index)
+    summary = index.update(roots, scanner)
+    index.save()
+    for libcell, candidate in index.cells.items():
+        print(f"{libcell.lib}.{libcell.cell}: {candidate.module_path}")
+    print(
+        f"{len(index)} cells. {summary.rescanned} directories scanned, "
+        f"{summary.reused} unchanged, {summary.removed} removed."
+    )
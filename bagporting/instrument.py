@@ -0,0 +1,192 @@
+"""
+# Instrumentation
+
+Per-cell timing, counting and profiling of the porting pipeline.
+
+Each cell gets a `Recorder`, which times the pipeline's stages (`load`, `convert`, `codegen`, `validate`, `format`, `write`),
+counts the sizes of what it converts, and optionally captures a `cProfile` or `tracemalloc` profile.
+Results come back as a `CellStats` per cell, and batch runs can write them to a JSON or CSV report.
+
+When disabled, cells get the shared `NULL_RECORDER`, whose methods do nothing at all.
+"""
+
+import io, csv, json, time, cProfile, pstats, tracemalloc
+from enum import Enum
+from pathlib import Path
+from dataclasses import field, asdict
+from typing import Dict, List, Optional, Sequence, Union
+
+# PyPi Imports
+from pydantic.dataclasses import dataclass
+
+
+class Profiling(Enum):
+    """# Per-cell Profiling Mode"""
+
+    OFF = "off"
+    CPROFILE = "cprofile"  # Capture the top functions by cumulative time
+    # Capture peak traced memory. Slows everything else down.
+    TRACEMALLOC = "tracemalloc"
+
+
+# Number of functions listed in each cell's `cProfile` summary
+PROFILE_LINES = 20
+
+
+@dataclass
+class CellStats:
+    """# Instrumentation results for a single cell"""
+
+    sch_path: str
+    stages: Dict[str, float] = field(default_factory=dict)  # Stage => seconds
+    counters: Dict[str, int] = field(default_factory=dict)
+    profile: Optional[str] = None  # `cProfile` summary
+    peak_bytes: Optional[int] = None  # Peak traced memory
+
+
+class _Stage:
+    """Context manager timing a single stage"""
+
+    __slots__ = ("stages", "name", "start")
+
+    def __init__(self, stages: Dict[str, float], name: str):
+        self.stages = stages
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *_) -> None:
+        elapsed = time.perf_counter() - self.start
+        self.stages[self.name] = self.stages.get(self.name, 0.0) + elapsed
+
+
+class Recorder:
+    """# Per-cell Recorder
+    Usage:
+    ```
+    rec.start()
+    with rec.stage("load"):
+        ...
+    rec.count("instances", 12)
+    stats = rec.stop()
+    ```
+    """
+
+    enabled = True
+
+    def __init__(self, sch_path: str, profiling: Profiling = Profiling.OFF):
+        self.sch_path = str(sch_path)
+        self.profiling = profiling
+        self.stages: Dict[str, float] = dict()
+        self.counters: Dict[str, int] = dict()
+        self.profiler: Optional[cProfile.Profile] = None
+
+    def start(self) -> None:
+        """Start profiling, if enabled"""
+        if self.profiling == Profiling.CPROFILE:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif self.profiling == Profiling.TRACEMALLOC:
+            tracemalloc.start()
+
+    def stage(self, name: str) -> _Stage:
+        """Time a stage, as a context manager. Repeated stages accumulate."""
+        return _Stage(self.stages, name)
+
+    def count(self, name: str, num: int) -> None:
+        self.counters[name] = self.counters.get(name, 0) + num
+
+    def stop(self) -> CellStats:
+        """Stop profiling, and collect the results"""
+        stats = CellStats(
+            sch_path=self.sch_path, stages=self.stages, counters=self.counters
+        )
+        if self.profiler is not None:
+            self.profiler.disable()
+            text = io.StringIO()
+            ps = pstats.Stats(self.profiler, stream=text).sort_stats("cumulative")
+            ps.print_stats(PROFILE_LINES)
+            stats.profile = text.getvalue()
+            self.profiler = None
+        elif self.profiling == Profiling.TRACEMALLOC and tracemalloc.is_tracing():
+            _, stats.peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        return stats
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *_) -> None:
+        pass
+
+
+class _NullRecorder:
+    """# Disabled Recorder
+    Same interface as `Recorder`, doing nothing. Callers check `enabled` before computing anything to `count`."""
+
+    enabled = False
+    _stage = _NullStage()
+
+    def start(self) -> None:
+        pass
+
+    def stage(self, name: str) -> _NullStage:
+        return self._stage
+
+    def count(self, name: str, num: int) -> None:
+        pass
+
+    def stop(self) -> None:
+        return None
+
+
+NULL_RECORDER = _NullRecorder()
+
+
+def recorder(
+    sch_path: str, enabled: bool, profiling: Profiling = Profiling.OFF
+) -> Union[Recorder, _NullRecorder]:
+    """Get a `Recorder` for `sch_path`, or the `NULL_RECORDER` if neither `enabled` nor profiling"""
+    if not enabled and profiling == Profiling.OFF:
+        return NULL_RECORDER
+    return Recorder(sch_path, profiling)
+
+
+def stage_totals(stats: Sequence[CellStats]) -> Dict[str, float]:
+    """Total seconds spent in each stage, across all of `stats`"""
+    totals: Dict[str, float] = dict()
+    for s in stats:
+        for name, elapsed in s.stages.items():
+            totals[name] = totals.get(name, 0.0) + elapsed
+    return totals
+
+
+def write_report(stats: Sequence[CellStats], path: Path) -> None:
+    """Write `stats` to `path`, as CSV if its suffix is `.csv`, and otherwise as JSON.
+    CSV reports have a row per cell, and leave out `cProfile` summaries."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix != ".csv":
+        content = dict(totals=stage_totals(stats), cells=[asdict(s) for s in stats])
+        path.write_text(json.dumps(content, indent=1))
+        return
+
+    stage_names: List[str] = list()
+    counter_names: List[str] = list()
+    for s in stats:
+        stage_names += [k for k in s.stages if k not in stage_names]
+        counter_names += [k for k in s.counters if k not in counter_names]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["sch_path"] + stage_names + counter_names + ["peak_bytes"])
+        for s in stats:
+            row = [s.sch_path]
+            row += [s.stages.get(k, "") for k in stage_names]
+            row += [s.counters.get(k, "") for k in counter_names]
+            row.append("" if s.peak_bytes is None else s.peak_bytes)
+            writer.writerow(row)
@@ -0,0 +1,532 @@
+"""
+# Binary IR Files
+
+A compact, columnar binary serialization of converted `SchematicModule`s,
+for downstream tools which want a ported library's netlist structure without re-loading and re-converting its YAML.
+
+Files are a short header, followed by flat tables of little-endian 32-bit integers:
+* `strs` holds the offsets of each interned string in `blob`, a single UTF-8 buffer. Every name is stored once per file.
+* `cells` has a row per module: its library and cell names, and the ranges of its rows in each of the tables below.
+* `ports`, `signals`, `insts`, `conns` and `deps` hold the content of each module, referring to strings by index.
+* `nodes` and `parts` are the interned connection table. Each distinct `Connection` is stored once, as a node.
+
+`IrFile` memory-maps a file and views each table in place, without copying or decoding it.
+Strings are decoded, and objects created, only as they're queried.
+
+Create files from schematic YAML with `run.py export-ir`, or from `SchematicModule`s with `IrWriter`.
+"""
+
+import os, sys, json, mmap, time, struct, argparse
+from enum import IntEnum
+from array import array
+from pathlib import Path
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Local Imports
+from .schematic import BagSchematic, LibCell, SchematicPinDir, loads_sch
+from .schematic_module import (
+    Bus,
+    Concat,
+    Connection,
+    Instance,
+    Port,
+    Range,
+    Repeat,
+    SchematicModule,
+    SignalRef,
+    Slice,
+    convert_schematic,
+)
+from .procs import mp_context
+from .batch import PortOptions, bounded_map, collect_paths, documents, load
+
+MAGIC = b"BAGIR\0\0\0"
+IR_VERSION = 1
+
+# File header: magic, version, number of tables. Followed by a `_TABLE` entry per table.
+_HEADER = struct.Struct("<8sII")
+# Table entry: name, byte offset, byte length
+_TABLE = struct.Struct("<8sQQ")
+
+# Integer tables, and the number of fields in each of their rows
+STRIDES = dict(
+    strs=1,  # Offset of each string in `blob`, plus one for the end of the last
+    cells=10,  # lib, cell, then (start, count) of its ports, signals, insts and deps
+    ports=3,  # name, width, direction
+    signals=2,  # name, width
+    insts=7,  # name, width, lib, cell, conns start, conns count, params (as JSON)
+    conns=2,  # port name, node
+    deps=2,  # lib, cell
+    nodes=4,  # kind, then per-kind fields. See `NodeKind`.
+    parts=1,  # Node of each part of a concatenation
+)
+
+# Pin directions, by their index in `ports` rows
+PIN_DIRS = tuple(SchematicPinDir)
+
+
+class NodeKind(IntEnum):
+    """# Connection Node Kinds
+    And the fields of each, in their `nodes` row."""
+
+    REF = 0  # name
+    BIT = 1  # name, index
+    RANGE = 2  # name, top, bot
+    REPEAT = 3  # target node, num
+    CONCAT = 4  # parts start, parts count
+
+
+class IrWriter:
+    """
+    # IR File Writer
+
+    Usage:
+    ```
+    writer = IrWriter()
+    for module in modules:
+        writer.add(module)
+    writer.write(path)
+    ```
+    """
+
+    def __init__(self):
+        self.strings: Dict[str, int] = dict()  # Interned strings, by index
+        # Interned connections, by node index
+        self.nodes: Dict[Connection, int] = dict()
+        self.tables: Dict[str, array] = {name: array("I") for name in STRIDES}
+        self.tables["strs"].append(0)
+        self.blob = bytearray()
+
+    def string(self, s: str) -> int:
+        """Intern string `s`, returning its index"""
+        idx = self.strings.get(s, None)
+        if idx is None:
+            idx = self.strings[s] = len(self.strings)
+            self.blob += s.encode("utf-8")
+            self.tables["strs"].append(len(self.blob))
+        return idx
+
+    def node(self, conn: Connection) -> int:
+        """Intern connection `conn`, returning its node index"""
+        idx = self.nodes.get(conn, None)
+        if idx is not None:
+            return idx
+        if isinstance(conn, SignalRef):
+            row = (NodeKind.REF, self.string(conn.name), 0, 0)
+        elif isinstance(conn, Slice) and isinstance(conn.index, Range):
+            index = conn.index
+            row = (NodeKind.RANGE, self.string(conn.name), index.top, index.bot)
+        elif isinstance(conn, Slice):
+            row = (NodeKind.BIT, self.string(conn.name), conn.index, 0)
+        elif isinstance(conn, Repeat):
+            row = (NodeKind.REPEAT, self.node(conn.target), conn.num, 0)
+        elif isinstance(conn, Concat):
+            parts = [self.node(p) for p in conn.parts]
+            row = (NodeKind.CONCAT, len(self.tables["parts"]), len(parts), 0)
+            self.tables["parts"].extend(parts)
+        else:
+            raise TypeError(f"Invalid Connection {conn}")
+        nodes = self.tables["nodes"]
+        idx = self.nodes[conn] = len(nodes) // STRIDES["nodes"]
+        nodes.extend(row)
+        return idx
+
+    def add(self, module: SchematicModule) -> None:
+        """Add `module` to the file"""
+        t = self.tables
+        s = self.string
+        starts = [
+            len(t[name]) // STRIDES[name] for name in ("ports", "signals", "insts")
+        ]
+
+        for port in module.ports:
+            t["ports"].extend((s(port.name), port.width, PIN_DIRS.index(port.portdir)))
+        for signal in module.signals:
+            t["signals"].extend((s(signal.name), signal.width))
+        for inst in module.instances:
+            conns_start = len(t["conns"]) // STRIDES["conns"]
+            for portname, conn in inst.conns.items():
+                t["conns"].extend((s(portname), self.node(conn)))
+            params = json.dumps(inst.params, sort_keys=True, default=str)
+            t["insts"].extend(
+                (
+                    s(inst.ident.name),
+                    inst.ident.width,
+                    s(inst.of.lib),
+                    s(inst.of.cell),
+                    conns_start,
+                    len(inst.conns),
+                    s(params),
+                )
+            )
+        deps_start = len(t["deps"]) // STRIDES["deps"]
+        for dep in sorted(module.dependencies, key=lambda d: (d.lib, d.cell)):
+            t["deps"].extend((s(dep.lib), s(dep.cell)))
+
+        bagsch = module.bagsch
+        t["cells"].extend(
+            (
+                s(bagsch.lib_name),
+                s(bagsch.cell_name),
+                starts[0],
+                len(module.ports),
+                starts[1],
+                len(module.signals),
+                starts[2],
+                len(module.instances),
+                deps_start,
+                len(module.dependencies),
+            )
+        )
+
+    def write(self, path: Path) -> int:
+        """Write the file to `path`, atomically. Returns its size in bytes."""
+        tables = list()
+        for name, table in self.tables.items():
+            if sys.byteorder != "little":
+                table = array("I", table)
+                table.byteswap()
+            tables.append((name, table.tobytes()))
+        tables.append(("blob", bytes(self.blob)))
+
+        offset = _HEADER.size + len(tables) * _TABLE.size
+        header = [_HEADER.pack(MAGIC, IR_VERSION, len(tables))]
+        for name, data in tables:
+            header.append(_TABLE.pack(name.encode("ascii"), offset, len(data)))
+            offset += len(data)
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        with open(tmp, "wb") as f:
+            f.writelines(header)
+            f.writelines(data for _, data in tables)
+        os.replace(tmp, path)
+        return offset
+
+
+class IrFile:
+    """
+    # IR File Reader
+
+    Memory-maps an IR file, viewing its tables in place.
+    Nothing is decoded until queried, and each string and connection is decoded at most once.
+    Usage:
+    ```
+    with IrFile(path) as ir:
+        idx = ir.find(LibCell("my_lib", "my_cell"))
+        for inst in ir.instances(idx):
+            ...
+    ```
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+        self.tables: Dict[str, memoryview] = dict()
+        magic, version, num_tables = _HEADER.unpack_from(self.view)
+        if magic != MAGIC or version != IR_VERSION:
+            self.close()
+            raise RuntimeError(f"{path} is not a version {IR_VERSION} IR file")
+
+        for num in range(num_tables):
+            pos = _HEADER.size + num * _TABLE.size
+            name, offset, length = _TABLE.unpack_from(self.view, pos)
+            name = name.rstrip(b"\0").decode("ascii")
+            data = self.view[offset : offset + length]
+            if name != "blob":
+                data = _u32(data)
+            self.tables[name] = data
+
+        # Decoded strings, connections, cells and parameters, by index
+        self._strings: Dict[int, str] = dict()
+        self._nodes: Dict[int, Connection] = dict()
+        self._libcells: Dict[Tuple[int, int], LibCell] = dict()
+        self._param_dicts: Dict[int, Dict[str, Any]] = dict()
+        self._cells: Optional[Dict[LibCell, int]] = None
+
+    def __len__(self) -> int:
+        """Number of modules in the file"""
+        return len(self.tables["cells"]) // STRIDES["cells"]
+
+    def string(self, idx: int) -> str:
+        """Get interned string `idx`"""
+        s = self._strings.get(idx, None)
+        if s is None:
+            offsets = self.tables["strs"]
+            data = self.tables["blob"][offsets[idx] : offsets[idx + 1]]
+            s = self._strings[idx] = str(data, "utf-8")
+        return s
+
+    def _rows(self, table: str, start: int, count: int) -> List[int]:
+        """The fields of rows `start` to `start + count` of `table`, as one flat list"""
+        stride = STRIDES[table]
+        return self.tables[table][start * stride : (start + count) * stride].tolist()
+
+    def _cell(self, idx: int) -> List[int]:
+        return self._rows("cells", idx, 1)
+
+    def _libcell(self, lib: int, cell: int) -> LibCell:
+        """Get the `LibCell` of strings `lib` and `cell`. Shared by every reference to it."""
+        libcell = self._libcells.get((lib, cell), None)
+        if libcell is None:
+            libcell = LibCell(self.string(lib), self.string(cell))
+            self._libcells[(lib, cell)] = libcell
+        return libcell
+
+    def libcell(self, idx: int) -> LibCell:
+        """The library and cell name of module `idx`"""
+        row = self._cell(idx)
+        return self._libcell(row[0], row[1])
+
+    def cells(self) -> List[LibCell]:
+        """The library and cell name of every module, in order"""
+        rows = self._rows("cells", 0, len(self))
+        stride = STRIDES["cells"]
+        return [
+            self._libcell(rows[k], rows[k + 1]) for k in range(0, len(rows), stride)
+        ]
+
+    def find(self, libcell: LibCell) -> Optional[int]:
+        """Get the index of the module for `libcell`, if there is one"""
+        if self._cells is None:
+            self._cells = {c: idx for idx, c in enumerate(self.cells())}
+        return self._cells.get(libcell, None)
+
+    def ports(self, idx: int) -> List[Port]:
+        row = self._cell(idx)
+        rows = self._rows("ports", row[2], row[3])
+        return [
+            Port(self.string(rows[k]), rows[k + 1], PIN_DIRS[rows[k + 2]])
+            for k in range(0, len(rows), STRIDES["ports"])
+        ]
+
+    def signals(self, idx: int) -> List[Bus]:
+        row = self._cell(idx)
+        rows = self._rows("signals", row[4], row[5])
+        return [
+            Bus(self.string(rows[k]), rows[k + 1])
+            for k in range(0, len(rows), STRIDES["signals"])
+        ]
+
+    def instances(self, idx: int) -> List[Instance]:
+        row = self._cell(idx)
+        insts = self._rows("insts", row[6], row[7])
+        if not insts:
+            return list()
+
+        # Each module's connections are contiguous. Read them all at once.
+        stride = STRIDES["insts"]
+        first = insts[4]
+        conns = self._rows(
+            "conns", first, insts[-stride + 4] + insts[-stride + 5] - first
+        )
+
+        # Check the decoded strings and connections inline, as nearly all are repeats
+        strings, nodes = self._strings, self._nodes
+        string, connection = self.string, self.connection
+        accum = list()
+        for k in range(0, len(insts), stride):
+            name, width, lib, cell, start, count, params = insts[k : k + stride]
+            conn_map = dict()
+            for j in range(2 * (start - first), 2 * (start - first + count), 2):
+                port, node = conns[j], conns[j + 1]
+                port = strings[port] if port in strings else string(port)
+                conn_map[port] = nodes[node] if node in nodes else connection(node)
+            accum.append(
+                Instance(
+                    ident=Bus(string(name), width),
+                    of=self._libcell(lib, cell),
+                    conns=conn_map,
+                    params=self._params(params),
+                )
+            )
+        return accum
+
+    def _params(self, idx: int) -> Dict[str, Any]:
+        """Get the instance parameters stored as string `idx`. Shared by every instance with the same parameters."""
+        params = self._param_dicts.get(idx, None)
+        if params is None:
+            params = self._param_dicts[idx] = json.loads(self.string(idx))
+        return params
+
+    def dependencies(self, idx: int) -> Set[LibCell]:
+        row = self._cell(idx)
+        rows = self._rows("deps", row[8], row[9])
+        return set(self._libcell(rows[k], rows[k + 1]) for k in range(0, len(rows), 2))
+
+    def connection(self, node: int) -> Connection:
+        """Get the `Connection` of `node`. Shared by every reference to it."""
+        conn = self._nodes.get(node, None)
+        if conn is not None:
+            return conn
+        kind, a, b, c = self._rows("nodes", node, 1)
+        if kind == NodeKind.REF:
+            conn = SignalRef(self.string(a))
+        elif kind == NodeKind.BIT:
+            conn = Slice(self.string(a), b)
+        elif kind == NodeKind.RANGE:
+            conn = Slice(self.string(a), Range(b, c))
+        elif kind == NodeKind.REPEAT:
+            conn = Repeat(self.connection(a), b)
+        elif kind == NodeKind.CONCAT:
+            parts = self._rows("parts", a, b)
+            conn = Concat(tuple(self.connection(p) for p in parts))
+        else:
+            raise RuntimeError(f"Invalid node kind {kind} in {self.path}")
+        self._nodes[node] = conn
+        return conn
+
+    def module(self, idx: int) -> SchematicModule:
+        """Rebuild the `SchematicModule` of module `idx`.
+        Its `bagsch` holds only the library and cell names. Everything else from the original schematic is gone."""
+        libcell = self.libcell(idx)
+        return SchematicModule(
+            bagsch=header_only(libcell.lib, libcell.cell),
+            dependencies=self.dependencies(idx),
+            ports=self.ports(idx),
+            signals=self.signals(idx),
+            instances=self.instances(idx),
+        )
+
+    def close(self) -> None:
+        """Release all views of the file, and unmap it"""
+        for table in self.tables.values():
+            table.release()
+        self.tables = dict()
+        self.view.release()
+        self.mmap.close()
+
+    def __enter__(self) -> "IrFile":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+def _u32(data: memoryview) -> memoryview:
+    """View `data` as unsigned 32-bit integers. Copies, swapping bytes, only on big-endian machines."""
+    if sys.byteorder == "little":
+        return data.cast("I")
+    table = array("I", bytes(data))
+    table.byteswap()
+    return memoryview(table)
+
+
+def header_only(lib_name: str, cell_name: str) -> BagSchematic:
+    """A `BagSchematic` with only its library and cell names, and no content"""
+    return BagSchematic(
+        lib_name=lib_name,
+        cell_name=cell_name,
+        view_name="schematic",
+        terminals={},
+        instances={},
+    )
+
+
+def write_ir(modules: Iterable[SchematicModule], path: Path) -> int:
+    """Write `modules` to IR file `path`. Returns its size in bytes."""
+    writer = IrWriter()
+    for module in modules:
+        writer.add(module)
+    return writer.write(path)
+
+
+def convert_doc(
+    label: Path, content: Optional[str], options: PortOptions
+) -> Tuple[Path, Optional[SchematicModule], Optional[str]]:
+    """Load and convert a schematic, from `content` if provided and otherwise from file `label`.
+    Returns `(label, module, error)`, where exactly one of `module` and `error` is set.
+    Modules keep only the header of their schematic, as that's all IR files store."""
+    try:
+        if content is None:
+            sch = load(label, options)
+        else:
+            sch = loads_sch(content, fast=options.fast, source=label)
+        module = convert_schematic(sch)
+    except Exception as e:
+        return label, None, f"{type(e).__name__}: {e}"
+    module.bagsch = header_only(sch.lib_name, sch.cell_name)
+    return label, module, None
+
+
+def export_ir(
+    paths: Sequence[Path],
+    ir_path: Path,
+    workers: Optional[int] = None,
+    options: Optional[PortOptions] = None,
+) -> List[Tuple[Path, str]]:
+    """Convert every schematic in `paths`, on `workers` processes, and write them all to IR file `ir_path`.
+    Only `options.fast` and `options.cache_dir` apply. Returns the `(label, error)` of each failure."""
+    options = options or PortOptions()
+    work = partial(convert_doc, options=options)
+    writer = IrWriter()
+    failures = list()
+
+    def add(results: Iterable[Tuple[Path, Optional[SchematicModule], Optional[str]]]):
+        for label, module, error in results:
+            if module is None:
+                failures.append((label, error))
+            else:
+                writer.add(module)
+
+    if workers == 1 or len(paths) <= 1:
+        add(work(*doc) for doc in documents(paths))
+    else:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(workers, mp_context=mp_context()) as pool:
+            add(bounded_map(pool, work, documents(paths), 4 * workers))
+    writer.write(ir_path)
+    return failures
+
+
+def main(argv: List[str]) -> None:
+    """Command-line entry for `run.py export-ir`."""
+    parser = argparse.ArgumentParser(prog="run.py export-ir")
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        type=Path,
+        help="Schematic YAML files, bundles, or directories",
+    )
+    parser.add_argument(
+        "-o",
+        "--out",
+        type=Path,
+        default=Path("scratch/ported.bagir"),
+        help="Output IR file",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes. Default: one per CPU",
+    )
+    parser.add_argument(
+        "--fast-load",
+        action="store_true",
+        help="Use the fast-path schematic loader, skipping unused geometry",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=None,
+        help="Directory of a persistent cache of loaded schematics",
+    )
+    args = parser.parse_args(argv)
+
+    options = PortOptions(fast=args.fast_load, cache_dir=args.cache)
+    start = time.perf_counter()
+    failures = export_ir(collect_paths(args.paths), args.out, args.workers, options)
+    elapsed = time.perf_counter() - start
+    for label, error in failures:
+        print(f"FAILED {label}: {error}")
+    with IrFile(args.out) as ir:
+        num = len(ir)
+    size = args.out.stat().st_size
+    print(f"Exported {num} modules to {args.out} ({size} bytes) in {elapsed:.2f}s")
@@ -0,0 +1,167 @@
+"""
+# Parameter Synthesis
+
+Infers each cell's parameters from the instances of it, across a whole library.
+
+BAG schematics record the parameter values set on each instance, but nothing about the parameters a cell accepts.
+Here every schematic contributes a flat row per instance-parameter, `(lib, cell, name, value)`,
+and all the rows are then aggregated at once, in a single sort-and-group pass,
+into a `ParamInfo` per parameter per cell: its type, the range of values instances set, and its most common value.
+`CodeWriter` turns these into `h.paramclass` definitions, and into the parameters of each instance.
+
+Parameters whose names aren't valid Python identifiers are left out.
+"""
+
+import math, keyword
+from enum import Enum
+from itertools import groupby
+from operator import itemgetter
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# PyPi Imports
+from pydantic.dataclasses import dataclass
+
+# Local Imports
+from .schematic import BagSchematic, LibCell
+
+
+class ParamType(Enum):
+    """# Parameter Type
+    Values are the names of the corresponding Python types."""
+
+    BOOL = "bool"
+    INT = "int"
+    FLOAT = "float"
+    STR = "str"
+
+
+@dataclass
+class ParamInfo:
+    """# Aggregated parameter of a cell"""
+
+    name: str
+    dtype: ParamType
+    default: Any  # Most common value
+    count: int  # Number of instances setting it
+    distinct: int  # Number of distinct values
+    lo: Optional[float] = None  # Range of numeric values
+    hi: Optional[float] = None
+
+    @property
+    def desc(self) -> str:
+        """Description of the values set by instances"""
+        plural = "s" if self.count > 1 else ""
+        desc = f"Set by {self.count} instance{plural}"
+        if self.lo is not None and self.lo != self.hi:
+            return f"{desc}, {self.lo:g} to {self.hi:g}"
+        if self.distinct > 1:
+            return f"{desc}, {self.distinct} distinct values"
+        return desc
+
+    def literal(self, value: Any) -> str:
+        """Python literal code for `value` of this parameter"""
+        return literal(self.dtype, param_value(value))
+
+
+# Parameters of each cell, by name
+ParamIndex = Dict[LibCell, Dict[str, ParamInfo]]
+
+# Flattened instance parameter: (lib, cell, name, value)
+ParamRow = Tuple[str, str, str, Any]
+
+
+def param_value(raw: Any) -> Any:
+    """Get the value of a BAG instance parameter.
+    These are generally exported as `[type_code, value]` pairs, e.g. `[3, "40n"]`."""
+    if (
+        isinstance(raw, (list, tuple))
+        and len(raw) == 2
+        and type(raw[0]) is int
+        and not isinstance(raw[1], (list, tuple, dict))
+    ):
+        return raw[1]
+    return raw
+
+
+def param_rows(sch: BagSchematic) -> List[ParamRow]:
+    """Flatten the instance parameters of `sch` into rows"""
+    return [
+        (inst.lib_name, inst.cell_name, name, param_value(raw))
+        for inst in sch.instances.values()
+        for name, raw in inst.params.items()
+    ]
+
+
+def aggregate(rows: Iterable[ParamRow]) -> ParamIndex:
+    """Aggregate instance-parameter `rows`, from any number of schematics, into a `ParamIndex`.
+    Rows are sorted and grouped once, rather than looked up per instance."""
+    rows = sorted(rows, key=itemgetter(0, 1, 2))
+
+    index: ParamIndex = dict()
+    for (lib, cell), cell_rows in groupby(rows, key=itemgetter(0, 1)):
+        infos = index[LibCell(lib, cell)] = dict()
+        for name, group in groupby(cell_rows, key=itemgetter(2)):
+            if name.isidentifier() and not keyword.iskeyword(name):
+                infos[name] = summarize(name, [r[3] for r in group])
+    return index
+
+
+def build_param_index(schs: Iterable[BagSchematic]) -> ParamIndex:
+    """Build the `ParamIndex` of every instance in `schs`"""
+    return aggregate(row for sch in schs for row in param_rows(sch))
+
+
+def summarize(name: str, values: List[Any]) -> ParamInfo:
+    """Summarize the `values` instances set for parameter `name` into a `ParamInfo`"""
+    dtype = infer_type(values)
+    if dtype == ParamType.STR:
+        values = [v if isinstance(v, str) else str(v) for v in values]
+
+    # Most common value. Ties go to the first seen.
+    counts = Counter(values)
+    default = counts.most_common(1)[0][0]
+
+    lo = hi = None
+    if dtype in (ParamType.INT, ParamType.FLOAT):
+        lo, hi = min(values), max(values)
+    return ParamInfo(
+        name=name,
+        dtype=dtype,
+        default=default,
+        count=len(values),
+        distinct=len(counts),
+        lo=lo,
+        hi=hi,
+    )
+
+
+def infer_type(values: List[Any]) -> ParamType:
+    """Infer the type of a parameter from its `values`.
+    Mixed ints and floats are floats. Anything else mixed, or not a scalar, is a string."""
+    types = set(type(v) for v in values)
+    if types == {bool}:
+        return ParamType.BOOL
+    if types == {int}:
+        return ParamType.INT
+    if types <= {int, float} and all(math.isfinite(v) for v in values):
+        return ParamType.FLOAT
+    return ParamType.STR
+
+
+def literal(dtype: ParamType, value: Any) -> str:
+    """Python literal code for `value`, of type `dtype`"""
+    if dtype == ParamType.STR:
+        return str_literal(value if isinstance(value, str) else str(value))
+    if isinstance(value, float):
+        # As `black` writes them: `1e16`, not `1e+16`
+        return repr(value).replace("e+", "e")
+    return repr(value)
+
+
+def str_literal(s: str) -> str:
+    """String literal code for `s`, quoted as `black` prefers: double quotes, unless that means more escapes."""
+    code = repr(s)
+    if code.startswith("'") and '"' not in s:
+        code = '"' + code[1:-1].replace("\\'", "'") + '"'
+    return code
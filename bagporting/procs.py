@@ -0,0 +1,17 @@
+"""
+# Process Helpers
+
+Shared setup for the worker processes used throughout the porting pipeline.
+"""
+
+import multiprocessing
+
+
+def mp_context():
+    """Multiprocessing context for our worker processes.
+    `run.py` is always run as a script, with no `__main__` guard,
+    so the "spawn" and "forkserver" methods (which re-import the main module) would re-run it.
+    Fork wherever that is available."""
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
@@ -0,0 +1,164 @@
+"""
+# File-System Scanning
+
+Find candidate BAG schematic generators: python modules in a directory with "schematic" somewhere in its path,
+alongside a `netlist_info/{modname}.yaml` schematic.
+
+Scanning is built on `os.scandir`, and designed for large, slow (e.g. NFS-mounted) trees:
+* Each directory is listed exactly once, and its `netlist_info` directory at most once more.
+  No per-file `stat` or `exists` calls.
+* Uninteresting directories (`.git`, `site-packages`, build outputs, and anything else matching the `exclude` globs)
+  are pruned before descending into them.
+* Directories are scanned by a pool of threads, across and within each root.
+"""
+
+import os, re, fnmatch, dataclasses
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterator, List, Optional, Pattern, Sequence, Tuple
+
+# Local Imports
+from .schematic import SourcePaths
+
+# Directory names (globs) pruned by default
+DEFAULT_EXCLUDES = (
+    ".*",  # Hidden directories: .git, .hg, .tox, .venv, caches, etc
+    "__pycache__",
+    "site-packages",
+    "dist-packages",
+    "node_modules",
+    "build",
+    "dist",
+    "*.egg-info",
+    "venv",
+    "netlist_info",  # Only ever read via its parent
+)
+
+
+@dataclasses.dataclass
+class DirScan:
+    """# Result of scanning a single directory"""
+
+    path: str
+    mtime_ns: int
+    subdirs: List[str]  # Subdirectories to descend into, after pruning
+    candidates: List[Tuple[str, str]]  # (module_path, sch_path) pairs
+    netlist_info_mtime_ns: Optional[
+        int
+    ] = None  # mtime of its `netlist_info`, if present
+
+
+def _compile(globs: Sequence[str]) -> Optional[Pattern]:
+    """Compile a list of `globs` into a single regex. Returns `None` for an empty list."""
+    if not globs:
+        return None
+    return re.compile("|".join(fnmatch.translate(g) for g in globs))
+
+
+class Scanner:
+    """
+    # Candidate Scanner
+
+    * `include` globs are matched against each candidate's module path. Candidates must match at least one, if any are given.
+    * `exclude` globs are matched against each directory's name and full path. Matching directories are pruned.
+    * `workers` sets the number of scanning threads.
+    """
+
+    def __init__(
+        self,
+        include: Sequence[str] = (),
+        exclude: Sequence[str] = DEFAULT_EXCLUDES,
+        workers: int = 16,
+    ):
+        self.globs = (tuple(include), tuple(exclude))
+        self.include = _compile(include)
+        self.exclude = _compile(exclude)
+        self.workers = workers
+
+    def scan_dir(self, path: str) -> DirScan:
+        """Scan a single directory `path`. Does not recurse."""
+        pyfiles: List[str] = list()
+        subdirs: List[str] = list()
+        has_netlist_info = False
+        with os.scandir(path) as entries:
+            for entry in entries:
+                name = entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if is_dir:
+                    if name == "netlist_info":
+                        has_netlist_info = True
+                    if not self.excluded(name, entry.path):
+                        subdirs.append(entry.path)
+                elif name.endswith(".py"):
+                    pyfiles.append(name)
+
+        candidates: List[Tuple[str, str]] = list()
+        netlist_info_mtime_ns = None
+        if has_netlist_info and pyfiles and "schematic" in path:
+            # List `netlist_info` once, rather than checking for each module's YAML
+            netlist_info = os.path.join(path, "netlist_info")
+            yamls = set()
+            try:
+                netlist_info_mtime_ns = os.stat(netlist_info).st_mtime_ns
+                with os.scandir(netlist_info) as entries:
+                    yamls = set(e.name for e in entries)
+            except OSError:
+                pass
+            for pyfile in pyfiles:
+                yaml = pyfile[:-3] + ".yaml"
+                if yaml not in yamls:
+                    continue
+                module_path = os.path.join(path, pyfile)
+                if self.include is not None and not self.include.match(module_path):
+                    continue
+                candidates.append((module_path, os.path.join(netlist_info, yaml)))
+
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime_ns = 0
+        return DirScan(path, mtime_ns, subdirs, candidates, netlist_info_mtime_ns)
+
+    def excluded(self, name: str, path: str) -> bool:
+        """Boolean indication of whether directory `name`, at `path`, is pruned."""
+        if self.exclude is None:
+            return False
+        return bool(self.exclude.match(name) or self.exclude.match(path))
+
+    def walk(self, roots: Sequence[Path]) -> Iterator[Tuple[Path, DirScan]]:
+        """Scan every directory under `roots`, in parallel.
+        Yields (root, `DirScan`) pairs as each directory completes, in no particular order."""
+        with ThreadPoolExecutor(self.workers) as pool:
+            pending = dict()  # Future => root
+            seen = set()  # (root, path) pairs, in case of overlapping roots
+            for root in roots:
+                root = Path(root)
+                path = str(root.absolute())
+                if os.path.isdir(path) and (root, path) not in seen:
+                    seen.add((root, path))
+                    pending[pool.submit(self.scan_dir, path)] = root
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    root = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except OSError:
+                        continue  # Unreadable directory. Skip it.
+                    for subdir in result.subdirs:
+                        if (root, subdir) not in seen:
+                            seen.add((root, subdir))
+                            pending[pool.submit(self.scan_dir, subdir)] = root
+                    yield root, result
+
+    def scan(self, roots: Sequence[Path]) -> Iterator[SourcePaths]:
+        """Scan `roots` for candidates, yielding a `SourcePaths` for each."""
+        for root, result in self.walk(roots):
+            for module_path, sch_path in result.candidates:
+                yield SourcePaths(
+                    prefix=root, module_path=Path(module_path), sch_path=Path(sch_path)
+                )
@@ -0,0 +1,129 @@
+"""
+# Hierarchical Scheduling
+
+Run a job per cell of a `DependencyGraph` on a pool of workers, each only once all of its dependencies have finished.
+
+Cells are dispatched as soon as their last dependency completes, rather than a level at a time,
+so wall-clock time is set by the hierarchy's critical path, not by its slowest cell per level.
+When more cells are ready than there are idle workers, those heading the longest remaining chains of dependents go first.
+
+If a cell's job fails, everything which (transitively) depends on it is skipped.
+"""
+
+import os, heapq, traceback
+from concurrent.futures import Executor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+# Local Imports
+from .schematic import LibCell
+from .graph import DependencyGraph, toposort
+from .procs import mp_context
+from .validation import warm_up
+
+
+class CellOutcome:
+    """# Outcome of a cell's job
+    Exactly one of `result` and `error` is meaningful. `skipped` cells never ran, due to a failed dependency."""
+
+    __slots__ = ("libcell", "result", "error", "skipped")
+
+    def __init__(
+        self,
+        libcell: LibCell,
+        result: Any = None,
+        error: Optional[str] = None,
+        skipped: bool = False,
+    ):
+        self.libcell = libcell
+        self.result = result
+        self.error = error
+        self.skipped = skipped
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self) -> str:
+        status = "ok" if self.ok else ("skipped" if self.skipped else "failed")
+        return f"CellOutcome({self.libcell.lib}.{self.libcell.cell}, {status})"
+
+
+def priorities(graph: DependencyGraph) -> Dict[LibCell, int]:
+    """Length of the longest chain of dependents above each cell, including itself"""
+    dependents = graph.dependents()
+    rv: Dict[LibCell, int] = dict()
+    # In reverse dependency order, each cell's dependents are done before it
+    for libcell in reversed(toposort(graph)):
+        rv[libcell] = 1 + max((rv[p] for p in dependents[libcell]), default=0)
+    return rv
+
+
+def schedule(
+    graph: DependencyGraph,
+    fn: Callable[..., Any],
+    args: Dict[LibCell, Sequence[Any]],
+    executor: Executor,
+    max_in_flight: int,
+) -> Iterator[CellOutcome]:
+    """Run `fn(*args[cell])` for each cell in `graph` on `executor`, dependencies first.
+    Keeps at most `max_in_flight` jobs submitted at a time, so that ready cells are prioritized here,
+    rather than queued first-come-first-served in the executor.
+    Yields a `CellOutcome` per cell, as each completes or is skipped.
+    Raises a `CycleError` if `graph` has a cycle, before running anything."""
+    priority = priorities(graph)
+    dependents = graph.dependents()
+    # Dependencies outside the graph, e.g. those `DependencyGraph.add`ed but never defined, are taken as done
+    remaining = {c: len(deps & graph.deps.keys()) for c, deps in graph.deps.items()}
+    ready = [(-priority[c], c.lib, c.cell, c) for c, n in remaining.items() if n == 0]
+    heapq.heapify(ready)
+    in_flight = dict()  # Future => LibCell
+
+    def skip(failed: LibCell) -> Iterator[CellOutcome]:
+        # Skip everything above `failed`
+        stack = [failed]
+        while stack:
+            for parent in dependents[stack.pop()]:
+                if remaining.pop(parent, None) is not None:
+                    msg = f"Dependency {failed.lib}.{failed.cell} failed"
+                    yield CellOutcome(parent, error=msg, skipped=True)
+                    stack.append(parent)
+
+    while ready or in_flight:
+        while ready and len(in_flight) < max_in_flight:
+            libcell = heapq.heappop(ready)[-1]
+            in_flight[executor.submit(fn, *args[libcell])] = libcell
+
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            libcell = in_flight.pop(future)
+            remaining.pop(libcell, None)
+            try:
+                outcome = CellOutcome(libcell, result=future.result())
+            except Exception as e:
+                err = "".join(traceback.format_exception_only(type(e), e)).strip()
+                yield CellOutcome(libcell, error=err)
+                yield from skip(libcell)
+                continue
+
+            yield outcome
+            for parent in dependents[libcell]:
+                if parent in remaining:
+                    remaining[parent] -= 1
+                    if remaining[parent] == 0:
+                        item = (-priority[parent], parent.lib, parent.cell, parent)
+                        heapq.heappush(ready, item)
+
+
+def run_graph(
+    graph: DependencyGraph,
+    fn: Callable[..., Any],
+    args: Dict[LibCell, Sequence[Any]],
+    workers: Optional[int] = None,
+) -> Iterator[CellOutcome]:
+    """Run `fn(*args[cell])` for each cell in `graph` on a pool of `workers` processes, as for `schedule`.
+    `fn` must be picklable, i.e. a module-level function. Its workers import `hdl21` up front."""
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(
+        workers, mp_context=mp_context(), initializer=warm_up
+    ) as pool:
+        yield from schedule(graph, fn, args, pool, max_in_flight=workers)
@@ -3,15 +3,55 @@
 Data Model
 """
 
+import json
 from enum import Enum
 from pathlib import Path
-from typing import Any, Dict, List, Tuple, Set, Optional, Union
+from functools import lru_cache, partial
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    IO,
+    Iterable,
+    Iterator,
+    List,
+    Tuple,
+    Set,
+    Optional,
+    Union,
+)
 
 # PyPi Imports
 from pydantic.dataclasses import dataclass
-from ruamel.yaml import YAML
 
-yaml = YAML()
+# YAML loaders are created on first use. Importing them is a good chunk of the startup time
+# of anything which doesn't load whole schematics, e.g. `run.py search`, which reads only their headers.
+
+
+@lru_cache(maxsize=None)
+def _round_trip_loader() -> Callable[[Any], Any]:
+    """Default, round-trip loader"""
+    from ruamel.yaml import YAML
+
+    return YAML().load
+
+
+@lru_cache(maxsize=None)
+def _fast_loader() -> Callable[[Any], Any]:
+    """Fast-path loader. Prefer PyYAML's libyaml-backed `CSafeLoader`, if installed.
+    Otherwise fall back to `ruamel`'s safe loader, which uses its own C extension where available."""
+    try:
+        from yaml import load, CSafeLoader
+
+        return partial(load, Loader=CSafeLoader)
+    except ImportError:
+        from ruamel.yaml import YAML
+
+        return YAML(typ="safe").load
+
+
+def _fast_load(stream) -> Any:
+    return _fast_loader()(stream)
 
 
 @dataclass
@@ -26,8 +66,9 @@ class BagSchematicInstance:
     is_primitive: bool
 
     # Unused Fields
-    bbox: Tuple[int, int, int, int]
-    xform: Any
+    # Optional so that the fast-path loader can skip them.
+    bbox: Optional[Tuple[int, int, int, int]] = None
+    xform: Any = None
 
 
 class SchematicPinDir(Enum):
@@ -45,7 +86,7 @@ class BagSchematicTerminalInner:
     Inner Data"""
 
     inst: BagSchematicInstance
-    attr: Dict[str, Any]
+    attr: Optional[Dict[str, Any]] = None  # Unused
 
     @property
     def direction(self) -> SchematicPinDir:
@@ -87,10 +128,11 @@ class BagSchematic:
     instances: Dict[str, BagSchematicInstance]
 
     # Unused Fields
-    bbox: Tuple[int, int, int, int]
-    shapes: List[Any]  # Annotation shapes, unexamined
-    props: Any
-    app_defs: Any
+    # Optional so that the fast-path loader can skip them.
+    bbox: Optional[Tuple[int, int, int, int]] = None
+    shapes: Optional[List[Any]] = None  # Annotation shapes, unexamined
+    props: Any = None
+    app_defs: Any = None
 
 
 @dataclass(frozen=True)
@@ -110,14 +152,26 @@ class SourcePaths:
     sch_path: Path  # Schematic YAML
 
 
+@dataclass(frozen=True)
+class BagModuleInfo:
+    """# Summary of a BAG (circuit) `Module` class
+    Plain data, so it can be sent back from the processes which import BAG."""
+
+    name: str  # Class name
+    params: Dict[str, str]  # Parameter name => description
+    defaults: Dict[str, str]  # Parameter name => `repr` of its default value
+
+
 @dataclass(frozen=True)
 class SchematicGenerator:
     """# Bag Schematic Generator
     The Python module, schematic, and source file-system paths."""
 
     source_paths: SourcePaths
-    pymodule: Any  # really a python-module, pydantic doesn't really like em
+    pymodule: Any  # really a python-module, pydantic doesn't really like em. `None` if imported elsewhere.
     sch: BagSchematic
+    modpath: Optional[str] = None  # Dotted python-module path
+    bag_modules: Optional[List[BagModuleInfo]] = None
 
 
 @dataclass(frozen=True)
@@ -129,17 +183,122 @@ class SchematicGeneratorPaths:
     sch_path: Path
 
 
-def load_sch(sch_yaml_path: Path) -> BagSchematic:
-    """Load `sch_yaml_path` to a `BagSchematic`."""
+# Fields of the schematic YAML which the converter never reads.
+# Skipped by the fast-path loader.
+_UNUSED_SCH_FIELDS = ("bbox", "shapes", "props", "app_defs")
+_UNUSED_INST_FIELDS = ("bbox", "xform")
+
+
+def _strip_unused(sch: Dict[str, Any]) -> Dict[str, Any]:
+    """Remove the unused (mostly geometric) fields from schematic-YAML content `sch`, in place."""
+    for key in _UNUSED_SCH_FIELDS:
+        sch.pop(key, None)
+    for inst in sch.get("instances", {}).values():
+        for key in _UNUSED_INST_FIELDS:
+            inst.pop(key, None)
+    for term in sch.get("terminals", {}).values():
+        obj = term.get("obj", None)
+        if isinstance(obj, list) and len(obj) == 2 and isinstance(obj[1], dict):
+            inner = obj[1]
+            inner.pop("attr", None)
+            for key in _UNUSED_INST_FIELDS:
+                inner.get("inst", {}).pop(key, None)
+    return sch
+
+
+def load_sch(sch_yaml_path: Path, fast: bool = False) -> BagSchematic:
+    """Load `sch_yaml_path` to a `BagSchematic`.
+
+    By default all content is loaded with `ruamel`'s round-trip loader, and validated.
+    With `fast=True`, loading uses a C-accelerated safe loader,
+    and only the fields used by `convert_schematic` are validated.
+    Unused fields such as `bbox`, `shapes` and terminal `attr`s are then left as `None`."""
+    with open(sch_yaml_path, "r") as f:
+        return loads_sch(f, fast=fast, source=sch_yaml_path)
+
+
+def loads_sch(
+    content: Union[str, IO[str]], fast: bool = False, source: Any = "<string>"
+) -> BagSchematic:
+    """Load a `BagSchematic` from YAML `content`, either a string or open text stream.
+    Loading modes are as for `load_sch`. `source` is used only for error messages."""
+
+    # Load the schematic-yaml. Documents from JSON-lines bundles are parsed as JSON, which is much faster.
+    sch = None
+    if isinstance(content, str) and content.lstrip().startswith("{"):
+        try:
+            sch = json.loads(content)
+        except ValueError:
+            pass  # Not JSON after all, but a YAML flow mapping
+    if sch is None:
+        sch = _fast_load(content) if fast else _round_trip_loader()(content)
+    if fast:
+        sch = _strip_unused(sch)
 
-    # Load the schematic-yaml
-    sch = yaml.load(open(sch_yaml_path, "r"))
     # Convert it to a structured type
     sch = BagSchematic(**sch)
 
     # Check some stuff about it
     if sch.view_name != "schematic":
-        raise RuntimeError(f"INVALID SCHEMATIC FOR {sch_yaml_path}: {sch['view_name']}")
+        raise RuntimeError(f"INVALID SCHEMATIC FOR {source}: {sch.view_name}")
 
     # Checks out; return it.
     return sch
+
+
+# Suffixes of schematic bundles: many schematics in one file.
+# JSON-lines bundles hold one schematic per line. YAML bundles are multi-document streams, separated by `---`.
+BUNDLE_SUFFIXES = (".jsonl", ".ndjson", ".bundle.yaml")
+
+
+def is_bundle(path: Path) -> bool:
+    """Boolean indication of whether `path` is a schematic bundle, by its name"""
+    return str(path).endswith(BUNDLE_SUFFIXES)
+
+
+def iter_documents(bundle_path: Path) -> Iterator[str]:
+    """Iterate over the raw text of each document in bundle `bundle_path`, reading one at a time.
+    Documents are separated without parsing them, so this is cheap;
+    `loads_sch` parses each, possibly elsewhere, e.g. in a worker process."""
+    with open(bundle_path, "r") as f:
+        if not str(bundle_path).endswith(".bundle.yaml"):
+            for line in f:
+                if line.strip():
+                    yield line
+            return
+
+        lines: List[str] = list()
+        for line in f:
+            # Document markers, `---` and `...`, always start a line, and are followed by whitespace or nothing
+            if line[:3] in ("---", "...") and line[3:4] in ("", " ", "\t", "\n", "\r"):
+                if any(l.strip() for l in lines):
+                    yield "".join(lines)
+                lines = [line[3:]] if line[:3] == "---" else list()
+            elif not (line.startswith("%") and not lines):  # Skip directives
+                lines.append(line)
+        if any(l.strip() for l in lines):
+            yield "".join(lines)
+
+
+def iter_schs(bundle_path: Path, fast: bool = False) -> Iterator[BagSchematic]:
+    """Load each `BagSchematic` in bundle `bundle_path`, one at a time, in constant memory.
+    Loading modes are as for `load_sch`."""
+    for num, doc in enumerate(iter_documents(bundle_path)):
+        yield loads_sch(doc, fast=fast, source=f"{bundle_path}#{num}")
+
+
+def write_bundle(sch_paths: Iterable[Path], bundle_path: Path) -> int:
+    """Bundle the schematic-YAML files `sch_paths` into `bundle_path`. Returns the number bundled.
+    JSON-lines bundles are written with the fast-path loader, and so omit the unused fields."""
+    num = 0
+    with open(bundle_path, "w") as dest:
+        for path in sch_paths:
+            with open(path, "r") as src:
+                if str(bundle_path).endswith(".bundle.yaml"):
+                    dest.write("---\n")
+                    dest.write(src.read())
+                else:
+                    dest.write(json.dumps(_strip_unused(_fast_load(src))))
+                    dest.write("\n")
+            num += 1
+    return num
@@ -7,97 +7,125 @@ and conversions from BAG schematics.
 The structure of the primary entity `SchematicModule` is sort of 
 "half way" between the BAG YAML and hdl21.Module, 
 and serves as a helpful translation step. 
+
+Unlike the `BagSchematic` types, these are lightweight `__slots__` classes without runtime validation. 
+Large designs create millions of them. 
 """
 
 
-import inspect, os, sys, importlib, json
+import inspect, os, sys, importlib, json, re, dataclasses
 from copy import copy
+from functools import lru_cache
 from enum import Enum
 from pathlib import Path
-from dataclasses import field
 from types import ModuleType
 from typing import Any, Dict, List, Tuple, Set, Optional, Union
 
-# PyPi Imports
-from pydantic.dataclasses import dataclass
-
 # Local Imports
 from .schematic import *
 
 
-@dataclass(frozen=True)
-class Bus:
+class _Slotted:
+    """
+    # Base class for the internal representation's data types.
+
+    These are frozen, `__slots__`-based dataclasses: no per-object `__dict__`, and no runtime validation.
+    Everything here is created by our own parsing and conversion,
+    from content already validated at the YAML boundary, i.e. by the `BagSchematic` types.
+
+    Frozen slotted dataclasses can't be unpickled through the default `__setstate__`, so we add `__reduce__`.
+    """
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        return (type(self), tuple(getattr(self, f) for f in self.__slots__))
+
+
+@dataclasses.dataclass(frozen=True)
+class Bus(_Slotted):
     """# Result of parsing and converting the maybe-scalar, maybe-bus names such as `i0<3:0>`.
     These names are used for schematic instances and terminals (ports) to indicate their widths."""
 
+    __slots__ = ("name", "width")
     name: str
     width: int
 
 
-@dataclass(frozen=True)
-class SignalRef:
+@dataclasses.dataclass(frozen=True)
+class SignalRef(_Slotted):
     """# Reference to a Signal"""
 
+    __slots__ = ("name",)
     name: str
 
 
-@dataclass
-class Range:
+@dataclasses.dataclass(frozen=True)
+class Range(_Slotted):
     """# Slice Range, e.g. <3:1>"""
 
+    __slots__ = ("top", "bot")
     top: int
     bot: int
 
 
-@dataclass
-class Slice:
+@dataclasses.dataclass(frozen=True)
+class Slice(_Slotted):
     """# Signal Slice"""
 
+    __slots__ = ("name", "index")
     name: str
     index: Union[int, Range]
 
 
-@dataclass
-class Repeat:
+@dataclasses.dataclass(frozen=True)
+class Repeat(_Slotted):
     """# Signal Repitition"""
 
+    __slots__ = ("target", "num")
     target: Union[SignalRef, Slice]
     num: int
 
 
-@dataclass
-class Concat:
+@dataclasses.dataclass(frozen=True)
+class Concat(_Slotted):
     """# Signal Concatenation"""
 
-    parts: List["Connection"]
+    __slots__ = ("parts",)
+    parts: Tuple["Connection", ...]
 
 
 # The union-type of things that can be connected to an instance port
 Connection = Union[SignalRef, Repeat, Concat, Slice]
 
-# Patch up our self-references in that set of types
-Concat.__pydantic_model__.update_forward_refs()
 
-
-@dataclass
-class Port:
+@dataclasses.dataclass(frozen=True)
+class Port(_Slotted):
+    __slots__ = ("name", "width", "portdir")
     name: str
     width: int
     portdir: SchematicPinDir
 
 
-@dataclass
-class Instance:
+@dataclasses.dataclass(frozen=True)
+class Instance(_Slotted):
+    """# Instance
+    Frozen, but not hashable, as its `conns` and `params` are dicts."""
+
+    __slots__ = ("ident", "of", "conns", "params")
+    __hash__ = None  # Rather than the dataclass hash, which fails on the dicts
     ident: Bus
     of: LibCell
     conns: Dict[str, Connection]
+    params: Dict[str, Any]  # As exported by BAG. See `params.param_value`.
 
 
-@dataclass
+@dataclasses.dataclass
 class SchematicModule:
     """# Converter internal schematic model
     The BAG YAML stuff, plus some internal inferred data we sort out along the way."""
 
+    __slots__ = ("bagsch", "dependencies", "ports", "signals", "instances")
     bagsch: BagSchematic
     dependencies: Set[LibCell]
     ports: List[Port]
@@ -113,14 +141,18 @@ def parse_port(name: str, terminal: BagSchematicTerminal) -> Port:
 
 
 def convert_schematic(sch: BagSchematic) -> SchematicModule:
-    """# FIXME!"""
+    """# Convert a `BagSchematic` to a `SchematicModule`
+    Internal signals are inferred from instance connections, in a single pass.
+    Each is as wide as the highest bit referred to by any slice of it,
+    and signals are ordered by their first reference."""
 
     # Convert each Terminal to a Port
     # FIXME: probably dict-ify this?
     ports = [parse_port(n, t) for n, t in sch.terminals.items()]
     port_names = set([p.name for p in ports])
 
-    signals: Set[Bus] = set()
+    # Net-name => width, in order of first reference
+    widths: Dict[str, int] = dict()
     dependencies: Set[LibCell] = set()
     instances: List[Instance] = list()
 
@@ -136,25 +168,34 @@ def convert_schematic(sch: BagSchematic) -> SchematicModule:
         conns: Dict[str, Connection] = dict()
         for portname, signame in sch_inst.connections.items():
             port_something = parse_instance_or_port_name(portname)
-
-            conn = parse_connection(signame)
-            sigs = get_signal_refs(conn)
-            for sig in sigs:
-                if sig not in port_names:
-                    # FIXME: if there are non-unity-width internal signals, we fail
-                    signals.add(Bus(sig, width=1))
-            conns[port_something.name] = conn
-        instances.append(Instance(ident=ident, of=libcell, conns=conns))
-
+            conns[port_something.name] = parse_connection(signame)
+            for name, width in parse_net_widths(signame):
+                if widths.get(name, 0) < width:
+                    widths[name] = width
+        instances.append(
+            Instance(ident=ident, of=libcell, conns=conns, params=sch_inst.params)
+        )
+
+    signals = [Bus(n, w) for n, w in widths.items() if n not in port_names]
     return SchematicModule(
         bagsch=sch,
         dependencies=dependencies,
         ports=ports,
-        signals=list(signals),
+        signals=signals,
         instances=instances,
     )
 
 
+# Size of the intern caches of parsed names and connections.
+# Parsed objects are immutable, and shared between every use of the same string.
+PARSE_CACHE_SIZE = 1 << 16
+
+# Tokenizer for each comma-separated part of a connection: an optional `<*N>` repeat prefix,
+# a signal name, and an optional `<idx>` or `<top:bot>` slice suffix.
+_CONN_PART = re.compile(r"(?:<\*(\d+)>)?([^<>,]+)(?:<(\d+)(?::(\d+))?>)?(,|\Z)")
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
 def parse_instance_or_port_name(name: str) -> Bus:
     """
     Instance and port names use this format:
@@ -183,6 +224,7 @@ def parse_instance_or_port_name(name: str) -> Bus:
     return Bus(name=slice.name, width=slice.index.top + 1)
 
 
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
 def parse_connection(conn: str) -> Connection:
     """
     # Parse a `Connection` from YAML-format string `conn`
@@ -191,23 +233,46 @@ def parse_connection(conn: str) -> Connection:
     * Concat == `bar,baz`
     * Slice == `foo<3:1>`
     * SignalRef == `foo`
-    """
-    if "," in conn:
-        # This will create and return a `Concat`
-        # Recursively parse each part
-        parts = conn.split(",")
-        parts = [parse_connection(part) for part in parts]
-        return Concat(parts)
 
-    # Not a concatenation: either a bus, a slice, or a repeat
-    if conn.startswith("<*"):  # Parse as a `Repeat`
-        return parse_repeat(conn)
+    Parsing is a single pass of the `_CONN_PART` tokenizer over `conn`.
+    Results are cached, and shared between calls with the same `conn`.
 
-    if conn.endswith(">"):  # Parse as a `Slice`
-        return parse_slice(conn)
-
-    # Otherwise we've got a scalar signal reference
-    return SignalRef(name=conn)
+    Empty connections, and empty parts of concatenations (e.g. the trailing comma of `a,b,`), fail.
+    Earlier versions parsed them as references to a signal named "", which no generated code could connect.
+    """
+    parts = list()
+    pos = 0
+    while True:
+        match = _CONN_PART.match(conn, pos)
+        if match is None:
+            fail(f"Invalid connection syntax {conn}")
+        num, name, idx, bot, sep = match.groups()
+        parts.append(_conn_part(num, name, idx, bot))
+        pos = match.end()
+        if not sep:
+            break  # Reached the end
+        if pos == len(conn):
+            fail(f"Invalid connection syntax {conn}")  # Trailing comma
+
+    if len(parts) == 1:
+        return parts[0]
+    return Concat(tuple(parts))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _conn_part(
+    num: Optional[str], name: str, idx: Optional[str], bot: Optional[str]
+) -> Union[SignalRef, Slice, Repeat]:
+    """Create the (shared) `Connection` for a single tokenized part of a connection string"""
+    if idx is None:
+        target = SignalRef(name=name)
+    elif bot is None:
+        target = Slice(name=name, index=int(idx))
+    else:
+        target = Slice(name=name, index=Range(int(idx), int(bot)))
+    if num is None:
+        return target
+    return Repeat(target, int(num))
 
 
 def parse_repeat(conn: str) -> Repeat:
@@ -216,68 +281,55 @@ def parse_repeat(conn: str) -> Repeat:
     Sadly "repeats of Slices" are supported, e.g. `<*2>foo<1>`.
     We guess that must be right-associative, i.e. this is saying
     `<*2> (foo<1>)`, or "repeat the 1th bit of `foo` twice`."""
-
-    # Search for the *first* ">"
-    idx = conn.index(">")
-    prefix, suffix = conn[: idx + 1], conn[idx + 1 :]
-
-    # Convert the integer part of the prefix. Rip off the "<*" and ">"
-    num = int(prefix[2:-1])
-
-    if suffix.endswith(">"):
-        target = parse_slice(suffix)
-    else:
-        target = SignalRef(suffix)
-
-    return Repeat(target, num)
+    rv = parse_connection(conn)
+    if not isinstance(rv, Repeat):
+        fail(f"Invalid Repeat syntax {conn}")
+    return rv
 
 
 def parse_slice(name: str) -> Slice:
     """# Parse a `Slice` from YAML-format string `name`.
     Format: `name<width-1:0>`
     The angle-bracket part must be at the end, or fail."""
+    rv = parse_connection(name)
+    if not isinstance(rv, Slice):
+        fail(f"Invalid Slice syntax {name}")
+    return rv
 
-    _fail = lambda: fail(f"Invalid Slice syntax {name}")
-
-    if not name.endswith(">"):
-        _fail()
-
-    split = name.split("<")
-    if len(split) != 2:
-        _fail()
 
-    name, suffix = split[0], split[1]
-    suffix = suffix[:-1]  # Strip out the ending ">"
+def _targets(conn: Connection) -> Tuple[Union[SignalRef, Slice], ...]:
+    """The `SignalRef`s and `Slice`s in `conn`. Parsed `Concat`s are flat, and `Repeat`s hold a single target."""
+    parts = conn.parts if isinstance(conn, Concat) else (conn,)
+    return tuple(p.target if isinstance(p, Repeat) else p for p in parts)
 
-    if ":" not in suffix:  # Single index
-        return Slice(name=name, index=int(suffix))
 
-    # Range case
-    split = suffix.split(":")
-    if len(split) != 2:
-        _fail()
-    top, bot = [int(s) for s in split]
-    return Slice(name=name, index=Range(top, bot))
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_net_widths(conn: str) -> Tuple[Tuple[str, int], ...]:
+    """Get the (name, minimum width) of each net referred to by connection-string `conn`.
+    A net must be at least as wide as the highest bit any of its slices refers to."""
+    accum: Dict[str, int] = dict()
+    for target in _targets(parse_connection(conn)):
+        width = 1
+        if isinstance(target, Slice):
+            index = target.index
+            if isinstance(index, Range):
+                width = max(index.top, index.bot) + 1
+            else:
+                width = index + 1
+        if accum.get(target.name, 0) < width:
+            accum[target.name] = width
+    return tuple(accum.items())
 
 
 def get_signal_refs(conn: Connection) -> Set[str]:
     """# Get all the signal (names) referred to by potentially nested connection `conn`."""
-
-    def helper(conn: Connection, seen: Set[str]):
-        # Recursive helper implementation
-        if isinstance(conn, (SignalRef, Slice)):
-            seen.add(conn.name)
-        elif isinstance(conn, Concat):
-            [helper(part, seen) for part in conn.parts]
-        elif isinstance(conn, Repeat):
-            helper(conn.target, seen)
-        else:
-            raise TypeError(conn)
-
-    # Kick off our recursive helper with an empty set
-    rv = set()
-    helper(conn, rv)
-    return rv
+    if isinstance(conn, (SignalRef, Slice)):
+        return {conn.name}
+    if isinstance(conn, Repeat):
+        return get_signal_refs(conn.target)
+    if isinstance(conn, Concat):
+        return set().union(*(get_signal_refs(part) for part in conn.parts))
+    raise TypeError(conn)
 
 
 def fail(msg: str):
@@ -0,0 +1,278 @@
+"""
+# Porting Server
+
+A long-lived daemon, which keeps everything that's slow to set up warm across requests:
+a pool of worker processes which have already imported `hdl21` and `black`,
+and each worker's formatted code, and the schematics it has parsed for `port` requests.
+`run.py serve` starts it, listening on a Unix socket. `run.py client`, in `client.py`, sends it a request, and prints the reply.
+
+Requests and responses are newline-delimited JSON objects, any number per connection:
+
+* Requests are `{"action": ..., "args": [...], "cwd": ...}`. Actions `port`, `port-all` and `search`
+  take the same `args` as the same `run.py` actions, with relative paths resolved against `cwd`.
+  `ping` reports the server's status, and `shutdown` stops it.
+* Responses are `{"ok": ..., "output": ..., "error": ...}`, where `output` is whatever the action would have printed.
+
+Connections are served concurrently, by an `asyncio` event loop. The work itself is shared out over the worker pool.
+"""
+
+import os, io, json, time, socket, signal, asyncio, argparse
+from pathlib import Path
+from dataclasses import field
+from collections import OrderedDict
+from contextlib import redirect_stderr, redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+# PyPi Imports
+from pydantic.dataclasses import dataclass
+
+# Local Imports
+from .schematic import BagSchematic, load_sch
+from .code import bag_sch_to_code, check_and_format
+from .formatting import format_black
+from .procs import mp_context
+from .validation import Validation
+from .batch import PortOptions, build_parser, format_cache, init_worker, run_args
+from .index import main as search
+from .client import Response, ServerAction, default_socket
+
+# Maximum size of a request or response line, in bytes
+LINE_LIMIT = 1 << 26
+
+# Number of parsed schematics each worker keeps in memory
+MEMO_SIZE = 256
+
+
+@dataclass
+class Request:
+    """# Server Request"""
+
+    action: ServerAction
+    args: List[str] = field(default_factory=list)
+    cwd: Optional[str] = None  # Client working directory. None for the server's.
+
+
+class RequestError(Exception):
+    """Error in a request, reported to the client as-is"""
+
+
+class RequestParser(argparse.ArgumentParser):
+    """Argument parser which raises `RequestError`s, rather than printing to the server's streams and exiting"""
+
+    def exit(self, status: int = 0, message: Optional[str] = None) -> None:
+        raise RequestError(message or "")
+
+    def error(self, message: str) -> None:
+        raise RequestError(f"{self.format_usage()}{self.prog}: error: {message}")
+
+    def print_help(self, file: Any = None) -> None:
+        raise RequestError(self.format_help())
+
+
+# Per-process memo of parsed schematics, by (path, mtime, size, fast)
+_schematics: "OrderedDict[Tuple[str, int, int, bool], BagSchematic]" = OrderedDict()
+
+
+def init_server_worker() -> None:
+    """Per-process setup for the server's workers: everything batch workers do, plus importing `black`.
+    Interrupts are left to the server, which shuts its workers down in turn."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    init_worker(Validation.EXEC, None)
+    format_black("")
+
+
+def load_memo(path: Path, fast: bool = False) -> BagSchematic:
+    """Load the schematic at `path`, from the per-process memo if it hasn't changed since last loaded."""
+    stat = path.stat()
+    key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size, fast)
+    sch = _schematics.get(key, None)
+    if sch is not None:
+        _schematics.move_to_end(key)
+        return sch
+    sch = _schematics[key] = load_sch(path, fast=fast)
+    if len(_schematics) > MEMO_SIZE:
+        _schematics.popitem(last=False)
+    return sch
+
+
+def port_request(cwd: str, args: Sequence[str]) -> str:
+    """Handle a `port` request, in a worker: port the schematic at `args[0]`, and return its code."""
+    if len(args) != 1:
+        raise RequestError("usage: port SCHEMATIC_YAML")
+    sch = load_memo(Path(cwd, args[0]))
+    code = bag_sch_to_code(sch)
+    return check_and_format(code, cache=format_cache(PortOptions()))
+
+
+def captured(fn: Callable[[List[str]], Any], cwd: str, args: Sequence[str]) -> str:
+    """Run command-line entry `fn` on `args` in a worker, from directory `cwd`, and return everything it prints.
+    Workers handle one request at a time, so changing their directory and streams is safe."""
+    os.chdir(cwd)
+    out = io.StringIO()
+    with redirect_stdout(out), redirect_stderr(out):
+        try:
+            fn(list(args))
+        except SystemExit as e:
+            if e.code:
+                raise RequestError(out.getvalue()) from None
+    return out.getvalue()
+
+
+def resolve(args: argparse.Namespace, cwd: Path) -> argparse.Namespace:
+    """Resolve every path-valued argument in `args` against `cwd`, in place"""
+    for name, value in vars(args).items():
+        if isinstance(value, Path):
+            setattr(args, name, cwd / value)
+        elif isinstance(value, list) and all(isinstance(v, Path) for v in value):
+            setattr(args, name, [cwd / v for v in value])
+    return args
+
+
+class Server:
+    """# Porting Server
+    Serves requests on Unix socket `socket_path`, with a pool of `workers` processes."""
+
+    def __init__(self, socket_path: Path, workers: Optional[int] = None):
+        self.socket_path = Path(socket_path)
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = self.start_pool()
+        self.started = time.monotonic()
+        self.served = 0  # Number of requests served
+        # Set to shut down. Created in `serve`, on its event loop.
+        self.done: Optional[asyncio.Event] = None
+
+    def start_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            self.workers, mp_context=mp_context(), initializer=init_server_worker
+        )
+
+    def restart_pool(self, broken: ProcessPoolExecutor) -> None:
+        """Replace `broken`, e.g. after a worker crashed, unless it's already been replaced."""
+        if self.pool is broken:
+            self.pool = self.start_pool()
+            broken.shutdown(wait=False)
+
+    async def serve(self) -> None:
+        """Serve until a `shutdown` request, SIGINT or SIGTERM"""
+        self.done = asyncio.Event()
+        self.claim_socket()
+        # Create the socket accessible only to this user, rather than changing its mode after the fact
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(
+                self.handle, path=str(self.socket_path), limit=LINE_LIMIT
+            )
+        finally:
+            os.umask(umask)
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.done.set)
+        print(f"Serving on {self.socket_path}, with {self.workers} workers", flush=True)
+        try:
+            async with server:
+                await self.done.wait()
+        finally:
+            self.socket_path.unlink()
+            self.pool.shutdown()
+
+    def claim_socket(self) -> None:
+        """Remove any stale socket left at our path, or fail if another server is listening on it"""
+        if not self.socket_path.exists():
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(str(self.socket_path))
+            except ConnectionRefusedError:
+                self.socket_path.unlink()
+                return
+        raise RuntimeError(f"A server is already listening on {self.socket_path}")
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Handle a connection, replying to each of its requests in turn"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.respond(line)
+                writer.write(json.dumps(response._asdict()).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass  # Client went away, or sent an over-long line
+        except asyncio.CancelledError:
+            pass  # Shutting down, with this connection still open
+        finally:
+            writer.close()
+
+    async def respond(self, line: bytes) -> Response:
+        """Handle a request, capturing any failure in the `Response`"""
+        self.served += 1
+        try:
+            request = Request(**json.loads(line))
+            cwd = Path(request.cwd or os.getcwd())
+            output = await self.dispatch(request.action, request.args, cwd)
+            return Response(ok=True, output=output)
+        except RequestError as e:
+            return Response(ok=False, error=str(e))
+        except Exception as e:
+            return Response(ok=False, error=f"{type(e).__name__}: {e}")
+
+    async def dispatch(self, action: ServerAction, args: List[str], cwd: Path) -> str:
+        if action == ServerAction.PORT:
+            return await self.run(port_request, str(cwd), args)
+        if action == ServerAction.SEARCH:
+            return await self.run(captured, search, str(cwd), args)
+        if action == ServerAction.PORT_ALL:
+            # Runs in a thread, which hands out its schematics to the pool
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.port_all, args, cwd)
+        if action == ServerAction.PING:
+            uptime = time.monotonic() - self.started
+            return f"Up {uptime:.0f}s, {self.workers} workers, {self.served} requests\n"
+        if action == ServerAction.SHUTDOWN:
+            self.done.set()
+            return "Shutting down\n"
+        raise RequestError(f"Unsupported action {action}")
+
+    async def run(self, fn: Callable[..., str], *args: Any) -> str:
+        """Run `fn(*args)` on the worker pool"""
+        pool = self.pool
+        try:
+            return await asyncio.wrap_future(pool.submit(fn, *args))
+        except BrokenProcessPool:
+            self.restart_pool(pool)
+            raise
+
+    def port_all(self, args: List[str], cwd: Path) -> str:
+        """Handle a `port-all` request, returning its report"""
+        parser = build_parser(RequestParser)
+        parsed = resolve(parser.parse_args(args), cwd)
+        out = io.StringIO()
+        pool = self.pool
+        try:
+            run_args(parsed, parser, pool, out)
+        except BrokenProcessPool:
+            self.restart_pool(pool)
+            raise
+        return out.getvalue()
+
+
+def serve_main(argv: Sequence[str]) -> None:
+    """Command-line entry for `run.py serve`"""
+    parser = argparse.ArgumentParser(prog="run.py serve")
+    parser.add_argument("--socket", type=Path, default=None, help="Socket path")
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes. Default: one per CPU",
+    )
+    args = parser.parse_args(argv)
+    server = Server(args.socket or default_socket(), args.workers)
+    asyncio.run(server.serve())
@@ -1,24 +1,52 @@
 """
-# Bag => Hdl21 Porting 
+# Bag => Hdl21 Porting
 
-The part that needs BAG. 
-BAG is a gigantic pain to use, to import in any other program, really just to be anywhere near. 
-This breaks out the sections of portion action that need it, hopefully to be run in the smallest context possible. 
+The part that needs BAG.
+BAG is a gigantic pain to use, to import in any other program, really just to be anywhere near.
+This breaks out the sections of portion action that need it, hopefully to be run in the smallest context possible.
 
 Generally running this will require being in a context in which "bag programs" ("generators", kinda) can run.
-Usually that means navigating to a BAG workspace and doing whatever shell-fu it insists upon. 
+Usually that means navigating to a BAG workspace and doing whatever shell-fu it insists upon.
+
+In fact BAG is never imported in the main process at all.
+Candidate modules are imported by an `ImportPool` of long-lived worker processes, each of which imports `bag` once.
+A candidate which hangs or crashes takes down only its worker, which is replaced.
+Workers send back only plain data: the schematic, and a `BagModuleInfo` per BAG `Module` class.
 """
 
-import bag  # stick this right at the top so we're sure it works
-import inspect, os, sys, importlib, json
-from enum import Enum
+import inspect, os, sys, time, importlib, traceback
 from pathlib import Path
-from dataclasses import field
 from types import ModuleType
-from typing import Any, Dict, List, Tuple, Set, Optional, Union
+from multiprocessing.connection import wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 from pydantic.dataclasses import dataclass
 
-from .data import session, SourcePaths, BagSchematic, SchematicGenerator
+# Local Imports
+from .schematic import (
+    BagModuleInfo,
+    BagSchematic,
+    LibCell,
+    SchematicGenerator,
+    SourcePaths,
+    load_sch,
+)
+from .procs import mp_context
+from .wip import session, find_candidates
+
+
+@dataclass
+class CandidateResult:
+    """# Result of importing a candidate, sent back from an import worker"""
+
+    source_paths: SourcePaths
+    modpath: Optional[str] = None
+    sch: Optional[BagSchematic] = None
+    bag_modules: Optional[List[BagModuleInfo]] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
 
 def find_bag_modules(mod: ModuleType) -> list:
@@ -32,41 +60,224 @@ def find_bag_modules(mod: ModuleType) -> list:
     return accum
 
 
-def try_candidate(source_paths: SourcePaths) -> Optional[SchematicGenerator]:
-    """Try to import a `SchematicGenerator` from candidate `source_paths`."""
-
-    # Check our cache
-    if source_paths in session.sourcepaths_to_generators:
-        return session.sourcepaths_to_generators[source_paths]
-
+def bag_module_info(cls: type) -> BagModuleInfo:
+    """Summarize BAG `Module` class `cls`, as plain data"""
     try:
-        sch = load_sch(source_paths.sch_path)
-    except:
-        return None
+        params = {str(k): str(v) for k, v in cls.get_params_info().items()}
+    except Exception:
+        params = dict()
+    try:
+        defaults = {str(k): repr(v) for k, v in cls.get_default_param_values().items()}
+    except Exception:
+        defaults = dict()
+    return BagModuleInfo(name=cls.__name__, params=params, defaults=defaults)
+
 
-    # Now process the generator module
+def module_path(source_paths: SourcePaths) -> str:
+    """Get the dotted python-module path of candidate `source_paths`"""
     # Remove the prefix and ".py" suffix
     relpath = source_paths.module_path.relative_to(source_paths.prefix)
     relpath = str(relpath)[:-3]  # Remove ".py"
     # And if it's a package, remove "__init__.py"
     if relpath.endswith("/__init__"):
         relpath = relpath[: -1 * len("/__init__")]
+    # Convert that to a python-module path, primarily replacing slashes with dots.
+    # Note that's a -Nix-specific thing there.
+    return relpath.replace("/", ".")
+
 
+def import_candidate(source_paths: SourcePaths) -> CandidateResult:
+    """Load and import candidate `source_paths`. Runs in an import worker, where `bag` has been imported."""
+    try:
+        sch = load_sch(source_paths.sch_path)
+    except Exception as e:
+        return CandidateResult(source_paths, error=f"ERROR LOADING SCHEMATIC: {e}")
+
+    modpath = module_path(source_paths)
     try:
-        # Convert that to a python-module path, primarily replacing slashes with dots.
-        # Note that's a -Nix-specific thing there.
-        modpath = relpath.replace("/", ".")
         # Key step here: import the generator module
         pymodule = importlib.import_module(modpath)
-    except Exception as e:
-        print(f"ERROR IMPORTING {modpath}: {e}")
-        return None
+        bag_modules = [bag_module_info(cls) for cls in find_bag_modules(pymodule)]
+    except BaseException as e:
+        return CandidateResult(
+            source_paths, modpath, sch, error=f"ERROR IMPORTING {modpath}: {e!r}"
+        )
+    return CandidateResult(source_paths, modpath, sch, bag_modules)
+
+
+def _worker_main(conn) -> None:
+    """Main loop of an import worker process"""
+    try:
+        import bag
+    except BaseException:
+        err = "ERROR IMPORTING bag: " + traceback.format_exc(limit=1)
+    else:
+        err = None
+
+    while True:
+        source_paths = conn.recv()
+        if source_paths is None:
+            return
+        if err is not None:
+            conn.send(CandidateResult(source_paths, error=err))
+        else:
+            conn.send(import_candidate(source_paths))
+
+
+class _Worker:
+    """# A single import-worker process, and the candidate it's working on, if any"""
+
+    def __init__(self):
+        ctx = mp_context()
+        self.conn, child_conn = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.proc.start()
+        child_conn.close()
+        self.task: Optional[SourcePaths] = None
+        self.deadline: Optional[float] = None
 
-    # Create the generator, cache and return it
-    gen = SchematicGenerator(source_paths=source_paths, pymodule=pymodule, sch=sch)
-    session.sourcepaths_to_generators[source_paths] = gen
-    session.libcells_to_generators[LibCell(sch.lib_name, sch.cell_name)] = gen
-    return gen
+    def send(self, source_paths: SourcePaths, timeout: Optional[float]) -> None:
+        self.task = source_paths
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.conn.send(source_paths)
+
+    def kill(self) -> None:
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.proc.join(1)
+        self.kill()
+
+
+class ImportPool:
+    """
+    # Import Worker Pool
+
+    `workers` long-lived processes, each of which imports `bag` once, then imports candidates as they're handed out.
+    Each candidate gets `timeout` seconds. Workers which crash or time out are killed and replaced,
+    and their candidates reported as failures.
+    """
+
+    def __init__(self, workers: Optional[int] = None, timeout: Optional[float] = 120.0):
+        self.num_workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.workers: List[_Worker] = list()
+
+    def imap(self, candidates: Iterable[SourcePaths]) -> Iterator[CandidateResult]:
+        """Import each of `candidates`, yielding a `CandidateResult` for each as it completes, in no particular order."""
+        todo = iter(candidates)
+        exhausted = False
+        while True:
+            # Hand out work to every idle worker, starting new ones as needed.
+            # Workers are only started once there's a task for them.
+            while not exhausted:
+                idle = [w for w in self.workers if w.task is None]
+                if not idle and len(self.workers) >= self.num_workers:
+                    break
+                task = next(todo, None)
+                if task is None:
+                    exhausted = True
+                    break
+                if not idle:
+                    idle.append(_Worker())
+                    self.workers.append(idle[0])
+                idle[0].send(task, self.timeout)
+
+            busy = [w for w in self.workers if w.task is not None]
+            if not busy:
+                return
+
+            deadlines = [w.deadline for w in busy if w.deadline is not None]
+            timeout = None
+            if deadlines:
+                timeout = max(0.0, min(deadlines) - time.monotonic())
+            ready = wait([w.conn for w in busy], timeout)
+
+            for worker in busy:
+                if worker.conn in ready:
+                    try:
+                        result = worker.conn.recv()
+                    except (EOFError, OSError):
+                        result = self._replace(worker, "Import worker died")
+                    else:
+                        worker.task = None
+                    yield result
+                elif (
+                    worker.deadline is not None and time.monotonic() >= worker.deadline
+                ):
+                    yield self._replace(worker, f"Timed out after {self.timeout}s")
+
+    def _replace(self, worker: _Worker, error: str) -> CandidateResult:
+        """Kill and replace `worker`. Returns a failed result for the candidate it was working on."""
+        result = CandidateResult(worker.task, error=error)
+        worker.kill()
+        self.workers[self.workers.index(worker)] = _Worker()
+        return result
+
+    def close(self) -> None:
+        """Stop all worker processes"""
+        for worker in self.workers:
+            worker.stop()
+        self.workers = list()
+
+    def __enter__(self) -> "ImportPool":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+def try_candidates(
+    candidates: Iterable[SourcePaths], pool: ImportPool
+) -> Iterator[Optional[SchematicGenerator]]:
+    """Try to import a `SchematicGenerator` from each of `candidates`, on `pool`.
+    Yields each generator as it completes, or `None` for each failure. Results are cached on `session`."""
+
+    # Check our cache, streaming everything else out to the pool
+    cached: List[SchematicGenerator] = list()
+
+    def uncached() -> Iterator[SourcePaths]:
+        for source_paths in candidates:
+            gen = session.sourcepaths_to_generators.get(source_paths, None)
+            if gen is None:
+                yield source_paths
+            else:
+                cached.append(gen)
+
+    for result in pool.imap(uncached()):
+        if not result.ok:
+            print(result.error)
+            yield None
+            continue
+
+        # Create the generator, cache and return it
+        sch = result.sch
+        gen = SchematicGenerator(
+            source_paths=result.source_paths,
+            pymodule=None,
+            sch=sch,
+            modpath=result.modpath,
+            bag_modules=result.bag_modules,
+        )
+        session.sourcepaths_to_generators[result.source_paths] = gen
+        session.libcells_to_generators[LibCell(sch.lib_name, sch.cell_name)] = gen
+        yield gen
+
+    yield from cached
+
+
+def try_candidate(
+    source_paths: SourcePaths, pool: ImportPool
+) -> Optional[SchematicGenerator]:
+    """Try to import a `SchematicGenerator` from candidate `source_paths`."""
+    return next(try_candidates([source_paths], pool))
 
 
 def main():
@@ -74,10 +285,11 @@ def main():
     search_paths = [Path(p) for p in sys.path]
     candidate_generator = find_candidates(search_paths)
 
-    # Step 2: try to turn each into a `SchematicGenerator`
+    # Step 2: try to turn each into a `SchematicGenerator`, in parallel
     # Results are stored on `sesssion`
-    for candidate in candidate_generator:
-        try_candidate(candidate)
+    with ImportPool() as pool:
+        for _ in try_candidates(candidate_generator, pool):
+            pass
 
     # Step 3: arrange them in dependency order(?) (Does that matter?)
     # Step 4: convert stuff
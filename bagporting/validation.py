@@ -0,0 +1,46 @@
+"""
+# Generated-Code Validation
+
+Levels of checking applied to generated code before it's returned or written:
+
+* `OFF` does no checking.
+* `SYNTAX` compiles the code, catching syntax errors, without running it.
+* `EXEC` runs it, as the porter always has. This imports `hdl21` and defines the generator.
+
+Executing in-process pays the `hdl21` import once per process.
+Batch porting warms up each of its workers ahead of time with `warm_up`.
+"""
+
+from enum import Enum
+from typing import Any, Dict
+
+
+class Validation(Enum):
+    """# Validation Level"""
+
+    OFF = "off"
+    SYNTAX = "syntax"
+    EXEC = "exec"
+
+
+def validate(
+    code: str, level: Validation = Validation.EXEC, filename: str = "<generated>"
+) -> None:
+    """Validate `code` to `level`. Raises whatever the compilation or execution raises."""
+    if level == Validation.OFF:
+        return
+    compiled = compile(code, filename, "exec")
+    if level == Validation.SYNTAX:
+        return
+    exec(compiled, _namespace())
+
+
+def warm_up(level: Validation = Validation.EXEC) -> None:
+    """Do the one-time, per-process setup for validating to `level`: import `hdl21` ahead of time."""
+    if level == Validation.EXEC:
+        import hdl21
+
+
+def _namespace() -> Dict[str, Any]:
+    """A fresh namespace to execute generated code in"""
+    return {"__name__": "bagporting.generated", "__builtins__": __builtins__}
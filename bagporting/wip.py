@@ -9,25 +9,20 @@ from enum import Enum
 from pathlib import Path
 from dataclasses import field
 from types import ModuleType
-from typing import Any, Dict, List, Tuple, Set, Optional, Union
+from typing import Any, Dict, List, Tuple, Set, Optional, Union, Sequence
 
 # PyPi Imports
-import black  # Yes `black` the formatter, produce code that actually looks good!
 from pydantic.dataclasses import dataclass
-from ruamel.yaml import YAML
-
-
-from enum import Enum
-from pathlib import Path
-from dataclasses import field
-from typing import Any, Dict, List, Tuple, Set, Union
-from pydantic.dataclasses import dataclass
-
 
 # Local Imports
 from .schematic import *
 from .schematic_module import *
 from .code import *
+from .scan import Scanner, DEFAULT_EXCLUDES
+from .index import CandidateIndex
+from .connectivity import ConnectivityIndex, cell_connectivity
+from .graph import PRIM_CELLS, build_graph, schematic_deps, toposort
+from .schedule import run_graph
 
 
 @dataclass
@@ -48,48 +43,19 @@ class Session:
 
 session = Session()  # Create a program-level `Session`
 
+# Index of candidates on disk, set up by `use_index`
+index: Optional[CandidateIndex] = None
+
 
 # Primitive cells, defined not by these imports but (somewhere) elsewhere
-prim_cells = [
-    LibCell(lib, cell)
-    for (lib, cell) in [
-        ("BAG_prim", "nmos4_standard"),
-        ("BAG_prim", "pmos4_standard"),
-        ("BAG_prim", "ndio_standard"),
-        ("BAG_prim", "pdio_standard"),
-        ("BAG_prim", "res_metal_1"),
-        ("BAG_prim", "res_metal_2"),
-        ("BAG_prim", "res_metal_3"),
-        ("BAG_prim", "res_metal_4"),
-        ("BAG_prim", "res_metal_5"),
-        ("BAG_prim", "res_metal_6"),
-        ("BAG_prim", "res_metal_7"),
-        ("BAG_prim", "res_metal_8"),
-        ("BAG_prim", "res_metal_9"),
-        ("basic", "cds_thru"),
-        ("basic", "noConn"),
-        ("analogLib", "cap"),
-        ("analogLib", "dcblock"),
-        ("analogLib", "dcfeed"),
-        ("analogLib", "gnd"),
-        ("analogLib", "idc"),
-        ("analogLib", "ind"),
-        ("analogLib", "iprobe"),
-        ("analogLib", "port"),
-        ("analogLib", "res"),
-        ("analogLib", "switch"),
-        ("analogLib", "vdc"),
-        ("analogLib", "vcvs"),
-        ("analogLib", "vpulse"),
-        ("analogLib", "vpwlf"),
-        ("analogLib", "vsin"),
-        ("analogLib", "vsrc"),
-    ]
-]
+prim_cells = PRIM_CELLS
 
 
 def find_candidates(
     search_paths: List[Path],
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = DEFAULT_EXCLUDES,
+    workers: int = 16,
 ) -> List[SourcePaths]:  # Really a generator "yield" thing, sue me.
     """
     Walk all the places we might find BAG's schematic generators, yielding one at a time
@@ -99,48 +65,33 @@ def find_candidates(
 
     Yields a sequence of `SourcePaths`s which can be thought of as "candidates".
     Each has:
-    * a parent directory named "schematic"
+    * a parent directory with "schematic" in its path
     * a `netlist_info/{modname}.yaml` file, and
     * a python file by the same {modname}
+
+    The walking itself is done by `scan.Scanner`, pruning directories matching `exclude`,
+    and keeping only candidates matching `include`. Candidates arrive in no particular order.
     """
-    for prefix in search_paths:
-        print(f"Searching `{prefix}`")
-        for root, dirs, files in os.walk(prefix, followlinks=False):
-            if "schematic" not in root:
-                continue
-            for file in files:
-                # Filter down to python files
-                path = Path(os.path.join(root, file)).absolute()
-                if path.suffix != ".py":
-                    continue
-
-                # Check for a corresponding `netlist_info/{modname}.yaml`
-                sch_yaml_path = (
-                    (path.parent / "netlist_info" / path.stem)
-                    .with_suffix(".yaml")
-                    .absolute()
-                )
-                if not sch_yaml_path.exists():
-                    continue  # No YAML, keep looking elsewhere
-
-                yield SourcePaths(
-                    prefix=prefix, module_path=path, sch_path=sch_yaml_path
-                )
-
-                # Add it to our definitions
-                # session.srcs[(lib_name, cell_name)] = src
-                # And yield it for any more processing
-                # yield src
+    print(f"Searching {len(search_paths)} paths")
+    scanner = Scanner(include=include, exclude=exclude, workers=workers)
+    yield from scanner.scan(search_paths)
+
+
+def use_index(path: Path, search_paths: List[Path]) -> CandidateIndex:
+    """Load, update and save the candidate index at `path`, and use it for `get_sch` lookups."""
+    global index
+    index = CandidateIndex.load(path)
+    index.update(search_paths)
+    index.save()
+    return index
 
 
 def get_sch(libcell: LibCell):
-    lib_name, cell_name = libcell.lib, libcell.cell
     if libcell in session.libcells_to_schematics:
         return session.libcells_to_schematics[libcell]
 
-    # Not defined, try to get from disk
-    # FIXME: where?
-    path = paths.get((lib_name, cell_name), None)
+    # Not defined, try to get from disk, via the candidate index
+    path = index.get(libcell) if index is not None else None
     if path is None:
         session.not_found.add(libcell)
         return None
@@ -151,21 +102,28 @@ def get_sch(libcell: LibCell):
 
 
 def order_helper(sch: BagSchematic, order: List[BagSchematic], seen: Set[LibCell]):
-    """# Recursive depth-first ordering helper"""
+    """# Dependency-ordering helper
+    Append `sch` and everything it (transitively) instantiates to `order`, dependencies first,
+    skipping anything already `seen`. Cells which can't be found are skipped, and noted in `session.not_found`.
+    Raises a `CycleError` if the hierarchy has a cycle."""
 
     libcell = LibCell(sch.lib_name, sch.cell_name)
     if libcell in seen:
         return  # Already done
-    seen.add(libcell)
+    session.libcells_to_schematics.setdefault(libcell, sch)
 
-    for inst in sch.instances.values():
-        target = LibCell(inst.lib_name, inst.cell_name)
-        if target in prim_cells:
-            continue  # Don't include the primitive cells
-        order_helper(sch=get_sch(target), order=order, seen=seen)
+    def get_deps(target: LibCell) -> Optional[Set[LibCell]]:
+        # Each cell's schematic is only fetched once
+        if target in seen and target != libcell:
+            return set()  # Already ordered, along with its dependencies
+        dep_sch = get_sch(target)
+        return None if dep_sch is None else schematic_deps(dep_sch, prim_cells)
 
-    # Finally, add `sch` to the end of the list
-    order.append(sch)
+    graph = build_graph([libcell], get_deps, prim_cells)
+    for target in toposort(graph):
+        if target not in seen:
+            seen.add(target)
+            order.append(get_sch(target))
 
 
 def ordered_stuff():
@@ -196,38 +154,49 @@ def ordered_stuff():
     ordered = json.load(open("data/ordered_paths.json", "r"))
     ordered = [SchematicGeneratorPaths(**paths) for paths in ordered]
 
+    # Load everything, then port each cell on a worker pool as soon as its dependencies are done
+    sch_paths = dict()
     for p in ordered:
+        libcell = LibCell(p.lib_name, p.cell_name)
         sch = load_sch(p.sch_path)
+        session.libcells_to_schematics[libcell] = sch
+        sch_paths[libcell] = (p.sch_path,)
         print(p)
         print_schematic_stuff(sch)
-        code = bag_sch_to_code(sch)
-        code = black.format_str(code, mode=black.FileMode())
-        print(code)
-        exec(code)
 
+    def get_deps(libcell: LibCell) -> Optional[Set[LibCell]]:
+        sch = get_sch(libcell)
+        return None if sch is None else schematic_deps(sch, prim_cells)
 
-def print_schematic_stuff(sch: BagSchematic):
-    """# Print some fun facts about schematic `sch`."""
+    graph = build_graph(sch_paths, get_deps, prim_cells)
+    for outcome in run_graph(graph, bag_sch_path_to_code, sch_paths):
+        if not outcome.ok:
+            print(f"FAILED: {outcome.libcell}: {outcome.error}")
+            continue
+        print(outcome.result)
 
-    print(f"({(sch.lib_name, sch.cell_name)})")
 
-    terminal_names = set(sch.terminals.keys())
-    print(terminal_names)
+def print_schematic_stuff(
+    sch: BagSchematic, connectivity: Optional[ConnectivityIndex] = None
+):
+    """# Print some fun facts about schematic `sch`.
+    Looked up in `connectivity` if it's indexed there, rather than re-parsing its connections."""
+
+    libcell = LibCell(sch.lib_name, sch.cell_name)
+    cell = connectivity.get(libcell) if connectivity is not None else None
+    if cell is None:
+        cell = cell_connectivity(sch)
+
+    print(f"({(sch.lib_name, sch.cell_name)})")
+    print(set(sch.terminals.keys()))
 
     for name, term in sch.terminals.items():
         print(parse_instance_or_port_name(name))
         print(f"  {name} {term.inner.direction}")
 
     print(f"depends on:")
-    internal_signals: Set[str] = set()
-    for inst in sch.instances.values():
-        print(f"     {(inst.lib_name, inst.cell_name)}")
-        for portname, signame in inst.connections.items():
-            conn = parse_connection(signame)
-            sigs = get_signal_refs(conn)
-            for sig in sigs:
-                if sig not in terminal_names:
-                    internal_signals.add(sig)
+    for inst in cell.instances.values():
+        print(f"     {(inst.of.lib, inst.of.cell)}")
 
     print("  Internal signals:")
-    print(f"  {internal_signals}")
+    print(f"  {set(cell.internal_signals())}")
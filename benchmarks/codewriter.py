@@ -0,0 +1,66 @@
+"""
+# Code-Writing Benchmark
+
+Times `CodeWriter` on synthetic schematics of 10k to 100k instances,
+against a replica of its prior repeated-string-concatenation buffer.
+Time per instance should stay flat as the instance count grows.
+The concatenating replica grows quadratically, and is skipped beyond `CONCAT_MAX` instances.
+
+Run from the repo root:
+```
+python -m benchmarks.codewriter
+```
+"""
+
+import time, tempfile
+
+from bagporting.schematic import BagSchematic
+from bagporting.schematic_module import convert_schematic
+from bagporting.code import CodeWriter
+from .synth import synth_schematic
+
+
+CONCAT_MAX = 25_000
+
+
+class ConcatWriter(CodeWriter):
+    """The prior `CodeWriter` buffering, growing one string with `+=` per line."""
+
+    def to_code(self) -> str:
+        self.code = ""
+        self.write()
+        return self.code
+
+    def writeln(self, line: str):
+        self.code += self.tab * self.indent + line + "\n"
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    print(
+        f"{'instances':>10} {'MB':>6} {'to_code (s)':>12} {'us/inst':>8} "
+        f"{'to_file (s)':>12} {'concat (s)':>11} {'us/inst':>8}"
+    )
+    for num in (10_000, 25_000, 50_000, 100_000):
+        sch = convert_schematic(BagSchematic(**synth_schematic(num)))
+
+        code = CodeWriter(sch).to_code()
+        t_code = timed(lambda: CodeWriter(sch).to_code())
+        with tempfile.TemporaryFile("w") as f:
+            t_file = timed(lambda: CodeWriter(sch).to_file(f))
+        t_concat = float("nan")
+        if num <= CONCAT_MAX:
+            t_concat = timed(lambda: ConcatWriter(sch).to_code())
+
+        print(
+            f"{num:>10} {len(code) / 1e6:>6.1f} {t_code:>12.3f} {1e6 * t_code / num:>8.2f} "
+            f"{t_file:>12.3f} {t_concat:>11.3f} {1e6 * t_concat / num:>8.2f}"
+        )
+
+
+main()
@@ -0,0 +1,154 @@
+"""
+# Internal-Representation Benchmark
+
+Compares the `__slots__`-based `SchematicModule` data types against replicas of their prior `pydantic.dataclasses`,
+building the same large IR with each: time to construct, and memory held.
+
+Run from the repo root:
+```
+python -m benchmarks.ir
+```
+"""
+
+import time, tracemalloc
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple, Union
+
+from pydantic.dataclasses import dataclass
+
+from bagporting import schematic_module as slotted
+from bagporting.schematic import BagSchematic, LibCell, SchematicPinDir
+from bagporting.schematic_module import convert_schematic
+from .synth import synth_schematic
+
+
+# Replicas of the prior, pydantic-validated IR types
+@dataclass(frozen=True)
+class Bus:
+    name: str
+    width: int
+
+
+@dataclass(frozen=True)
+class SignalRef:
+    name: str
+
+
+@dataclass
+class Range:
+    top: int
+    bot: int
+
+
+@dataclass
+class Slice:
+    name: str
+    index: Union[int, Range]
+
+
+@dataclass
+class Repeat:
+    target: Union[SignalRef, Slice]
+    num: int
+
+
+@dataclass
+class Concat:
+    parts: List["Connection"]
+
+
+Connection = Union[SignalRef, Repeat, Concat, Slice]
+Concat.__pydantic_model__.update_forward_refs()
+
+
+@dataclass
+class Port:
+    name: str
+    width: int
+    portdir: SchematicPinDir
+
+
+@dataclass
+class Instance:
+    ident: Bus
+    of: LibCell
+    conns: Dict[str, Connection]
+    params: Dict[str, Any]
+
+
+pydantic = SimpleNamespace(
+    Bus=Bus,
+    SignalRef=SignalRef,
+    Range=Range,
+    Slice=Slice,
+    Repeat=Repeat,
+    Concat=Concat,
+    Port=Port,
+    Instance=Instance,
+)
+
+
+def rebuild_conn(ns, conn):
+    """Rebuild connection `conn` with the types in namespace `ns`. No objects are shared."""
+    if isinstance(conn, slotted.SignalRef):
+        return ns.SignalRef(conn.name)
+    if isinstance(conn, slotted.Slice):
+        index = conn.index
+        if isinstance(index, slotted.Range):
+            index = ns.Range(index.top, index.bot)
+        return ns.Slice(conn.name, index)
+    if isinstance(conn, slotted.Repeat):
+        return ns.Repeat(rebuild_conn(ns, conn.target), conn.num)
+    if isinstance(conn, slotted.Concat):
+        return ns.Concat(tuple(rebuild_conn(ns, p) for p in conn.parts))
+    raise TypeError(conn)
+
+
+def rebuild(ns, sch: slotted.SchematicModule) -> Tuple[list, list]:
+    """Rebuild the ports and instances of `sch` with the types in namespace `ns`"""
+    ports = [ns.Port(p.name, p.width, p.portdir) for p in sch.ports]
+    instances = [
+        ns.Instance(
+            ident=ns.Bus(i.ident.name, i.ident.width),
+            of=i.of,
+            conns={k: rebuild_conn(ns, v) for k, v in i.conns.items()},
+            params=dict(i.params),
+        )
+        for i in sch.instances
+    ]
+    return ports, instances
+
+
+def measure(fn):
+    """Time and memory held by the result of `fn()`"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, held
+
+
+def main():
+    print(
+        f"{'instances':>10} {'convert (s)':>12} {'slots (s)':>10} {'slots MB':>9} "
+        f"{'pydantic (s)':>13} {'pydantic MB':>12}"
+    )
+    for num in (10_000, 50_000, 100_000):
+        bagsch = BagSchematic(**synth_schematic(num))
+
+        start = time.perf_counter()
+        sch = convert_schematic(bagsch)
+        t_convert = time.perf_counter() - start
+
+        t_slots, m_slots = measure(lambda: rebuild(slotted, sch))
+        t_pyd, m_pyd = measure(lambda: rebuild(pydantic, sch))
+        print(
+            f"{num:>10} {t_convert:>12.3f} {t_slots:>10.3f} {m_slots / 1e6:>9.1f} "
+            f"{t_pyd:>13.3f} {m_pyd / 1e6:>12.1f}"
+        )
+
+
+main()
@@ -0,0 +1,47 @@
+"""
+# Schematic Loading Benchmark
+
+Compares the default `load_sch` against its fast path, on synthetic schematics of increasing size.
+
+Run from the repo root:
+```
+python -m benchmarks.load
+```
+"""
+
+import time, tempfile
+from pathlib import Path
+
+from bagporting.schematic import load_sch
+from .synth import synth_schematic, write_schematic
+
+
+def best_of(fn, repeat: int = 3) -> float:
+    """Best wall-clock time of `repeat` runs of `fn`, in seconds."""
+    times = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    print(f"{'instances':>10} {'default (s)':>12} {'fast (s)':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for num in (100, 1_000, 10_000):
+            path = write_schematic(synth_schematic(num), Path(tmp) / f"synth{num}.yaml")
+
+            # Check the two agree on everything the converter reads
+            default, fast = load_sch(path), load_sch(path, fast=True)
+            assert default.instances.keys() == fast.instances.keys()
+            assert default.terminals.keys() == fast.terminals.keys()
+
+            t_default = best_of(lambda: load_sch(path))
+            t_fast = best_of(lambda: load_sch(path, fast=True))
+            print(
+                f"{num:>10} {t_default:>12.3f} {t_fast:>10.3f} {t_default / t_fast:>7.1f}x"
+            )
+
+
+main()
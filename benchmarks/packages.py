@@ -0,0 +1,69 @@
+"""
+# Library-Package Import Benchmark
+
+Ports a synthetic library of two thousand cells as a package, then times, each in a fresh interpreter:
+* `lazy` - importing the package, and getting its top-level generator, via its lazily-loading `__init__`
+* `eager` - the same, after first importing every cell module, as a package importing all its cells would
+
+Run from the repo root:
+```
+python -m benchmarks.packages
+```
+"""
+
+import sys, time, tempfile, subprocess
+from pathlib import Path
+
+from bagporting.batch import PortOptions, port_all
+from bagporting.code import Emission
+from bagporting.formatting import FormatPolicy
+from bagporting.validation import Validation
+from .synth import synth_hierarchy, write_schematic
+
+# Run in the fresh interpreters. `{eager}` imports every cell module first.
+SCRIPT = """
+import time, importlib, pkgutil
+start = time.perf_counter()
+import synth
+if {eager}:
+    for info in pkgutil.iter_modules(synth.__path__):
+        importlib.import_module("synth." + info.name)
+gen = synth.{top}
+print(time.perf_counter() - start)
+"""
+
+
+def timed_import(outdir: Path, top: str, eager: bool) -> float:
+    script = SCRIPT.format(top=top, eager=eager)
+    out = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=outdir,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return float(out.stdout)
+
+
+def main():
+    cells = synth_hierarchy(5, width=500, fanout=3, num_instances=4)
+    top = cells[-1]["cell_name"]
+    options = PortOptions(
+        fast=True,
+        format=FormatPolicy.NONE,
+        validation=Validation.OFF,
+        emission=Emission.PACKAGE,
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        paths = [write_schematic(c, tmp / f"{c['cell_name']}.yaml") for c in cells]
+        summary = port_all(paths, tmp / "out", options=options)
+        print(f"Ported {len(summary.results)} cells in {summary.elapsed:.2f}s")
+
+        lazy = min(timed_import(tmp / "out", top, False) for _ in range(3))
+        eager = min(timed_import(tmp / "out", top, True) for _ in range(3))
+    print(f"lazy:  {1e3 * lazy:.1f}ms")
+    print(f"eager: {1e3 * eager:.1f}ms ({eager / lazy:.1f}x)")
+
+
+main()
@@ -0,0 +1,148 @@
+"""
+# Connection-Parsing Microbenchmarks
+
+Times `parse_connection` and `parse_instance_or_port_name` over corpora of BAG-style net and instance names,
+against a replica of the prior split-based parser.
+
+Each corpus draws names with a skewed distribution, the way real schematics repeat `VDD`, `VSS` and friends:
+* `supplies` - almost all supply and bias nets, e.g. `VDD`, `VSS`, `<*4>VSS`
+* `buses` - bus slices and single bits, e.g. `data<7:0>`, `sel<3>`
+* `concats` - comma-concatenations of all of the above, e.g. `en,in`, `a<3:0>,<*2>VSS`
+* `instances` - instance and port names, e.g. `XN`, `XINV<3:0>`
+
+Run from the repo root:
+```
+python -m benchmarks.parse
+```
+"""
+
+import time, random
+from typing import Callable, Dict, List
+
+from bagporting.schematic_module import (
+    Bus,
+    SignalRef,
+    Slice,
+    Range,
+    Repeat,
+    Concat,
+    parse_connection,
+    parse_instance_or_port_name,
+    _conn_part,
+)
+
+SUPPLIES = ["VDD", "VSS", "VDDA", "VSSA", "vbias", "vref", "VDD_IO"]
+BUSES = ["data", "sel", "code", "ctrl", "addr", "out", "in", "clk_ph"]
+
+
+def _name(r: random.Random) -> str:
+    """A scalar net name, skewed heavily towards supplies"""
+    if r.random() < 0.6:
+        return SUPPLIES[min(int(r.expovariate(1.0)), len(SUPPLIES) - 1)]
+    return f"net{int(r.expovariate(0.05))}"
+
+
+def _bus(r: random.Random) -> str:
+    """A bus slice or single bit"""
+    name = r.choice(BUSES)
+    top = r.choice([1, 3, 7, 15, 31])
+    if r.random() < 0.5:
+        return f"{name}<{top}:0>"
+    return f"{name}<{r.randint(0, top)}>"
+
+
+def _part(r: random.Random) -> str:
+    k = r.random()
+    if k < 0.4:
+        return _name(r)
+    if k < 0.8:
+        return _bus(r)
+    return f"<*{r.choice([2, 4, 8, 16])}>{_name(r)}"
+
+
+def corpora(size: int = 100_000, seed: int = 0) -> Dict[str, List[str]]:
+    r = random.Random(seed)
+    # Concatenations are far more varied, but still repeat between instances
+    concats = [",".join(_part(r) for _ in range(r.randint(2, 6))) for _ in range(5_000)]
+    return dict(
+        supplies=[
+            _name(r) if r.random() < 0.9 else f"<*{r.choice([2, 4])}>{_name(r)}"
+            for _ in range(size)
+        ],
+        buses=[_bus(r) for _ in range(size)],
+        concats=[r.choice(concats) for _ in range(size)],
+        instances=[
+            f"X{r.choice(['N', 'P', 'INV', 'BUF'])}{int(r.expovariate(0.2))}"
+            + (f"<{r.choice([1, 3, 7])}:0>" if r.random() < 0.3 else "")
+            for _ in range(size)
+        ],
+    )
+
+
+def legacy_parse_connection(conn: str):
+    """The prior split-based parser, for comparison"""
+    if "," in conn:
+        return Concat([legacy_parse_connection(part) for part in conn.split(",")])
+    if conn.startswith("<*"):
+        idx = conn.index(">")
+        prefix, suffix = conn[: idx + 1], conn[idx + 1 :]
+        num = int(prefix[2:-1])
+        if suffix.endswith(">"):
+            return Repeat(legacy_parse_slice(suffix), num)
+        return Repeat(SignalRef(suffix), num)
+    if conn.endswith(">"):
+        return legacy_parse_slice(conn)
+    return SignalRef(name=conn)
+
+
+def legacy_parse_slice(name: str):
+    name, suffix = name.split("<")
+    suffix = suffix[:-1]
+    if ":" not in suffix:
+        return Slice(name=name, index=int(suffix))
+    top, bot = [int(s) for s in suffix.split(":")]
+    return Slice(name=name, index=Range(top, bot))
+
+
+def legacy_parse_instance_or_port_name(name: str):
+    if "<" not in name:
+        return Bus(name=name, width=1)
+    slice = legacy_parse_slice(name)
+    return Bus(name=slice.name, width=slice.index.top + 1)
+
+
+def clear_caches() -> None:
+    parse_connection.cache_clear()
+    parse_instance_or_port_name.cache_clear()
+    _conn_part.cache_clear()
+
+
+def timed(fn: Callable[[str], object], corpus: List[str]) -> float:
+    start = time.perf_counter()
+    for s in corpus:
+        fn(s)
+    return time.perf_counter() - start
+
+
+def main():
+    print(
+        f"{'corpus':>10} {'unique':>7} {'legacy (s)':>11} {'cold (s)':>9} "
+        f"{'warm (s)':>9} {'speedup':>8}"
+    )
+    for name, corpus in corpora().items():
+        parse = parse_instance_or_port_name if name == "instances" else parse_connection
+        legacy = legacy_parse_connection
+        if name == "instances":
+            legacy = legacy_parse_instance_or_port_name
+
+        t_legacy = timed(legacy, corpus)
+        clear_caches()
+        t_cold = timed(parse, corpus)  # Starting from empty caches
+        t_warm = timed(parse, corpus)  # Every string cached
+        print(
+            f"{name:>10} {len(set(corpus)):>7} {t_legacy:>11.3f} {t_cold:>9.3f} "
+            f"{t_warm:>9.3f} {t_legacy / t_cold:>7.1f}x"
+        )
+
+
+main()
@@ -0,0 +1,73 @@
+"""
+# Hierarchical-Scheduling Benchmark
+
+Runs a synthetic cell hierarchy, with a randomly-timed job per cell, three ways:
+* `serial` - one cell at a time, in dependency order, as `wip.ordered_stuff` did
+* `levels` - a level at a time, each level in parallel, waiting for its slowest cell
+* `schedule` - each cell dispatched as soon as its dependencies finish
+
+Jobs sleep rather than compute, so thread workers stand in for processes, and the comparison isolates the scheduling.
+
+Run from the repo root:
+```
+python -m benchmarks.schedule
+```
+"""
+
+import time, random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from bagporting.schematic import LibCell
+from bagporting.graph import DependencyGraph, levels, toposort
+from bagporting.schedule import schedule
+
+
+def synth_graph(num_cells: int = 300, seed: int = 0) -> DependencyGraph:
+    """A random layered hierarchy: each cell instantiates a few cells from lower layers"""
+    r = random.Random(seed)
+    cells = [LibCell("lib", f"cell{i}") for i in range(num_cells)]
+    graph = DependencyGraph()
+    for i, cell in enumerate(cells):
+        num_deps = min(i, r.randint(0, 4))
+        graph.add(cell, r.sample(cells[max(0, i - 30) : i], num_deps))
+    return graph
+
+
+def job(duration: float) -> None:
+    time.sleep(duration)
+
+
+def main():
+    graph = synth_graph()
+    r = random.Random(1)
+    # Mostly small cells, with the occasional very large one
+    durations: Dict[LibCell, float] = {
+        c: min(0.2, r.expovariate(1 / 0.01)) for c in graph.deps
+    }
+    workers = 8
+
+    start = time.perf_counter()
+    for cell in toposort(graph):
+        job(durations[cell])
+    t_serial = time.perf_counter() - start
+
+    with ThreadPoolExecutor(workers) as pool:
+        start = time.perf_counter()
+        for level in levels(graph):
+            list(pool.map(job, [durations[c] for c in level]))
+        t_levels = time.perf_counter() - start
+
+        start = time.perf_counter()
+        args = {c: (d,) for c, d in durations.items()}
+        for outcome in schedule(graph, job, args, pool, max_in_flight=workers):
+            assert outcome.ok
+        t_schedule = time.perf_counter() - start
+
+    print(f"{len(graph)} cells, {len(levels(graph))} levels, {workers} workers")
+    print(f"{'serial':>10} {t_serial:>8.3f}s")
+    print(f"{'levels':>10} {t_levels:>8.3f}s {t_serial / t_levels:>6.1f}x")
+    print(f"{'schedule':>10} {t_schedule:>8.3f}s {t_serial / t_schedule:>6.1f}x")
+
+
+main()
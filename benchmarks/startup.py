@@ -0,0 +1,97 @@
+"""
+# CLI Startup Benchmark
+
+Runs each `run.py` action in a fresh interpreter, under `python -X importtime`, and reports:
+* its wall time, best of several runs
+* the total time spent importing, and the slowest of the modules it imports directly
+
+Every action but `port` is run with `--help`, so that nearly all of its time is startup.
+Each action is also checked against the heavy modules it has no need for, e.g. `search` importing `black`.
+Exits non-zero if any does import them.
+
+Run from the repo root:
+```
+python -m benchmarks.startup
+```
+"""
+
+import sys, time, subprocess
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).parent.parent
+
+# Arguments to `run.py` for each action
+ACTIONS: Dict[str, List[str]] = {
+    "port": ["port", "examples/inv_tristate.yaml"],
+    "port-all": ["port-all", "--help"],
+    "search": ["search", "--help"],
+    "export-ir": ["export-ir", "--help"],
+    "serve": ["serve", "--help"],
+    "client": ["client", "--help"],
+    "connectivity": ["connectivity", "--help"],
+}
+
+# Modules each action must not import
+EXCLUDED: Dict[str, List[str]] = {
+    "port": ["bagporting.index", "bagporting.batch", "bagporting.server"],
+    "port-all": ["black", "hdl21", "bagporting.index", "asyncio"],
+    "search": ["black", "hdl21", "ruamel.yaml", "bagporting.code"],
+    "export-ir": ["black", "hdl21", "bagporting.index", "asyncio"],
+    "serve": ["black", "hdl21"],
+    "client": ["black", "hdl21", "pydantic", "dataclasses", "bagporting.schematic"],
+    "connectivity": ["black", "hdl21", "bagporting.index", "asyncio"],
+}
+
+# Import time: (module, self microseconds, cumulative microseconds, depth)
+Import = Tuple[str, int, int, int]
+
+
+def parse_importtime(stderr: str) -> List[Import]:
+    """Parse the `-X importtime` lines of `stderr`, e.g. `import time:  653 |  106096 |   bagporting.code`"""
+    imports = list()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def run_action(args: List[str]) -> Tuple[float, List[Import]]:
+    """Run `run.py` with `args`, returning its wall time and imports"""
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "run.py", *args],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    return elapsed, parse_importtime(out.stderr)
+
+
+def main() -> int:
+    failures = 0
+    for action, args in ACTIONS.items():
+        runs = [run_action(args) for _ in range(5)]
+        elapsed = min(t for t, _ in runs)
+        imports = min((i for _, i in runs), key=lambda i: sum(m[1] for m in i))
+        total = sum(m[1] for m in imports)
+        top = sorted((m for m in imports if m[3] == 0), key=lambda m: -m[2])[:3]
+        slowest = ", ".join(f"{m[0]} {m[2] / 1e3:.0f}ms" for m in top)
+        print(
+            f"{action:<12} {1e3 * elapsed:7.0f}ms, importing {total / 1e3:5.0f}ms "
+            f"({len(imports)} modules). Slowest: {slowest}"
+        )
+
+        names = set(m[0] for m in imports)
+        for excluded in EXCLUDED[action]:
+            if excluded in names:
+                print(f"  FAIL: {action} imports {excluded}")
+                failures += 1
+    return 1 if failures else 0
+
+
+sys.exit(main())
@@ -0,0 +1,275 @@
+"""
+# Benchmark Suite
+
+Times each stage of the porting pipeline on synthetic schematics, and compares against stored baselines,
+so that regressions in load, parse, convert or emit speed show up.
+
+Cases:
+* `load_sch` - default and fast-path loading of a 200-instance schematic
+* `parse_connection` - parsing a corpus of BAG connection strings, from empty caches
+* `convert_schematic` - converting a 10k-instance schematic, with buses, concatenations and repeats
+* `CodeWriter` - writing code for the same
+* `hierarchy` - converting and writing every cell of a synthetic hierarchy
+* `aggregate_params` - indexing 100k instance parameters, across a library of 2k cells
+* `irfile` - writing the 10k-instance schematic to a binary IR file, and reading it back
+* `connectivity` - loading the connectivity index of a 2k-cell library, and finding the cells impacted by changes
+* `bag_sch_path_to_code` - end to end, with `black` formatting and execution, for a 200-instance schematic
+
+Each case reports the best per-call time over several runs.
+Baselines are stored in `benchmarks/baselines.json`. They are machine-specific: save your own before comparing.
+
+Run from the repo root:
+```
+python -m benchmarks.suite                 # Run and compare against the baselines
+python -m benchmarks.suite --save          # Run and store new baselines
+python -m benchmarks.suite --check         # Exit non-zero on any regression
+python -m benchmarks.suite -k convert      # Run only the cases whose names contain "convert"
+```
+"""
+
+import sys, json, time, random, platform, argparse, tempfile
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from bagporting.schematic import BagSchematic, load_sch
+from bagporting.schematic_module import (
+    convert_schematic,
+    parse_connection,
+    parse_instance_or_port_name,
+    parse_net_widths,
+    _conn_part,
+)
+from bagporting.code import CodeWriter, bag_sch_path_to_code
+from bagporting.params import aggregate
+from bagporting.irfile import IrFile, write_ir
+from bagporting.schematic import LibCell
+from bagporting.connectivity import ConnectivityIndex
+from .synth import synth_hierarchy, synth_schematic, write_schematic
+
+BASELINES = Path(__file__).parent / "baselines.json"
+
+# Registered cases, by name. Each is a setup function, returning the zero-argument callable to be timed.
+CASES: Dict[str, Callable[[Path], Callable[[], object]]] = dict()
+
+
+def case(name: str):
+    """Decorator registering a benchmark case"""
+
+    def register(setup: Callable[[Path], Callable[[], object]]):
+        CASES[name] = setup
+        return setup
+
+    return register
+
+
+@case("load_sch/default/200")
+def _load_default(tmp: Path):
+    path = write_schematic(synth_schematic(200), tmp / "load.yaml")
+    return lambda: load_sch(path)
+
+
+@case("load_sch/fast/200")
+def _load_fast(tmp: Path):
+    path = write_schematic(synth_schematic(200), tmp / "load.yaml")
+    return lambda: load_sch(path, fast=True)
+
+
+@case("parse_connection/cold/50k")
+def _parse(tmp: Path):
+    sch = synth_schematic(12_500, bus_width=16, concat_density=0.4, repeat_density=0.3)
+    corpus = [v for i in sch["instances"].values() for v in i["connections"].values()]
+
+    def run():
+        parse_connection.cache_clear()
+        _conn_part.cache_clear()
+        for conn in corpus:
+            parse_connection(conn)
+
+    return run
+
+
+def _wide_schematic() -> BagSchematic:
+    content = synth_schematic(
+        10_000, bus_width=16, concat_density=0.4, repeat_density=0.3
+    )
+    return BagSchematic(**content)
+
+
+@case("convert_schematic/10k")
+def _convert(tmp: Path):
+    bagsch = _wide_schematic()
+
+    def run():
+        parse_connection.cache_clear()
+        parse_instance_or_port_name.cache_clear()
+        _conn_part.cache_clear()
+        parse_net_widths.cache_clear()
+        return convert_schematic(bagsch)
+
+    return run
+
+
+@case("CodeWriter/10k")
+def _codewriter(tmp: Path):
+    convsch = convert_schematic(_wide_schematic())
+    return lambda: CodeWriter(convsch).to_code()
+
+
+@case("hierarchy/depth6")
+def _hierarchy(tmp: Path):
+    cells = synth_hierarchy(6, width=8, fanout=3, num_instances=50, bus_width=8)
+    bagschs = [BagSchematic(**c) for c in cells]
+    return lambda: [CodeWriter(convert_schematic(s)).to_code() for s in bagschs]
+
+
+@case("aggregate_params/100k")
+def _aggregate_params(tmp: Path):
+    r = random.Random(0)
+    rows = list()
+    for i in range(25_000):
+        cell = f"cell{r.randrange(2000)}"
+        rows.append(("lib", cell, "nf", r.randint(1, 16)))
+        rows.append(("lib", cell, "w", r.choice([0.5, 1, 2.5])))
+        rows.append(("lib", cell, "l", r.choice(["30n", "40n"])))
+        rows.append(("lib", cell, "stack", r.choice([True, False])))
+    return lambda: aggregate(rows)
+
+
+@case("irfile/write/10k")
+def _ir_write(tmp: Path):
+    convsch = convert_schematic(_wide_schematic())
+    return lambda: write_ir([convsch], tmp / "write.bagir")
+
+
+@case("irfile/module/10k")
+def _ir_module(tmp: Path):
+    path = tmp / "read.bagir"
+    write_ir([convert_schematic(_wide_schematic())], path)
+
+    def run():
+        with IrFile(path) as ir:
+            return ir.module(0)
+
+    return run
+
+
+def _library_index(tmp: Path) -> ConnectivityIndex:
+    """Index of a 2k-cell library, bundled into a JSON-lines file"""
+    bundle = tmp / "library.jsonl"
+    cells = synth_hierarchy(5, width=500, fanout=3, num_instances=4)
+    bundle.write_text("".join(json.dumps(c) + "\n" for c in cells))
+    index = ConnectivityIndex(tmp / "connectivity.pkl.z")
+    index.update([bundle], workers=1)
+    index.save()
+    return index
+
+
+@case("connectivity/load/2k")
+def _connectivity_load(tmp: Path):
+    index = _library_index(tmp)
+    return lambda: ConnectivityIndex.load(index.path)
+
+
+@case("connectivity/impacted/2k")
+def _connectivity_impacted(tmp: Path):
+    index = _library_index(tmp)
+    changed = [LibCell("synth", f"cell_l0_{i}") for i in range(10)]
+    return lambda: index.impacted(changed)
+
+
+@case("bag_sch_path_to_code/200")
+def _end_to_end(tmp: Path):
+    content = synth_schematic(200, bus_width=8, concat_density=0.5, repeat_density=0.2)
+    path = write_schematic(content, tmp / "e2e.yaml")
+    return lambda: bag_sch_path_to_code(path)
+
+
+def measure(fn: Callable[[], object], repeat: int = 5, min_time: float = 0.1) -> float:
+    """Best per-call time of `fn`, in seconds.
+    Each of `repeat` runs calls `fn` enough times to take at least `min_time`."""
+    fn()  # Warm up
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def machine() -> Dict[str, str]:
+    return dict(
+        python=platform.python_version(),
+        platform=platform.platform(),
+        processor=platform.processor() or platform.machine(),
+    )
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    parser.add_argument(
+        "-k", default="", help="Only run cases whose names contain this"
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="Store results as baselines"
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="Exit non-zero on any regression"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.5,
+        help="Slowdown relative to baseline reported as a regression",
+    )
+    parser.add_argument("--baselines", type=Path, default=BASELINES)
+    args = parser.parse_args(argv)
+
+    baselines = dict()
+    if args.baselines.exists():
+        baselines = json.loads(args.baselines.read_text())
+    prior = baselines.get("results", dict())
+
+    results: Dict[str, float] = dict()
+    regressions: List[str] = list()
+    print(f"{'case':<28} {'time (ms)':>10} {'baseline':>10} {'ratio':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, setup in CASES.items():
+            if args.k not in name:
+                continue
+            results[name] = elapsed = measure(setup(Path(tmp)))
+            line = f"{name:<28} {1e3 * elapsed:>10.3f}"
+            if name in prior:
+                ratio = elapsed / prior[name]
+                line += f" {1e3 * prior[name]:>10.3f} {ratio:>6.2f}x"
+                if ratio > args.threshold:
+                    regressions.append(name)
+                    line += "  REGRESSION"
+            print(line)
+
+    if baselines and baselines.get("machine", None) != machine():
+        print("Note: baselines were recorded on a different machine")
+    if args.save:
+        merged = dict(prior)
+        merged.update(results)
+        content = dict(machine=machine(), results=merged)
+        args.baselines.write_text(json.dumps(content, indent=1, sort_keys=True) + "\n")
+        print(f"Saved baselines to {args.baselines}")
+    if regressions:
+        print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+        if args.check:
+            return 1
+    return 0
+
+
+sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,202 @@
+"""
+# Synthetic BAG Schematics
+
+Generate schematic-YAML content shaped like BAG's `netlist_info` exports,
+at whatever scale the benchmarks need.
+Geometry (`bbox`, `xform`, `shapes`, terminal `attr`s) is included, as in real exports.
+"""
+
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+# PyPi Imports
+from ruamel.yaml import YAML
+
+
+def _bbox(x: int, y: int) -> list:
+    return [x, y, x + 60, y + 80]
+
+
+def _terminal(pindir: str, x: int, y: int) -> Dict[str, Any]:
+    """A terminal (port) entry, pin-direction `pindir` in ("ipin", "opin", "iopin")."""
+    inst = dict(
+        lib_name="basic",
+        cell_name=pindir,
+        view_name="symbolr",
+        xform=[x, y, "R0"],
+        bbox=_bbox(x, y),
+        connections={},
+        params={},
+        is_primitive=True,
+    )
+    attr = dict(
+        layer=229,
+        purpose=237,
+        net="",
+        origin=[x - 25, y],
+        alignment=7,
+        orient="R0",
+        font=5,
+        height=10,
+        overbar=False,
+        visible=True,
+        drafting=True,
+        attr_type=0,
+        format=1,
+    )
+    return dict(obj=[1, dict(inst=inst, attr=attr)], stype=1, ttype=2)
+
+
+def _wire(net: str, x: int, y: int) -> list:
+    """An annotation shape: a wire segment on `net`."""
+    return [
+        7,
+        dict(
+            layer=228,
+            purpose=4294967295,
+            net=net,
+            points=[[x, y], [x + 40, y]],
+        ),
+    ]
+
+
+def synth_schematic(
+    num_instances: int,
+    lib_name: str = "synth",
+    cell_name: str = "synth",
+    bus_width: int = 1,
+    concat_density: float = 1.0,
+    repeat_density: float = 0.0,
+    children: Sequence[Tuple[str, str]] = (),
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Create the content of a schematic with `num_instances` transistor-stack instances,
+    each connected to a chain of internal nets plus the supplies.
+
+    * With `bus_width > 1`, the schematic also has `din` and `dout` bus ports of that width,
+      and every fourth instance is an array of that width, connected to them.
+    * Each stack's two-bit gate is connected to a repeat (`<*2>net`) with probability `repeat_density`,
+      to a concatenation (`net,net`) with probability `concat_density`, and otherwise to a single bit of a bus.
+    * Each of `children`, (lib, cell) pairs, is instantiated once more, continuing the chain of nets.
+      Children are expected to share this schematic's ports, as those from `synth_hierarchy` do.
+    """
+    r = random.Random(seed)
+    terminals = {
+        "VDD": _terminal("iopin", -170, 140),
+        "VSS": _terminal("iopin", -170, 120),
+        "in": _terminal("ipin", -170, 100),
+        "out": _terminal("opin", -170, 80),
+    }
+    top = bus_width - 1
+    if bus_width > 1:
+        terminals[f"din<{top}:0>"] = _terminal("ipin", -170, 60)
+        terminals[f"dout<{top}:0>"] = _terminal("opin", -170, 40)
+
+    instances = dict()
+    shapes = list()
+    num_nets = num_instances + len(children)
+    for i in range(num_nets):
+        x, y = 100 * (i % 100), 200 * (i // 100)
+        src = "in" if i == 0 else f"n{i - 1}"
+        dst = "out" if i == num_nets - 1 else f"n{i}"
+        sup = "VSS" if i % 2 else "VDD"
+        common = dict(view_name="symbol", xform=[x, y, "R0"], bbox=_bbox(x, y))
+        shapes.append(_wire(dst, x, y))
+        shapes.append(_wire(sup, x, y + 40))
+
+        if i >= num_instances:
+            lib, cell = children[i - num_instances]
+            conns = {"VDD": "VDD", "VSS": "VSS", "in": src, "out": dst}
+            if bus_width > 1:
+                conns[f"din<{top}:0>"] = f"din<{top}:0>"
+                conns[f"dout<{top}:0>"] = f"dout<{top}:0>"
+            instances[f"XC{i}"] = dict(
+                lib_name=lib,
+                cell_name=cell,
+                connections=conns,
+                params={},
+                is_primitive=False,
+                **common,
+            )
+            continue
+
+        mos = "nmos4_stack" if i % 2 else "pmos4_stack"
+        if bus_width > 1 and i % 4 == 3:
+            # An array, connected bit-wise to the bus ports
+            name = f"X{i}<{top}:0>"
+            conns = {"b": sup, "d": f"dout<{top}:0>", "g": f"din<{top}:0>", "s": sup}
+        else:
+            name = f"X{i}"
+            k = r.random()
+            if k < repeat_density:
+                gate = f"<*2>{src}"
+            elif k < repeat_density + concat_density:
+                gate = f"{src},{src}"
+            else:
+                bit = r.randrange(bus_width) if bus_width > 1 else 0
+                gate = f"din<{bit}>,{src}" if bus_width > 1 else f"{src},{src}"
+            conns = {"b": sup, "d": dst, "g<1:0>": gate, "s": sup}
+        instances[name] = dict(
+            lib_name="xbase",
+            cell_name=mos,
+            connections=conns,
+            params={},
+            is_primitive=False,
+            **common,
+        )
+
+    return dict(
+        lib_name=lib_name,
+        cell_name=cell_name,
+        view_name="schematic",
+        bbox=[-231, -340, 100 * min(num_nets, 100), 200 * (num_nets // 100)],
+        terminals=terminals,
+        shapes=shapes,
+        instances=instances,
+        props=dict(connectivityLastUpdated=[0, 1234], lastSchematicExtraction=[4, 0]),
+        app_defs=dict(_dbLastSavedCounter=[0, 1234], _dbvCvTimeStamp=[0, 1234]),
+    )
+
+
+def synth_hierarchy(
+    depth: int,
+    width: int = 4,
+    fanout: int = 2,
+    num_instances: int = 20,
+    lib_name: str = "synth",
+    **kwargs,
+) -> List[Dict[str, Any]]:
+    """Create a hierarchy of schematics `depth` levels deep, and `width` cells wide at every level but the top.
+    Each cell above the bottom level instantiates `fanout` cells of the level below, along with `num_instances` transistors.
+    Other `kwargs` are passed along to `synth_schematic`.
+    Returns the content of each cell, dependencies first. The single top-level cell is last."""
+    accum = list()
+    below: List[Tuple[str, str]] = list()
+    for level in range(depth):
+        num_cells = 1 if level == depth - 1 else width
+        cells = list()
+        for j in range(num_cells):
+            cell_name = f"cell_l{level}_{j}"
+            children = (
+                [below[(j + k) % len(below)] for k in range(fanout)] if below else []
+            )
+            content = synth_schematic(
+                num_instances,
+                lib_name=lib_name,
+                cell_name=cell_name,
+                children=children,
+                seed=1000 * level + j,
+                **kwargs,
+            )
+            accum.append(content)
+            cells.append((lib_name, cell_name))
+        below = cells
+    return accum
+
+
+def write_schematic(content: Dict[str, Any], path: Path) -> Path:
+    """Write schematic `content` to YAML file `path`."""
+    with open(path, "w") as f:
+        YAML().dump(content, f)
+    return path
@@ -8,22 +8,58 @@ And don't give us this "__main__" stuff, this is always to be run as a script.
 
 import sys
 from enum import Enum
-from bagporting.code import bag_sch_path_to_code
-from bagporting.wip import find_candidates
 
 
 class Actions(Enum):
     # The available command-line actions
     # Could this be a more elaborate CLI library thing? Sure.
     PORT = "port"  # Port a schematic-yaml files to Hdl21 Python
-    SEARCH = "search"  # Search paths for schematics
+    PORT_ALL = "port-all"  # Port many schematic-yaml files (or directories of them) in parallel
+    SEARCH = "search"  # Search paths (default: `sys.path`) for schematics
+    EXPORT_IR = "export-ir"  # Convert many schematic-yaml files to a binary IR file
+    SERVE = "serve"  # Run a server, keeping workers and parsed schematics warm between requests
+    CLIENT = "client"  # Send a request to a running server
+    CONNECTIVITY = (
+        "connectivity"  # Index and query which cells instantiate which, and their nets
+    )
 
 
 action = Actions(sys.argv[1])
 args = sys.argv[2:]
 
+# Each action imports only what it needs. For short runs, imports are most of the run time.
+# See `benchmarks/startup.py`.
 if action == Actions.PORT:
+    from bagporting.code import bag_sch_path_to_code
+
     print(bag_sch_path_to_code(args[0]))
 
+if action == Actions.PORT_ALL:
+    from bagporting.batch import main as port_all
+
+    port_all(args)
+
 if action == Actions.SEARCH:
-    find_candidates()
+    from bagporting.index import main as search
+
+    search(args)
+
+if action == Actions.EXPORT_IR:
+    from bagporting.irfile import main as export_ir
+
+    export_ir(args)
+
+if action == Actions.SERVE:
+    from bagporting.server import serve_main as serve
+
+    serve(args)
+
+if action == Actions.CLIENT:
+    from bagporting.client import main as client
+
+    client(args)
+
+if action == Actions.CONNECTIVITY:
+    from bagporting.connectivity import main as connectivity
+
+    connectivity(args)
@@ -0,0 +1,93 @@
+"""
+# Test Helpers
+
+Build small schematics in-memory, and run the code ported from them against stand-in primitives.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# PyPi Imports
+import hdl21 as h
+
+# Local Imports
+from bagporting.schematic import BagSchematic
+
+
+def terminal(pindir: str) -> Dict[str, Any]:
+    """A terminal entry, pin-direction `pindir` in ("ipin", "opin", "iopin")"""
+    inst = instance("basic", pindir, {}, view_name="symbolr", is_primitive=True)
+    return dict(obj=[1, dict(inst=inst)], stype=1, ttype=2)
+
+
+def instance(
+    lib_name: str,
+    cell_name: str,
+    connections: Dict[str, str],
+    params: Optional[Dict[str, Any]] = None,
+    view_name: str = "symbol",
+    is_primitive: bool = False,
+) -> Dict[str, Any]:
+    """An instance entry"""
+    return dict(
+        lib_name=lib_name,
+        cell_name=cell_name,
+        view_name=view_name,
+        connections=connections,
+        params=params or {},
+        is_primitive=is_primitive,
+    )
+
+
+def content(
+    cell_name: str,
+    terminals: Dict[str, str],
+    instances: Dict[str, Dict[str, Any]],
+    lib_name: str = "test",
+) -> Dict[str, Any]:
+    """The content of a schematic with `terminals`, a mapping from name to pin-direction, and `instances`"""
+    return dict(
+        lib_name=lib_name,
+        cell_name=cell_name,
+        view_name="schematic",
+        terminals={name: terminal(pindir) for name, pindir in terminals.items()},
+        instances=instances,
+    )
+
+
+def schematic(*args, **kwargs) -> BagSchematic:
+    """A `BagSchematic`, from the same arguments as `content`"""
+    return BagSchematic(**content(*args, **kwargs))
+
+
+def write_schematic(path: Path, sch: Dict[str, Any]) -> Path:
+    """Write schematic content `sch` to `path`. JSON is also valid YAML."""
+    path.write_text(json.dumps(sch))
+    return path
+
+
+def primitive(name: str, **ports: int) -> h.Generator:
+    """A stand-in for a BAG primitive: a generator of a module with an `Inout` of each width in `ports`.
+    Its parameters are those BAG transistors commonly set, `l` and `nf`."""
+
+    @h.paramclass
+    class Params:
+        l = h.Param(dtype=str, desc="Length", default="")
+        nf = h.Param(dtype=int, desc="Fingers", default=1)
+
+    def fn(params: Params) -> h.Module:
+        m = h.Module(name=name)
+        for port, width in ports.items():
+            m.add(h.Inout(width=width), name=port)
+        return m
+
+    fn.__name__ = name
+    return h.generator(fn)
+
+
+def exec_code(code: str, **names: Any) -> Dict[str, Any]:
+    """Execute ported `code`, with `names` (e.g. its dependencies) already defined. Returns its namespace."""
+    namespace = dict(__name__="generated", **names)
+    exec(compile(code, "<generated>", "exec"), namespace)
+    return namespace
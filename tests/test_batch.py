@@ -0,0 +1,28 @@
+"""
+# Batch Porting Tests
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+# Local Imports
+from bagporting.batch import main
+from helpers import content, write_schematic
+
+
+def test_profile_requires_report(tmp_path: Path, capsys):
+    path = write_schematic(
+        tmp_path / "cell.yaml", content("cell", {"VDD": "iopin"}, {})
+    )
+    with pytest.raises(SystemExit) as e:
+        main([str(path), "-o", str(tmp_path / "out"), "--profile", "tracemalloc"])
+    assert e.value.code == 2
+    assert "--profile requires --report" in capsys.readouterr().err
+
+    report = tmp_path / "report.json"
+    args = [str(path), "-o", str(tmp_path / "out"), "-j", "1"]
+    main(args + ["--profile", "tracemalloc", "--report", str(report)])
+    (cell,) = json.loads(report.read_text())["cells"]
+    assert cell["peak_bytes"] > 0
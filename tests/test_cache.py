@@ -0,0 +1,83 @@
+"""
+# Schematic Cache Tests
+"""
+
+import os
+from pathlib import Path
+
+# Local Imports
+from bagporting import cache
+from bagporting.cache import SchematicCache
+from bagporting.schematic import load_sch
+from helpers import content, write_schematic
+
+
+def write_cell(path: Path, cell_name: str = "cell") -> Path:
+    return write_schematic(path, content(cell_name, {"VDD": "iopin"}, {}))
+
+
+def test_hit_and_miss(tmp_path: Path):
+    path = write_cell(tmp_path / "cell.yaml")
+    c = SchematicCache(tmp_path / "cache")
+    sch = c.load(path)
+    assert sch == load_sch(path)
+    assert (c.hits, c.misses) == (0, 1)
+    assert c.load(path) == sch
+    assert (c.hits, c.misses) == (1, 1)
+
+    # A fresh cache on the same directory hits too
+    other = SchematicCache(tmp_path / "cache")
+    assert other.load(path) == sch
+    assert (other.hits, other.misses) == (1, 0)
+
+    # Loader modes are cached separately
+    c.load(path, fast=True)
+    assert (c.hits, c.misses) == (1, 2)
+
+
+def test_changed_file_misses(tmp_path: Path):
+    path = write_cell(tmp_path / "cell.yaml")
+    c = SchematicCache(tmp_path / "cache")
+    c.load(path)
+    write_cell(path, "renamed")
+    assert c.load(path).cell_name == "renamed"
+    assert (c.hits, c.misses) == (0, 2)
+
+
+def test_touched_file_hits(tmp_path: Path):
+    path = write_cell(tmp_path / "cell.yaml")
+    c = SchematicCache(tmp_path / "cache")
+    c.load(path)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    c.load(path)
+    assert (c.hits, c.misses) == (1, 1)
+
+
+def test_version_bump_misses(tmp_path: Path, monkeypatch):
+    path = write_cell(tmp_path / "cell.yaml")
+    c = SchematicCache(tmp_path / "cache")
+    c.load(path)
+    monkeypatch.setattr(cache, "CACHE_VERSION", cache.CACHE_VERSION + 1)
+    c.load(path)
+    assert (c.hits, c.misses) == (0, 2)
+
+
+def test_eviction(tmp_path: Path):
+    paths = [write_cell(tmp_path / f"cell{k}.yaml", f"cell{k}") for k in range(8)]
+    c = SchematicCache(tmp_path / "cache")
+    c.load(paths[0])
+    blob_size = c.size()
+
+    c = SchematicCache(tmp_path / "cache", max_bytes=4 * blob_size)
+    for path in paths:
+        c.load(path)
+    assert c.size() <= 4 * blob_size
+    assert len(list(c.blobs.iterdir())) < len(paths)
+    # The least-recently used were evicted, and are re-parsed
+    assert (c.hits, c.misses) == (1, 7)
+    assert c.load(paths[0]).cell_name == "cell0"
+    assert (c.hits, c.misses) == (1, 8)
+
+    c.clear()
+    assert c.size() == 0
@@ -0,0 +1,59 @@
+"""
+# Code Emission Tests
+
+Port small schematics, and elaborate the code they port to, checking every connection's width.
+"""
+
+import pytest
+import hdl21 as h
+
+# Local Imports
+from bagporting.code import bag_sch_to_code
+from helpers import exec_code, instance, primitive, schematic
+
+
+def port_and_elaborate(gate: str, width: int) -> str:
+    """Port a schematic connecting `gate` to a `width`-bit primitive port, elaborate it, and return its code."""
+    sch = schematic(
+        "top",
+        {"a<3:0>": "iopin", "b": "iopin"},
+        {"X0": instance("xbase", "nmos4_stack", {f"g<{width - 1}:0>": gate})},
+    )
+    code = bag_sch_to_code(sch)
+    namespace = exec_code(code, nmos4_stack=primitive("nmos4_stack", g=width))
+    # Elaboration fails on any connection of the wrong width
+    h.elaborate(namespace["top"](h.Default))
+    return code
+
+
+@pytest.mark.parametrize(
+    "gate, width, expected",
+    [
+        ("a<3:0>", 4, 'm.get("a")[0:4]'),
+        ("a<2:1>", 2, 'm.get("a")[1:3]'),
+        ("a<3>,a<2>", 2, 'm.get("a")[2:4]'),
+        ("a<3>,a<2>,a<1:0>", 4, 'm.get("a")[0:4]'),
+        ("a<0>,a<1>", 2, 'h.Concat(m.get("a")[1], m.get("a")[0])'),
+        (
+            "a<0:3>",
+            4,
+            'h.Concat(m.get("a")[3], m.get("a")[2], m.get("a")[1], m.get("a")[0])',
+        ),
+        ("b,a<1:0>", 3, 'h.Concat(m.get("a")[0:2], m.get("b"))'),
+        ("a<3:2>,b,a<1>", 4, 'h.Concat(m.get("a")[1], m.get("b"), m.get("a")[2:4])'),
+        ("<*4>b", 4, 'h.Concat(*4 * [m.get("b")])'),
+        ("<*2>a<1:0>", 4, 'h.Concat(*2 * [m.get("a")[0:2]])'),
+        ("<*2>b,a<1:0>", 4, 'h.Concat(m.get("a")[0:2], *2 * [m.get("b")])'),
+    ],
+)
+def test_connection_widths(gate: str, width: int, expected: str):
+    code = port_and_elaborate(gate, width)
+    assert f'i.connect("g", {expected})' in code
+
+
+def test_merged_slices_keep_bit_order():
+    """Merging slices must connect the same bits, in the same order, as leaving them apart"""
+    merged = port_and_elaborate("a<3>,a<2>,b", 3)
+    assert 'h.Concat(m.get("b"), m.get("a")[2:4])' in merged
+    apart = port_and_elaborate("a<3>,b,a<2>", 3)
+    assert 'h.Concat(m.get("a")[2], m.get("b"), m.get("a")[3])' in apart
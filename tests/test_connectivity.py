@@ -0,0 +1,81 @@
+"""
+# Connectivity Index Tests
+"""
+
+import os
+from pathlib import Path
+
+# Local Imports
+from bagporting.connectivity import ConnectivityIndex
+from bagporting.schematic import LibCell
+from helpers import content, instance, write_schematic
+
+PORTS = {"VDD": "iopin", "VSS": "iopin", "in": "ipin", "out": "opin"}
+CONNS = {"VDD": "VDD", "VSS": "VSS", "in": "in", "out": "mid"}
+
+leaf, mid, top, other = (LibCell("lib", c) for c in ("leaf", "mid", "top", "other"))
+
+
+def write_library(dirpath: Path) -> Path:
+    """`top` instantiates `mid` twice, which instantiates `leaf`. `other` instantiates `leaf` too."""
+    leaf_insts = {"XN": instance("xbase", "nmos4_stack", dict(g="<*2>in", d="out"))}
+    cells = dict(
+        leaf=leaf_insts,
+        mid={"X0": instance("lib", "leaf", CONNS)},
+        top={f"X{k}": instance("lib", "mid", CONNS) for k in range(2)},
+        other={"X0": instance("lib", "leaf", CONNS)},
+    )
+    for cell, insts in cells.items():
+        write_schematic(dirpath / f"{cell}.yaml", content(cell, PORTS, insts, "lib"))
+    return dirpath
+
+
+def test_queries(tmp_path: Path):
+    index = ConnectivityIndex(tmp_path / "index.pkl.z")
+    summary = index.update([write_library(tmp_path)], workers=1)
+    assert (summary.indexed, summary.reused, summary.removed) == (4, 0, 0)
+    assert not summary.failures
+    assert len(index) == 4
+
+    assert index.parents(leaf) == {mid, other}
+    assert index.parents(top) == set()
+    assert index.children(top) == {mid}
+    assert index.impacted([leaf]) == {mid, other, top}
+    assert index.impacted([mid]) == {top}
+    assert index.impacted([top]) == set()
+
+    cell = index.get(top)
+    assert cell.fanout("mid") == 2
+    assert cell.internal_signals() == ["mid"]
+    assert index.get(LibCell("lib", "missing")) is None
+
+
+def test_update_reuses_unchanged_files(tmp_path: Path):
+    write_library(tmp_path)
+    index = ConnectivityIndex(tmp_path / "index.pkl.z")
+    index.update([tmp_path], workers=1)
+    index.save()
+
+    # Change `other` to stop instantiating `leaf`, and remove `top`
+    write_schematic(tmp_path / "other.yaml", content("other", PORTS, {}, "lib"))
+    stat = os.stat(tmp_path / "other.yaml")
+    os.utime(tmp_path / "other.yaml", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    (tmp_path / "top.yaml").unlink()
+
+    index = ConnectivityIndex.load(tmp_path / "index.pkl.z")
+    assert len(index) == 4
+    summary = index.update([tmp_path], workers=1)
+    assert (summary.indexed, summary.reused, summary.removed) == (1, 2, 1)
+    assert index.get(top) is None
+    assert index.parents(leaf) == {mid}
+    assert index.impacted([leaf]) == {mid}
+
+
+def test_update_reports_missing_files(tmp_path: Path):
+    write_library(tmp_path)
+    missing = tmp_path / "missing.yaml"
+    index = ConnectivityIndex(tmp_path / "index.pkl.z")
+    summary = index.update([tmp_path / "leaf.yaml", missing], workers=1)
+    assert list(summary.failures) == [str(missing.absolute())]
+    assert "FileNotFoundError" in summary.failures[str(missing.absolute())]
+    assert summary.indexed == 1 and len(index) == 1
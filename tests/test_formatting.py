@@ -0,0 +1,78 @@
+"""
+# Formatting Tests
+
+The built-in formatter must match `black` on everything `CodeWriter` writes.
+"""
+
+import random
+from typing import List
+
+import pytest
+
+# Local Imports
+from bagporting.code import CodeWriter, Emission
+from bagporting.formatting import format_black, format_builtin
+from bagporting.params import build_param_index
+from bagporting.schematic import BagSchematic
+from bagporting.schematic_module import convert_schematic
+from helpers import instance, schematic
+
+
+def name(r: random.Random, longest: int) -> str:
+    return "x" + "".join(
+        r.choice("abcdefghijklmnop_") for _ in range(r.randrange(longest))
+    )
+
+
+def value(r: random.Random):
+    """A random parameter value. Floats span exponents which `repr` writes as e.g. `1e+16`."""
+    return r.choice(
+        [
+            r.randrange(10 ** r.randint(1, 12)),
+            name(r, 40),
+            r.random(),
+            r.random() * 10.0 ** r.randint(-30, 30),
+            float(10 ** r.randint(15, 25)),
+            "1e-9",
+            True,
+        ]
+    )
+
+
+def random_schematics(seed: int, num: int = 20) -> List[BagSchematic]:
+    """Schematics with names, parameters and connections of random lengths, many too long for a line"""
+    r = random.Random(seed)
+    accum = list()
+    for _ in range(num):
+        lib = name(r, 50)
+        instances = dict()
+        for k in range(r.randint(1, 6)):
+            of = r.choice([lib, name(r, 50), "BAG_prim"])
+            params = {name(r, 40): value(r) for _ in range(r.randrange(7))}
+            conn = r.choice(
+                ["VDD", "a<3:0>", "a<3>,a<2>,VDD", "<*4>VDD", "a<0>,a<5>,a<2>"]
+            )
+            conns = {name(r, 50): conn}
+            instances[f"X{k}{name(r, 20)}"] = instance(of, name(r, 80), conns, params)
+        terminals = {"VDD": "iopin", "a<7:0>": "iopin", name(r, 60): "ipin"}
+        accum.append(schematic(name(r, 60), terminals, instances, lib_name=lib))
+    return accum
+
+
+def check_matches_black(schs: List[BagSchematic], emission: Emission, params: bool):
+    index = build_param_index(schs) if params else None
+    for sch in schs:
+        code = CodeWriter(convert_schematic(sch), emission, index).to_code()
+        assert format_builtin(code) == format_black(code)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_params_match_black(seed: int):
+    """Parameter classes' `h.Param` lines, and instances' keyword arguments"""
+    check_matches_black(random_schematics(seed), Emission.MODULE, params=True)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_package_dependencies_match_black(seed: int):
+    """Package emission's `lib.cell(h.Default)()` instances, and its dependency imports"""
+    check_matches_black(random_schematics(seed), Emission.PACKAGE, params=False)
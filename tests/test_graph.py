@@ -0,0 +1,99 @@
+"""
+# Dependency Graph and Scheduling Tests
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Local Imports
+from bagporting.graph import CycleError, DependencyGraph, build_graph, levels, toposort
+from bagporting.schedule import priorities, schedule
+from bagporting.schematic import LibCell
+
+a, b, c, d, e, x = (LibCell("lib", name) for name in "abcdex")
+
+
+def diamond() -> DependencyGraph:
+    """`a` instantiates `b` and `c`, which both instantiate `d`. `e` stands alone."""
+    graph = DependencyGraph()
+    graph.add(a, [b, c])
+    graph.add(b, [d])
+    graph.add(c, [d])
+    graph.add(d, [])
+    graph.add(e, [])
+    return graph
+
+
+def test_orderings():
+    graph = diamond()
+    assert toposort(graph) == [d, b, c, a, e]
+    assert levels(graph) == [[d, e], [b, c], [a]]
+    assert priorities(graph) == {a: 1, b: 2, c: 2, d: 3, e: 1}
+
+
+def test_cycle():
+    graph = diamond()
+    graph.add(d, [a])
+    with pytest.raises(CycleError) as err:
+        toposort(graph)
+    assert err.value.cycle == [a, b, d, a]
+    with pytest.raises(CycleError):
+        levels(graph)
+
+
+def test_build_graph_drops_missing_cells():
+    deps = {a: [b, x], b: []}
+    graph = build_graph([a], deps.get)
+    assert graph.deps == {a: {b}, b: set()}
+    assert graph.missing == {x}
+
+
+def run(graph: DependencyGraph, fn, workers: int = 4) -> list:
+    args = {cell: (cell,) for cell in graph.deps}
+    with ThreadPoolExecutor(workers) as pool:
+        return list(schedule(graph, fn, args, pool, max_in_flight=workers))
+
+
+def test_schedule_runs_dependencies_first():
+    done = list()
+    lock = threading.Lock()
+
+    def fn(cell: LibCell) -> str:
+        with lock:
+            assert all(dep in done for dep in graph.deps[cell])
+            done.append(cell)
+        return cell.cell
+
+    graph = diamond()
+    outcomes = run(graph, fn)
+    assert all(o.ok for o in outcomes)
+    assert sorted(o.result for o in outcomes) == ["a", "b", "c", "d", "e"]
+
+
+def test_schedule_skips_dependents_of_failures():
+    def fn(cell: LibCell) -> None:
+        if cell == b:
+            raise ValueError("broken")
+
+    outcomes = {o.libcell: o for o in run(diamond(), fn)}
+    assert len(outcomes) == 5
+    assert "broken" in outcomes[b].error and not outcomes[b].skipped
+    assert outcomes[a].skipped and "lib.b failed" in outcomes[a].error
+    assert outcomes[c].ok and outcomes[d].ok and outcomes[e].ok
+
+
+def test_schedule_prioritizes_longest_chains():
+    """With one worker, cells run in order of their longest chain of dependents, then by name"""
+    outcomes = run(diamond(), lambda cell: None, workers=1)
+    assert [o.libcell for o in outcomes] == [d, b, c, a, e]
+
+
+def test_schedule_runs_cells_with_undefined_dependencies():
+    """Every cell gets an outcome, even those depending on cells outside the graph"""
+    graph = DependencyGraph()
+    graph.add(a, [x])
+    graph.add(b, [])
+    outcomes = run(graph, lambda cell: cell)
+    assert sorted(o.result.cell for o in outcomes) == ["a", "b"]
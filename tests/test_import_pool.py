@@ -0,0 +1,12 @@
+"""
+# Import Pool Tests
+"""
+
+# Local Imports
+from bagporting.the_part_that_needs_bag import ImportPool
+
+
+def test_no_candidates_start_no_workers():
+    pool = ImportPool(workers=4)
+    assert list(pool.imap([])) == []
+    assert pool.workers == []
@@ -0,0 +1,72 @@
+"""
+# Incremental Porting Tests
+"""
+
+from pathlib import Path
+
+# Local Imports
+from bagporting.batch import PortOptions
+from bagporting.code import Emission
+from bagporting.formatting import FormatPolicy
+from bagporting.incremental import port_incremental
+from bagporting.validation import Validation
+from helpers import content, instance, write_schematic
+
+PORTS = {"VDD": "iopin", "VSS": "iopin", "in": "ipin", "out": "opin"}
+CONNS = {"VDD": "VDD", "VSS": "VSS", "in": "in", "out": "out"}
+
+
+def write_library(dirpath: Path) -> list:
+    """Write a library of two cells, `top` instantiating `leaf`, returning their paths"""
+    leaf = content("leaf", PORTS, {}, lib_name="lib")
+    top = content("top", PORTS, {"X0": instance("lib", "leaf", CONNS)}, lib_name="lib")
+    return [
+        write_schematic(dirpath / "leaf.yaml", leaf),
+        write_schematic(dirpath / "top.yaml", top),
+    ]
+
+
+def test_unchanged_options_port_nothing(tmp_path: Path):
+    paths = write_library(tmp_path)
+    options = PortOptions(validation=Validation.SYNTAX)
+    first = port_incremental(paths, tmp_path / "out", 1, options)
+    assert len(first.results) == 2 and first.unchanged == 0
+    second = port_incremental(paths, tmp_path / "out", 1, options)
+    assert len(second.results) == 0 and second.unchanged == 2
+
+
+def test_changed_options_port_everything(tmp_path: Path):
+    paths = write_library(tmp_path)
+    outdir = tmp_path / "out"
+    port_incremental(paths, outdir, 1, PortOptions(format=FormatPolicy.NONE))
+
+    for options in [
+        PortOptions(format=FormatPolicy.BUILTIN),
+        PortOptions(format=FormatPolicy.BUILTIN, validation=Validation.SYNTAX),
+        PortOptions(format=FormatPolicy.BUILTIN, fast=True),
+        PortOptions(format=FormatPolicy.BUILTIN, emission=Emission.PACKAGE),
+    ]:
+        summary = port_incremental(paths, outdir, 1, options)
+        assert len(summary.results) == 2 and summary.unchanged == 0
+        assert all(r.ok for r in summary.results)
+
+
+def test_emission_change_writes_every_package(tmp_path: Path):
+    paths = write_library(tmp_path)
+    other = content("other", PORTS, {}, lib_name="other")
+    paths.append(write_schematic(tmp_path / "other.yaml", other))
+    outdir = tmp_path / "out"
+    options = PortOptions(format=FormatPolicy.NONE, validation=Validation.SYNTAX)
+    port_incremental(paths, outdir, 1, options)
+    assert not list(outdir.glob("*/__init__.py"))
+
+    options.emission = Emission.PACKAGE
+    port_incremental(paths, outdir, 1, options)
+    assert sorted(p.parent.name for p in outdir.glob("*/__init__.py")) == [
+        "lib",
+        "other",
+    ]
+
+    options.emission = Emission.MODULE
+    port_incremental(paths, outdir, 1, options)
+    assert not list(outdir.glob("*/__init__.py"))
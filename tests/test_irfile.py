@@ -0,0 +1,115 @@
+"""
+# Binary IR File Tests
+"""
+
+from pathlib import Path
+
+import pytest
+
+# Local Imports
+from bagporting.irfile import IrFile, write_ir
+from bagporting.schematic import LibCell, load_sch
+from bagporting.schematic_module import (
+    Concat,
+    Range,
+    Repeat,
+    SchematicModule,
+    SignalRef,
+    Slice,
+    convert_schematic,
+)
+from helpers import instance, schematic
+
+EXAMPLE = Path(__file__).parent.parent / "examples" / "inv_tristate.yaml"
+
+
+def synthetic() -> SchematicModule:
+    """A module with every kind of connection, and instance parameters"""
+    conns = dict(a="x", b="x<2>", c="x<3:0>", d="<*2>x<1>", e="x<3>,<*2>y,x<1:0>")
+    return convert_schematic(
+        schematic(
+            "synth",
+            {"x<3:0>": "iopin", "y": "ipin", "z<7:0>": "opin"},
+            {
+                "X0": instance("xbase", "prim", conns, dict(l=[3, "30n"], nf=2)),
+                "X1<3:0>": instance("lib", "other", dict(a="z<7:4>"), dict(w=1.5)),
+                "X2": instance("xbase", "prim", dict(a="n<5:0>,y")),
+            },
+            lib_name="lib",
+        )
+    )
+
+
+def empty() -> SchematicModule:
+    return convert_schematic(schematic("empty", {}, {}, lib_name="lib"))
+
+
+def check_equal(ir: IrFile, idx: int, module: SchematicModule):
+    assert ir.ports(idx) == module.ports
+    assert ir.signals(idx) == module.signals
+    assert ir.instances(idx) == module.instances
+    assert ir.dependencies(idx) == module.dependencies
+    rebuilt = ir.module(idx)
+    assert (rebuilt.ports, rebuilt.signals, rebuilt.instances) == (
+        module.ports,
+        module.signals,
+        module.instances,
+    )
+
+
+def test_round_trip(tmp_path: Path):
+    modules = [convert_schematic(load_sch(EXAMPLE)), synthetic(), empty()]
+    path = tmp_path / "lib.bagir"
+    assert write_ir(modules, path) == path.stat().st_size
+
+    with IrFile(path) as ir:
+        assert len(ir) == 3
+        assert ir.cells() == [
+            LibCell(m.bagsch.lib_name, m.bagsch.cell_name) for m in modules
+        ]
+        for idx, module in enumerate(modules):
+            assert ir.find(ir.libcell(idx)) == idx
+            check_equal(ir, idx, module)
+        assert ir.find(LibCell("lib", "missing")) is None
+
+        # Every kind of connection node
+        (x0, x1, x2) = ir.instances(1)
+        assert x0.conns == dict(
+            a=SignalRef("x"),
+            b=Slice("x", 2),
+            c=Slice("x", Range(3, 0)),
+            d=Repeat(Slice("x", 1), 2),
+            e=Concat(
+                (Slice("x", 3), Repeat(SignalRef("y"), 2), Slice("x", Range(1, 0)))
+            ),
+        )
+        assert x0.params == dict(l=[3, "30n"], nf=2)
+        assert x1.ident.width == 4 and x1.params == dict(w=1.5)
+        # Identical connections are shared
+        assert x0.conns["a"] is ir.instances(1)[0].conns["a"]
+
+
+def test_empty_file(tmp_path: Path):
+    path = tmp_path / "empty.bagir"
+    write_ir([], path)
+    with IrFile(path) as ir:
+        assert len(ir) == 0
+        assert ir.cells() == []
+
+
+def test_close(tmp_path: Path):
+    path = tmp_path / "lib.bagir"
+    write_ir([synthetic()], path)
+    ir = IrFile(path)
+    assert ir.libcell(0) == LibCell("lib", "synth")
+    ir.close()
+    assert ir.mmap.closed
+    with pytest.raises(Exception):
+        ir.ports(0)
+
+
+def test_invalid_file(tmp_path: Path):
+    path = tmp_path / "bad.bagir"
+    path.write_bytes(b"NOTBAGIR" + bytes(32))
+    with pytest.raises(RuntimeError, match="not a version"):
+        IrFile(path)
@@ -0,0 +1,45 @@
+"""
+# Connection Parsing Tests
+"""
+
+import pytest
+
+# Local Imports
+from bagporting.schematic_module import (
+    Concat,
+    Range,
+    Repeat,
+    SignalRef,
+    Slice,
+    parse_connection,
+)
+
+
+@pytest.mark.parametrize(
+    "conn, expected",
+    [
+        ("a", SignalRef("a")),
+        ("a<3>", Slice("a", 3)),
+        ("a<3:0>", Slice("a", Range(3, 0))),
+        ("a<0:3>", Slice("a", Range(0, 3))),
+        ("<*4>a", Repeat(SignalRef("a"), 4)),
+        ("<*2>a<1:0>", Repeat(Slice("a", Range(1, 0)), 2)),
+        ("a,b", Concat((SignalRef("a"), SignalRef("b")))),
+        (
+            "<*2>a,b<1>,c<3:2>",
+            Concat((Repeat(SignalRef("a"), 2), Slice("b", 1), Slice("c", Range(3, 2)))),
+        ),
+    ],
+)
+def test_parse(conn: str, expected):
+    assert parse_connection(conn) == expected
+
+
+def test_parse_is_cached():
+    assert parse_connection("a<3:0>,b") is parse_connection("a<3:0>,b")
+
+
+@pytest.mark.parametrize("conn", ["", "a,b,", ",a", "a,,b", "a<3", "<*2>"])
+def test_invalid(conn: str):
+    with pytest.raises(RuntimeError, match="Invalid connection syntax"):
+        parse_connection(conn)
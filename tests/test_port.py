@@ -0,0 +1,116 @@
+"""
+# End-to-End Porting Tests
+
+Port sample schematics, then run and elaborate the code they port to.
+"""
+
+import sys
+from pathlib import Path
+
+import hdl21 as h
+import pytest
+
+# Local Imports
+from bagporting.batch import PortOptions, port_all
+from bagporting.code import Emission, bag_sch_path_to_code, bag_sch_to_code
+from bagporting.formatting import FormatPolicy
+from bagporting.schematic import load_sch
+from helpers import content, exec_code, instance, primitive, schematic, write_schematic
+
+EXAMPLE = Path(__file__).parent.parent / "examples" / "inv_tristate.yaml"
+PORTS = {"VDD": "iopin", "VSS": "iopin", "in": "ipin", "out": "opin"}
+
+# Stand-ins for the example's primitives
+STACK = dict(b=1, d=1, g=2, s=1)
+PRIMITIVES = dict(
+    nmos4_stack=primitive("nmos4_stack", **STACK),
+    pmos4_stack=primitive("pmos4_stack", **STACK),
+    pmos4_standard=primitive("pmos4_standard", B=1, D=1, G=1, S=1),
+)
+
+
+@pytest.mark.parametrize("policy", list(FormatPolicy))
+def test_example(policy: FormatPolicy):
+    code = bag_sch_path_to_code(EXAMPLE, policy)
+    if policy != FormatPolicy.NONE:
+        assert code == bag_sch_path_to_code(EXAMPLE, FormatPolicy.BLACK)
+    namespace = exec_code(code, **PRIMITIVES)
+    h.elaborate(namespace["inv_tristate"](h.Default))
+
+
+def test_fast_load():
+    assert bag_sch_to_code(load_sch(EXAMPLE, fast=True)) == bag_sch_to_code(
+        load_sch(EXAMPLE)
+    )
+
+
+def test_internal_buses():
+    """Internal signals are as wide as the widest bit connected to them, and elaborate"""
+    gates = dict(XA="n<3:2>", XB="n<1>,n<0>", XC="<*2>m<5>", XD="n<0:1>")
+    sch = schematic(
+        "top",
+        {"VDD": "iopin"},
+        {
+            name: instance(
+                "xbase", "nmos4_stack", dict(b="VDD", d="VDD", g=gate, s="VDD")
+            )
+            for name, gate in gates.items()
+        },
+    )
+    code = bag_sch_to_code(sch)
+    assert 'm.add(h.Signal(width=4), name="n")' in code
+    assert 'm.add(h.Signal(width=6), name="m")' in code
+    namespace = exec_code(code, nmos4_stack=PRIMITIVES["nmos4_stack"])
+    h.elaborate(namespace["top"](h.Default))
+
+
+@pytest.fixture
+def workspace(tmp_path: Path):
+    """A library `lib`, with `top` instantiating `mid` instantiating `leaf`,
+    and an importable stand-in for the primitive library `xbase`. Yields the schematic paths."""
+    stack = dict(b="VSS", d="out", g="<*2>in", s="VSS")
+    leaf = {
+        "XN": instance("xbase", "nmos4_stack", stack, dict(l="30n", nf=2)),
+        "XP<1:0>": instance("xbase", "pmos4_stack", dict(stack, b="VDD"), dict(nf=4)),
+    }
+    conns = {p: p for p in PORTS}
+    mid = {"X0": instance("lib", "leaf", conns, dict(w=2))}
+    top = {f"X{k}": instance("lib", "mid", conns) for k in range(2)}
+    paths = [
+        write_schematic(tmp_path / f"{cell}.yaml", content(cell, PORTS, insts, "lib"))
+        for cell, insts in dict(leaf=leaf, mid=mid, top=top).items()
+    ]
+
+    pkg = tmp_path / "xbase"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text(
+        "from helpers import primitive\n"
+        f"nmos4_stack = primitive('nmos4_stack', **{STACK})\n"
+        f"pmos4_stack = primitive('pmos4_stack', **{STACK})\n"
+    )
+    outdir = tmp_path / "out"
+    sys.path[:0] = [str(outdir), str(tmp_path)]
+    yield paths
+    sys.path.remove(str(outdir))
+    sys.path.remove(str(tmp_path))
+    for name in list(sys.modules):
+        if name.split(".")[0] in ("lib", "xbase"):
+            del sys.modules[name]
+
+
+@pytest.mark.parametrize("params", [False, True])
+def test_package(workspace, tmp_path: Path, params: bool):
+    """Ports a hierarchy as packages, with and without synthesized parameters, then imports and elaborates it"""
+    options = PortOptions(
+        format=FormatPolicy.BUILTIN, emission=Emission.PACKAGE, params=params
+    )
+    summary = port_all(workspace, tmp_path / "out", 1, options)
+    assert not summary.failures
+
+    import lib
+
+    if params:
+        leaf = (tmp_path / "out" / "lib" / "leaf.py").read_text()
+        assert 'xbase.nmos4_stack(l="30n", nf=2)()' in leaf
+        assert "w = h.Param(dtype=int" in leaf
+    h.elaborate(lib.top(h.Default))
@@ -0,0 +1,46 @@
+"""
+# Internal Representation Tests
+"""
+
+import pickle
+
+import pytest
+
+# Local Imports
+from bagporting.schematic import LibCell
+from bagporting.schematic_module import (
+    Bus,
+    Concat,
+    Instance,
+    Range,
+    Repeat,
+    SignalRef,
+    Slice,
+    get_signal_refs,
+    parse_connection,
+)
+
+
+def test_signal_refs():
+    assert get_signal_refs(parse_connection("<*2>a,b<1>,c<3:2>")) == {"a", "b", "c"}
+    nested = Concat(
+        (
+            Repeat(Concat((SignalRef("a"), Slice("b", 1))), 2),
+            Concat((Slice("c", Range(3, 0)),)),
+        )
+    )
+    assert get_signal_refs(nested) == {"a", "b", "c"}
+    with pytest.raises(TypeError):
+        get_signal_refs("a")
+
+
+def test_instances():
+    conns = {"g": parse_connection("a<1:0>")}
+    inst = Instance(Bus("X0", 1), LibCell("lib", "cell"), conns, {"nf": 2})
+    assert inst == Instance(
+        Bus("X0", 1), LibCell("lib", "cell"), dict(conns), {"nf": 2}
+    )
+    with pytest.raises(TypeError):
+        hash(inst)
+    assert pickle.loads(pickle.dumps(inst)) == inst
+    assert hash(conns["g"]) == hash(Slice("a", Range(1, 0)))
@@ -0,0 +1,65 @@
+"""
+# Porting Server Tests
+
+Runs `run.py serve` in a subprocess, on a temporary socket, and talks to it with the client.
+"""
+
+import sys, time, subprocess
+from pathlib import Path
+
+import pytest
+
+# Local Imports
+from bagporting.client import request
+
+ROOT = Path(__file__).parent.parent
+EXAMPLE = ROOT / "examples" / "inv_tristate.yaml"
+
+
+@pytest.fixture
+def server(tmp_path: Path):
+    """A running server, with one worker. Yields its (socket path, process)."""
+    socket_path = tmp_path / "server.sock"
+    proc = subprocess.Popen(
+        [sys.executable, "run.py", "serve", "--socket", str(socket_path), "-j", "1"],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    deadline = time.monotonic() + 30
+    while not socket_path.exists():
+        assert proc.poll() is None, proc.communicate()
+        assert time.monotonic() < deadline, "Server didn't start"
+        time.sleep(0.05)
+    yield socket_path, proc
+    if proc.poll() is None:
+        proc.kill()
+        proc.communicate()
+
+
+def test_round_trip(server, tmp_path: Path):
+    socket_path, proc = server
+
+    response = request("ping", socket_path=socket_path)
+    assert response.ok and "1 workers" in response.output
+
+    response = request("port", [str(EXAMPLE)], socket_path=socket_path)
+    assert response.ok and "def inv_tristate(params: Params)" in response.output
+
+    # Relative paths are relative to the client's directory
+    response = request("port", [EXAMPLE.name], socket_path, cwd=str(EXAMPLE.parent))
+    assert response.ok and "def inv_tristate(params: Params)" in response.output
+
+    response = request("port", ["missing.yaml"], socket_path, cwd=str(tmp_path))
+    assert not response.ok and "missing.yaml" in response.error
+
+    response = request("port-all", ["--profile", "cprofile"], socket_path)
+    assert not response.ok and "usage" in response.error
+
+    response = request("shutdown", socket_path=socket_path)
+    assert response.ok
+    _, stderr = proc.communicate(timeout=30)
+    assert proc.returncode == 0
+    assert "Traceback" not in stderr
+    assert not socket_path.exists()
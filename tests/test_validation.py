@@ -0,0 +1,17 @@
+"""
+# Validation Tests
+"""
+
+import pytest
+
+# Local Imports
+from bagporting.validation import Validation, validate
+
+
+def test_levels():
+    validate("syntax error(", Validation.OFF)
+    validate("raise RuntimeError", Validation.SYNTAX)
+    with pytest.raises(SyntaxError):
+        validate("syntax error(", Validation.SYNTAX)
+    with pytest.raises(RuntimeError):
+        validate("raise RuntimeError", Validation.EXEC)